@@ -0,0 +1,140 @@
+import os
+import time
+from contextlib import contextmanager
+
+import django
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class Rollback(Exception):
+    """
+    Raised to roll back the transaction of isolated.
+    """
+
+
+def setup(redis=False):
+    """
+    Set up Django and create a throwaway test database for the benchmarks.
+
+    Args:
+        redis (bool): Whether to use the configured Redis cache instead of a local memory cache.
+
+    Returns:
+        str: The name of the previous database, for teardown.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'microclimate_control.settings')
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import override_settings, setup_test_environment
+
+    setup_test_environment()
+    if not redis:
+        override_settings(CACHES=LOCMEM_CACHES).enable()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    return old_name
+
+
+def teardown(old_name):
+    """
+    Destroy the test database created by setup.
+
+    Args:
+        old_name (str): The name of the previous database as returned by setup.
+    """
+    from django.db import connection
+
+    connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+@contextmanager
+def isolated():
+    """
+    Run a benchmark inside a transaction that is rolled back afterwards, so that the data it
+    creates does not affect the following benchmarks.
+    """
+    from django.core.cache import cache
+    from django.db import transaction
+
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback()
+    except Rollback:
+        pass
+    finally:
+        cache.clear()
+
+
+def timed(function, repeat=5, before=None):
+    """
+    Time a function and count the SQL queries it runs.
+
+    Args:
+        function: The function to call without arguments.
+        repeat (int): The number of runs, of which the fastest is reported.
+        before: An optional function called without arguments before every run, not timed.
+
+    Returns:
+        dict: The best and median run time in seconds and the number of queries of one run.
+    """
+    from django.db import connection
+
+    queries = []
+
+    def count_queries(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    durations = []
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        queries.clear()
+        with connection.execute_wrapper(count_queries):
+            start = time.perf_counter()
+            function()
+            durations.append(time.perf_counter() - start)
+    durations.sort()
+    return {'best': durations[0], 'median': durations[len(durations) // 2], 'queries': len(queries)}
+
+
+def create_sample_data(rows, buildings=1):
+    """
+    Create a project with building objects, data types, a device and data points.
+
+    Args:
+        rows (int): The number of data points per building object.
+        buildings (int): The number of building objects.
+
+    Returns:
+        tuple: The project and the list of building objects.
+    """
+    from datetime import timedelta
+
+    from django.utils import timezone
+
+    from microclimate_control_app.models import Project, BuildingObject, Metric, DataType, Device, DataPoint
+
+    project = Project.objects.create(name='Benchmark', description='Benchmark')
+    building_objects = BuildingObject.objects.bulk_create([
+        BuildingObject(name=f'Building {number}', location='Benchmark', project=project)
+        for number in range(buildings)
+    ])
+    metric, _ = Metric.objects.get_or_create(name='°C')
+    data_types = [DataType.objects.get_or_create(code=f'BENCH{number}',
+                                                 defaults={'name': f'Benchmark {number}', 'metric': metric})[0]
+                  for number in range(3)]
+    device, _ = Device.objects.get_or_create(name='bench')
+    device.data_collected.set(data_types)
+
+    start = timezone.now() - timedelta(seconds=rows)
+    for building in building_objects:
+        DataPoint.objects.bulk_create([
+            DataPoint(timestamp=start + timedelta(seconds=number), value=number * 0.1,
+                      data_type=data_types[number % len(data_types)], device=device, building_object=building)
+            for number in range(rows)
+        ], batch_size=5000)
+    return project, building_objects
@@ -0,0 +1,75 @@
+"""
+Benchmark the list endpoints at different data sizes.
+
+Run from the repository root with `python -m benchmarks.endpoints --rows 100 1000 10000`.
+"""
+import argparse
+
+from benchmarks.common import setup, teardown, timed, isolated, create_sample_data
+
+
+def run(row_counts, buildings=10):
+    """
+    Time the list endpoints for a user with project access, and with the response cache
+    for the endpoints using it.
+
+    Args:
+        row_counts (list): The numbers of data points per building object.
+        buildings (int): The number of building objects of the project.
+
+    Returns:
+        dict: The timings keyed by benchmark name.
+    """
+    from django.core.cache import cache
+    from rest_framework.test import APIClient
+
+    from microclimate_control_app.models import ProjectGrant, User
+
+    results = {}
+    for rows in row_counts:
+        with isolated():
+            project, building_objects = create_sample_data(rows, buildings)
+            building = building_objects[0]
+            user = User.objects.create(username=f'endpoints{rows}', full_name='Benchmark')
+            ProjectGrant.objects.create(user=user, project=project, action=ProjectGrant.ACCESS)
+            building.users.add(user)
+            client = APIClient()
+            client.force_authenticate(user)
+            # Responsibles are only listed for staff
+            staff_client = APIClient()
+            staff_client.force_authenticate(User.objects.create(username=f'staff{rows}', is_staff=True))
+
+            data_points = f'/projects/{project.id}/objects/{building.id}/data-points/'
+            endpoints = [
+                ('projects', client, '/projects/', True),
+                ('objects', client, f'/projects/{project.id}/objects/', True),
+                ('responsibles', staff_client, f'/projects/{project.id}/objects/{building.id}/responsibles/', True),
+                ('data-points', client, f'{data_points}?page_size={rows}', False),
+                ('data-points series', client, f'{data_points}?page_size={rows}&format=series', False),
+                ('data-points aggregate', client, f'{data_points}aggregate/?bucket=hour&fn=avg,min,max,last', False),
+                ('data-points latest', client, f'{data_points}latest/', False),
+            ]
+            for name, endpoint_client, url, cached in endpoints:
+                def get(endpoint_client=endpoint_client, url=url):
+                    response = endpoint_client.get(url)
+                    assert response.status_code == 200, f'GET {url} returned {response.status_code}'
+
+                results[f'GET {name}[{rows}]'] = timed(get, before=cache.clear)
+                if cached:
+                    results[f'GET {name} cached[{rows}]'] = timed(get)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100, 1000, 10000],
+                        help='Numbers of data points per building object.')
+    args = parser.parse_args()
+
+    old_name = setup()
+    try:
+        for name, result in run(args.rows).items():
+            print(f"{name:50} best {result['best'] * 1000:10.1f} ms  "
+                  f"median {result['median'] * 1000:10.1f} ms  queries {result['queries']}")
+    finally:
+        teardown(old_name)
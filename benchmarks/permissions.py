@@ -0,0 +1,150 @@
+"""
+Benchmark the permission classes and the querysets of the viewsets at different permission counts.
+
+Run from the repository root with `python -m benchmarks.permissions --grants 1 10 100 1000`.
+"""
+import argparse
+
+from benchmarks.common import setup, teardown, timed, isolated
+
+# Per-user attributes memoizing permissions, dropped to simulate a new request
+USER_CACHES = ('_access_set', '_perm_cache', '_user_perm_cache', '_group_perm_cache')
+
+
+def create_user_with_grants(grants):
+    """
+    Create a user holding access grants on projects and single building objects.
+
+    Half of the grants are project access grants and half are building object access grants,
+    each on its own project with one building object.
+
+    Args:
+        grants (int): The number of grants.
+
+    Returns:
+        tuple: The user, a project and a building object the user may access.
+    """
+    from microclimate_control_app.models import Project, BuildingObject, BuildingGrant, ProjectGrant, User
+
+    projects = Project.objects.bulk_create([
+        Project(name=f'Permissions {number}', description='Benchmark') for number in range(max(grants, 2))
+    ])
+    buildings = BuildingObject.objects.bulk_create([
+        BuildingObject(name=f'Building {project.id}', location='Benchmark', project=project) for project in projects
+    ])
+    user = User.objects.create(username=f'permissions{grants}', full_name='Benchmark')
+    half = max(grants // 2, 1)
+    ProjectGrant.objects.bulk_create([
+        ProjectGrant(user=user, project=project, action=ProjectGrant.ACCESS) for project in projects[:half]
+    ])
+    BuildingGrant.objects.bulk_create([
+        BuildingGrant(user=user, building_object=building) for building in buildings[half:grants]
+    ])
+    return user, projects[0], buildings[0]
+
+
+def forget(user):
+    """
+    Drop the permissions memoized on a user object, as a new request starts with a fresh user.
+
+    Args:
+        user: The user.
+    """
+    for attribute in USER_CACHES:
+        user.__dict__.pop(attribute, None)
+
+
+def make_view(viewset, user, action, method='GET', **kwargs):
+    """
+    Instantiate a viewset as it would be for a request of a user.
+
+    Args:
+        viewset: The viewset class.
+        user: The requesting user.
+        action (str): The viewset action.
+        method (str): The HTTP method of the request.
+        kwargs: The URL keyword arguments.
+
+    Returns:
+        The viewset instance.
+    """
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory, force_authenticate
+
+    request = APIRequestFactory().generic(method, '/')
+    force_authenticate(request, user)
+    view = viewset(action=action, kwargs=kwargs, format_kwarg=None)
+    view.request = Request(request)
+    view.request.user = user
+    return view
+
+
+def run(grant_counts):
+    """
+    Time compiling access sets, every permission class and the get_queryset of every viewset.
+
+    Permission classes are timed as on a new request whose access set is found in the cache.
+
+    Args:
+        grant_counts (list): The numbers of grants of the benchmarked users.
+
+    Returns:
+        dict: The timings keyed by benchmark name.
+    """
+    from microclimate_control_app import permissions
+    from microclimate_control_app.access import AccessSet, get_access_set
+    from microclimate_control_app.views import ProjectViewSet, BuildingObjectViewSet, DataPointViewSet, UserViewSet
+
+    permission_classes = [
+        (permissions.CanAccessProject, 'list', 'GET'),
+        (permissions.CanUpdateProject, 'partial_update', 'PATCH'),
+        (permissions.CanAccessBuildingObject, 'retrieve', 'GET'),
+        (permissions.CanCreateBuildingObject, 'create', 'POST'),
+        (permissions.CanUpdateBuildingObject, 'partial_update', 'PATCH'),
+        (permissions.CanDeleteBuildingObject, 'destroy', 'DELETE'),
+        (permissions.CanAccessBuildingContent, 'list', 'GET'),
+    ]
+    viewsets = [
+        (ProjectViewSet, lambda project, building: {}),
+        (BuildingObjectViewSet, lambda project, building: {'project_pk': project.id}),
+        (DataPointViewSet, lambda project, building: {'project_pk': project.id, 'object_pk': building.id}),
+        (UserViewSet, lambda project, building: {'project_pk': project.id, 'object_pk': building.id}),
+    ]
+
+    results = {}
+    for grants in grant_counts:
+        with isolated():
+            user, project, building = create_user_with_grants(grants)
+            kwargs = {'project_pk': project.id, 'object_pk': building.id, 'pk': building.id}
+
+            results[f'AccessSet.compile[{grants}]'] = timed(
+                lambda: AccessSet.compile(user), before=lambda: forget(user))
+            results[f'get_access_set cached[{grants}]'] = timed(
+                lambda: get_access_set(user), before=lambda: forget(user))
+
+            get_access_set(user)
+            for permission_class, action, method in permission_classes:
+                view = make_view(DataPointViewSet, user, action, method, **kwargs)
+                results[f'{permission_class.__name__}[{grants}]'] = timed(
+                    lambda: permission_class().has_permission(view.request, view), before=lambda: forget(user))
+
+            for viewset, make_kwargs in viewsets:
+                view = make_view(viewset, user, 'list', **make_kwargs(project, building))
+                results[f'{viewset.__name__}.get_queryset[{grants}]'] = timed(
+                    lambda: list(view.get_queryset().all()[:100]), before=lambda: forget(user))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--grants', type=int, nargs='+', default=[1, 10, 100, 1000],
+                        help='Numbers of grants of the benchmarked users.')
+    args = parser.parse_args()
+
+    old_name = setup()
+    try:
+        for name, result in run(args.grants).items():
+            print(f"{name:50} best {result['best'] * 1000:10.3f} ms  "
+                  f"median {result['median'] * 1000:10.3f} ms  queries {result['queries']}")
+    finally:
+        teardown(old_name)
@@ -0,0 +1,113 @@
+"""
+Run all benchmarks and store the results as JSON, optionally comparing them with earlier results.
+
+Run from the repository root with `python -m benchmarks.run --output results.json --compare previous.json`.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+from benchmarks import endpoints, permissions, serializers
+from benchmarks.common import setup, teardown, isolated
+
+
+def git_revision():
+    """
+    Get the current git commit of the repository.
+
+    Returns:
+        str: The commit hash, or None outside of a git checkout.
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, previous, threshold, min_delta):
+    """
+    Compare the best run times and query counts of two sets of results.
+
+    The best run is compared as it is the least affected by noise from other processes.
+
+    Args:
+        results (dict): The current timings keyed by benchmark name.
+        previous (dict): The earlier timings keyed by benchmark name.
+        threshold (float): The relative slowdown reported as a regression, e.g. 0.2 for 20 %.
+        min_delta (float): The smallest slowdown in seconds reported as a regression.
+
+    Returns:
+        list: (name, previous best, current best, relative change, query change) tuples
+              of the regressed benchmarks.
+    """
+    regressions = []
+    for name, result in results.items():
+        before = previous.get(name)
+        if before is None:
+            continue
+        change = result['best'] / before['best'] - 1 if before['best'] else 0
+        slower = change > threshold and result['best'] - before['best'] > min_delta
+        if slower or result['queries'] > before['queries']:
+            regressions.append((name, before['best'], result['best'], change,
+                                result['queries'] - before['queries']))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100, 1000, 10000],
+                        help='Numbers of data points for the serializer and endpoint benchmarks.')
+    parser.add_argument('--grants', type=int, nargs='+', default=[1, 10, 100, 1000],
+                        help='Numbers of grants for the permission benchmarks.')
+    parser.add_argument('--output', help='Path of the JSON file to write the results to.')
+    parser.add_argument('--compare', help='Path of earlier JSON results to compare with.')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Relative slowdown of the best run reported as a regression (default: 0.2).')
+    parser.add_argument('--min-delta', type=float, default=0.001,
+                        help='Smallest slowdown in seconds reported as a regression (default: 0.001).')
+    parser.add_argument('--redis', action='store_true',
+                        help='Use the configured Redis cache instead of a local memory cache.')
+    args = parser.parse_args()
+
+    old_name = setup(redis=args.redis)
+    try:
+        from django import get_version
+        from django.db import connection
+
+        results = {}
+        for rows in args.rows:
+            with isolated():
+                results.update(serializers.run(rows))
+        results.update(permissions.run(args.grants))
+        results.update(endpoints.run(args.rows))
+        database = connection.vendor
+    finally:
+        teardown(old_name)
+
+    for name, result in results.items():
+        print(f"{name:50} best {result['best'] * 1000:10.3f} ms  "
+              f"median {result['median'] * 1000:10.3f} ms  queries {result['queries']}")
+
+    report = {
+        'revision': git_revision(),
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'django': get_version(),
+        'database': database,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+
+    if args.compare:
+        with open(args.compare) as previous:
+            regressions = compare(results, json.load(previous)['results'], args.threshold, args.min_delta)
+        for name, before, after, change, queries in regressions:
+            print(f'REGRESSION {name}: best {before * 1000:.3f} ms -> {after * 1000:.3f} ms '
+                  f'({change:+.0%}), {queries:+d} queries')
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,48 @@
+"""
+Benchmark the data point serializers.
+
+Run from the repository root with `python -m benchmarks.serializers --rows 10000`.
+"""
+import argparse
+
+from benchmarks.common import setup, teardown, timed, create_sample_data
+
+
+def run(rows):
+    """
+    Time serializing all data points of a building object with each data point serializer.
+
+    Args:
+        rows (int): The number of data points to serialize.
+
+    Returns:
+        dict: The timings keyed by benchmark name.
+    """
+    from microclimate_control_app.models import DataPoint
+    from microclimate_control_app.serializers import DataPointSerializer, DataPointReadSerializer
+
+    _, (building,) = create_sample_data(rows)
+    queryset = DataPoint.objects.filter(building_object=building).order_by('timestamp', 'id')
+
+    return {
+        f'DataPointSerializer[{rows}]': timed(
+            lambda: DataPointSerializer(queryset.all(), many=True).data),
+        f'DataPointSerializer+select_related[{rows}]': timed(
+            lambda: DataPointSerializer(queryset.select_related('data_type__metric'), many=True).data),
+        f'DataPointReadSerializer[{rows}]': timed(
+            lambda: DataPointReadSerializer(DataPointReadSerializer.values(queryset), many=True).data),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000, help='Number of data points to serialize.')
+    args = parser.parse_args()
+
+    old_name = setup()
+    try:
+        for name, result in run(args.rows).items():
+            print(f"{name:50} best {result['best'] * 1000:10.1f} ms  "
+                  f"median {result['median'] * 1000:10.1f} ms  queries {result['queries']}")
+    finally:
+        teardown(old_name)
@@ -47,6 +47,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'microclimate_control_app.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,6 +55,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'microclimate_control_app.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'microclimate_control.urls'
@@ -158,3 +160,87 @@ CACHES = {
         'TIMEOUT': os.getenv('DEFAULT_CACHE_TIMEOUT'),
     }
 }
+
+# Data point ingestion
+# Maximum number of rows accepted by the bulk endpoint and the insert batch size
+
+DATA_POINT_BULK_MAX_ROWS = int(os.getenv('DATA_POINT_BULK_MAX_ROWS', '10000'))
+
+DATA_POINT_BULK_BATCH_SIZE = int(os.getenv('DATA_POINT_BULK_BATCH_SIZE', '1000'))
+
+# Streamed uploads are stored in chunks of this many rows, with at most this many row errors reported
+
+DATA_POINT_STREAM_CHUNK_SIZE = int(os.getenv('DATA_POINT_STREAM_CHUNK_SIZE', '5000'))
+
+DATA_POINT_STREAM_MAX_LINE_LENGTH = int(os.getenv('DATA_POINT_STREAM_MAX_LINE_LENGTH', '65536'))
+
+DATA_POINT_STREAM_MAX_ERRORS = int(os.getenv('DATA_POINT_STREAM_MAX_ERRORS', '100'))
+
+# Data point listings are paginated by (timestamp, id) with this default and maximum page size,
+# the columnar series formats allow larger pages
+
+DATA_POINT_PAGE_SIZE = int(os.getenv('DATA_POINT_PAGE_SIZE', '1000'))
+
+DATA_POINT_MAX_PAGE_SIZE = int(os.getenv('DATA_POINT_MAX_PAGE_SIZE', '10000'))
+
+DATA_POINT_SERIES_MAX_PAGE_SIZE = int(os.getenv('DATA_POINT_SERIES_MAX_PAGE_SIZE', '100000'))
+
+# Series read from rollups use the finest granularity that fits into this many buckets
+
+SERIES_MAX_POINTS = int(os.getenv('SERIES_MAX_POINTS', '1000'))
+
+# Compiled per-user access sets are cached for this many seconds and invalidated when permissions change
+
+ACCESS_SET_CACHE_TIMEOUT = int(os.getenv('ACCESS_SET_CACHE_TIMEOUT', '3600'))
+
+# Retention policies delete expired rows in batches of this size, rebuilding the rollups of
+# expiring raw data points this many days per transaction
+
+RETENTION_DELETE_BATCH_SIZE = int(os.getenv('RETENTION_DELETE_BATCH_SIZE', '5000'))
+
+RETENTION_REBUILD_DAYS = int(os.getenv('RETENTION_REBUILD_DAYS', '7'))
+
+# The ingest worker reads this many queued requests at a time, waiting this many milliseconds for new
+# ones, and reclaims requests a crashed worker left unacknowledged for this many milliseconds
+
+INGEST_QUEUE_READ_COUNT = int(os.getenv('INGEST_QUEUE_READ_COUNT', '100'))
+
+INGEST_QUEUE_BLOCK_MS = int(os.getenv('INGEST_QUEUE_BLOCK_MS', '5000'))
+
+INGEST_QUEUE_CLAIM_IDLE_MS = int(os.getenv('INGEST_QUEUE_CLAIM_IDLE_MS', '60000'))
+
+# Queued requests that could not be stored after this many deliveries are moved to the dead letter stream
+
+INGEST_QUEUE_MAX_DELIVERIES = int(os.getenv('INGEST_QUEUE_MAX_DELIVERIES', '5'))
+
+# Live data point streams send a heartbeat after this many idle seconds and end after this many
+# seconds, after which clients reconnect after this many milliseconds
+
+LIVE_STREAM_HEARTBEAT_SECONDS = int(os.getenv('LIVE_STREAM_HEARTBEAT_SECONDS', '15'))
+
+LIVE_STREAM_MAX_SECONDS = int(os.getenv('LIVE_STREAM_MAX_SECONDS', '300'))
+
+LIVE_STREAM_RETRY_MS = int(os.getenv('LIVE_STREAM_RETRY_MS', '1000'))
+
+# Stream tokens, which browsers pass in the query string because EventSource cannot send headers,
+# are accepted for this many seconds after they were issued
+
+LIVE_STREAM_TOKEN_SECONDS = int(os.getenv('LIVE_STREAM_TOKEN_SECONDS', '60'))
+
+# The /metrics endpoint accepts this bearer token when it is set, and otherwise only staff users
+
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# Profiles of requests of staff users are kept for this many seconds, with at most this many SQL
+# statements and the functions with this many highest cumulative times
+
+PROFILE_RESULT_TIMEOUT = int(os.getenv('PROFILE_RESULT_TIMEOUT', '86400'))
+
+PROFILE_MAX_STATEMENTS = int(os.getenv('PROFILE_MAX_STATEMENTS', '1000'))
+
+PROFILE_STATS_LIMIT = int(os.getenv('PROFILE_STATS_LIMIT', '50'))
+
+# Processes check at most every this many seconds whether the metrics, data types and devices they
+# keep in memory changed, and as soon as an unknown one is looked up
+
+REFERENCE_CACHE_CHECK_SECONDS = int(os.getenv('REFERENCE_CACHE_CHECK_SECONDS', '1'))
@@ -0,0 +1,225 @@
+import re
+from hashlib import sha1
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from .models import ProjectGrant, BuildingGrant
+
+APP_NAME = 'microclimate_control_app'
+
+CACHE_KEY_PREFIX = 'access:user:'
+
+# Legacy per-object permission codenames, still honoured next to the access grants. Deprecated:
+# migration 0006 converted them to grants, and they will stop granting access in the next major
+# release
+CODENAME_PATTERNS = {
+    ProjectGrant.ACCESS: re.compile(r'^can_access_project_(\d+)$'),
+    ProjectGrant.UPDATE: re.compile(r'^can_update_project_(\d+)$'),
+    'create_buildings': re.compile(r'^can_create_buildings_project_(\d+)$'),
+    'update_buildings': re.compile(r'^can_update_buildings_project_(\d+)$'),
+    'delete_buildings': re.compile(r'^can_delete_buildings_project_(\d+)$'),
+}
+
+BUILDING_CODENAME_PATTERN = re.compile(r'^can_access_project_(\d+)_building_(\d+)$')
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class AccessSet:
+    """
+    Compiled object permissions of a user.
+
+    The access grants of a user and the user's groups are loaded once into sets of project and
+    building IDs, so that permission checks and queryset filters are set lookups.
+
+    Attributes:
+        is_superuser (bool): Whether the user is an active superuser holding every permission.
+        projects (dict): Sets of project IDs keyed by the ProjectGrant actions.
+        buildings (dict): Sets of accessible building IDs keyed by project ID.
+    """
+
+    def __init__(self, is_superuser=False, projects=None, buildings=None):
+        self.is_superuser = is_superuser
+        self.projects = projects or {action: set() for action, _ in ProjectGrant.ACTIONS}
+        self.buildings = buildings or {}
+
+    @classmethod
+    def compile(cls, user):
+        """
+        Compile the access set of a user from the access grants and legacy codename permissions.
+
+        Args:
+            user: The user to compile the access set for.
+
+        Returns:
+            AccessSet: The compiled access set.
+        """
+        access = cls(is_superuser=user.is_active and user.is_superuser)
+        if not user.is_active:
+            return access
+
+        holder = Q(user=user) | Q(group__in=user.groups.values('id'))
+        for project_id, action in ProjectGrant.objects.filter(holder).values_list('project_id', 'action'):
+            access.projects[action].add(project_id)
+        building_grants = BuildingGrant.objects.filter(holder, building_object__project__isnull=False) \
+            .values_list('building_object__project_id', 'building_object_id')
+        for project_id, building_id in building_grants:
+            access.buildings.setdefault(project_id, set()).add(building_id)
+
+        access.add_permissions(user.get_all_permissions())
+        return access
+
+    def add_permissions(self, permissions):
+        """
+        Add legacy per-object codename permissions to the access set.
+
+        Deprecated: grant access with ProjectGrant and BuildingGrant instead. Codename permissions
+        created after migration 0006 ran are not converted, and they will be ignored from the
+        next major release on.
+
+        Args:
+            permissions: An iterable of permission strings in the 'app_label.codename' format.
+        """
+        for permission in permissions:
+            app_label, _, codename = permission.partition('.')
+            if app_label != APP_NAME:
+                continue
+            match = BUILDING_CODENAME_PATTERN.match(codename)
+            if match:
+                project_id, building_id = int(match.group(1)), int(match.group(2))
+                self.buildings.setdefault(project_id, set()).add(building_id)
+                continue
+            for action, pattern in CODENAME_PATTERNS.items():
+                match = pattern.match(codename)
+                if match:
+                    self.projects[action].add(int(match.group(1)))
+                    break
+
+    def fingerprint(self):
+        """
+        Get a digest of the access set that is equal for users with equal permissions.
+
+        Returns:
+            str: The hex digest.
+        """
+        projects = sorted((action, sorted(ids)) for action, ids in self.projects.items())
+        buildings = sorted((project_id, sorted(ids)) for project_id, ids in self.buildings.items())
+        return sha1(repr((self.is_superuser, projects, buildings)).encode('ascii')).hexdigest()
+
+    def has_project_permission(self, action, project_id):
+        """
+        Check if the user may perform an action on a project.
+
+        Args:
+            action (str): One of the ProjectGrant actions.
+            project_id: The ID of the project, possibly as a string from the URL.
+
+        Returns:
+            bool: True if the user has permission, False otherwise.
+        """
+        return self.is_superuser or _to_int(project_id) in self.projects[action]
+
+    def can_access_building(self, project_id, building_id):
+        """
+        Check if the user may access a single building object of a project.
+
+        Args:
+            project_id: The ID of the project, possibly as a string from the URL.
+            building_id: The ID of the building object, possibly as a string from the URL.
+
+        Returns:
+            bool: True if the user has permission, False otherwise.
+        """
+        return self.is_superuser or \
+            _to_int(building_id) in self.buildings.get(_to_int(project_id), ())
+
+    def building_ids(self, project_id):
+        """
+        Get the IDs of the building objects of a project the user was granted access to one by one.
+
+        Args:
+            project_id: The ID of the project, possibly as a string from the URL.
+
+        Returns:
+            set: The building object IDs.
+        """
+        return self.buildings.get(_to_int(project_id), set())
+
+
+def get_access_set(user):
+    """
+    Get the access set of a user, compiling and caching it on a miss.
+
+    The access set is memoized on the user object for the rest of the request and shared
+    between processes through the cache until the user's permissions change.
+
+    Args:
+        user: The authenticated user.
+
+    Returns:
+        AccessSet: The access set of the user.
+    """
+    if not user.is_authenticated:
+        return AccessSet()
+    access = getattr(user, '_access_set', None)
+    if access is not None:
+        return access
+
+    key = f'{CACHE_KEY_PREFIX}{user.pk}'
+    access = cache.get(key)
+    if access is None:
+        access = AccessSet.compile(user)
+        cache.set(key, access, settings.ACCESS_SET_CACHE_TIMEOUT)
+    user._access_set = access
+    return access
+
+
+async def aget_access_set(user):
+    """
+    Get the access set of a user from async code, compiling and caching it on a miss.
+
+    Args:
+        user: The authenticated user.
+
+    Returns:
+        AccessSet: The access set of the user.
+    """
+    if not user.is_authenticated:
+        return AccessSet()
+    access = getattr(user, '_access_set', None)
+    if access is not None:
+        return access
+
+    key = f'{CACHE_KEY_PREFIX}{user.pk}'
+    access = await cache.aget(key)
+    if access is None:
+        access = await sync_to_async(AccessSet.compile)(user)
+        await cache.aset(key, access, settings.ACCESS_SET_CACHE_TIMEOUT)
+    user._access_set = access
+    return access
+
+
+def invalidate(user_ids):
+    """
+    Drop the cached access sets of users once the current transaction is committed.
+
+    The user IDs are collected right away, so that members and holders are still found before
+    a deletion removes them. The access sets are only dropped after the commit, so that a
+    concurrent request cannot cache an access set built from the rows before the change.
+
+    Args:
+        user_ids: An iterable of user IDs.
+    """
+    keys = [f'{CACHE_KEY_PREFIX}{user_id}' for user_id in set(user_ids)]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
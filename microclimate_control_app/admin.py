@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Project, BuildingObject, DataPoint, User, DataType, Metric, Device
+from .models import Project, BuildingObject, DataPoint, User, DataType, Metric, Device, MinuteRollup, HourRollup, DayRollup, ProjectGrant, BuildingGrant, RetentionPolicy, DeviceStats
 
 admin.site.register(Project)
 admin.site.register(BuildingObject)
@@ -8,3 +8,10 @@ admin.site.register(User)
 admin.site.register(DataType)
 admin.site.register(Metric)
 admin.site.register(Device)
+admin.site.register(MinuteRollup)
+admin.site.register(HourRollup)
+admin.site.register(DayRollup)
+admin.site.register(ProjectGrant)
+admin.site.register(BuildingGrant)
+admin.site.register(RetentionPolicy)
+admin.site.register(DeviceStats)
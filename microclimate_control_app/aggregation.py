@@ -0,0 +1,88 @@
+from datetime import timezone as dt_timezone
+
+from django.db.models import Avg, Count, Max, Min
+from django.db.models.functions import Trunc
+
+BUCKETS = ('minute', 'hour', 'day', 'week', 'month')
+
+FUNCTIONS = {
+    'avg': lambda: Avg('value'),
+    'min': lambda: Min('value'),
+    'max': lambda: Max('value'),
+    'count': lambda: Count('id'),
+}
+
+# first and last are resolved from the timestamps of the earliest and latest point of each bucket
+POSITIONAL_FUNCTIONS = {
+    'first': Min,
+    'last': Max,
+}
+
+LOOKUP_CHUNK_SIZE = 500
+
+
+def aggregate(queryset, bucket, functions, group_by=('data_type',)):
+    """
+    Aggregate data points per time bucket in the database.
+
+    Data points are grouped by the group_by fields and their timestamp truncated to the UTC
+    bucket. 'avg', 'min', 'max' and 'count' are computed by the GROUP BY query itself, while
+    'first' and 'last' take one more query looking up the values at the earliest and latest
+    timestamps of each bucket.
+
+    Args:
+        queryset: The already filtered queryset of data points.
+        bucket (str): One of BUCKETS.
+        functions (list): Names from FUNCTIONS and POSITIONAL_FUNCTIONS.
+        group_by (tuple): The fields to group by besides the bucket.
+
+    Returns:
+        list: Dicts with the group_by fields, 'bucket' and one key per function,
+              ordered by the group_by fields and bucket.
+    """
+    annotations = {name: FUNCTIONS[name]() for name in functions if name in FUNCTIONS}
+    annotations.update({f'{name}_timestamp': POSITIONAL_FUNCTIONS[name]('timestamp')
+                        for name in functions if name in POSITIONAL_FUNCTIONS})
+
+    rows = list(
+        queryset
+        .annotate(bucket=Trunc('timestamp', bucket, tzinfo=dt_timezone.utc))
+        .values(*group_by, 'bucket')
+        .annotate(**annotations)
+        .order_by(*group_by, 'bucket')
+    )
+
+    positional = [name for name in functions if name in POSITIONAL_FUNCTIONS]
+    if positional and rows:
+        values = _values_at(queryset, group_by, {
+            row[f'{name}_timestamp'] for row in rows for name in positional})
+        for row in rows:
+            group = tuple(row[field] for field in group_by)
+            for name in positional:
+                first, last = values[group + (row.pop(f'{name}_timestamp'),)]
+                row[name] = first if name == 'first' else last
+
+    return rows
+
+
+def _values_at(queryset, group_by, timestamps):
+    """
+    Look up the values of data points at the given timestamps.
+
+    Args:
+        queryset: The already filtered queryset of data points.
+        group_by (tuple): The fields identifying a group.
+        timestamps (set): The timestamps to look up.
+
+    Returns:
+        dict: The (first, last) values by ID for every (group..., timestamp) key.
+    """
+    values = {}
+    timestamps = sorted(timestamps)
+    for offset in range(0, len(timestamps), LOOKUP_CHUNK_SIZE):
+        points = queryset.filter(timestamp__in=timestamps[offset:offset + LOOKUP_CHUNK_SIZE]) \
+            .order_by('id').values_list(*group_by, 'timestamp', 'value')
+        for *key, value in points:
+            key = tuple(key)
+            values[key] = (values[key][0], value) if key in values else (value, value)
+    return values
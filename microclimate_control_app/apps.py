@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MicroclimateControlAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'microclimate_control_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,255 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated, NotFound, PermissionDenied
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from . import latest as latest_readings, live, reference
+from .access import aget_access_set
+from .caching import aresponse_cache_key
+from .connections import get_async_redis
+from .filters import DataPointFilterBackend
+from .models import BuildingObject, DataPoint, Project, ProjectGrant, User
+from .pagination import TimestampCursorPagination
+from .permissions import CanAccessBuildingContent
+from .serializers import BuildingObjectSerializer, DataPointReadSerializer
+from .views import DEFAULT_CACHE_TIMEOUT
+
+
+class AsyncAPIView(View):
+    """
+    Base class of the async read-only views served under the /async/ prefix.
+
+    Requests are authenticated with the same JWTs as the REST API and checked with the same
+    permission classes. The access set of the user is loaded with async cache calls before
+    the permission classes run, so they do not block the event loop.
+
+    Attributes:
+        permission_classes (list): The permission classes applied to the view.
+    """
+
+    http_method_names = ['get']
+    permission_classes = [IsAuthenticated]
+    authentication = JWTAuthentication()
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            request.user = await self.authenticate(request)
+            await self.check_permissions(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            return self.handle_exception(request, exc)
+
+    async def authenticate(self, request):
+        """
+        Authenticate the request by its bearer token.
+
+        Args:
+            request: The incoming HTTP request.
+
+        Returns:
+            The authenticated user, the user a profiled request runs as, or an AnonymousUser if
+            no token was given.
+
+        Raises:
+            AuthenticationFailed: If the token is invalid or its user is inactive.
+        """
+        forced = getattr(request, '_force_auth_user', None)
+        if forced is not None:
+            return forced
+        header = self.authentication.get_header(request)
+        raw_token = self.authentication.get_raw_token(header) if header is not None else None
+        if raw_token is None:
+            return AnonymousUser()
+        token = self.authentication.get_validated_token(raw_token)
+        return await sync_to_async(self.authentication.get_user)(token)
+
+    async def check_permissions(self, request):
+        """
+        Check the permission classes of the view.
+
+        Args:
+            request: The incoming HTTP request.
+
+        Raises:
+            NotAuthenticated: If an anonymous user is denied.
+            PermissionDenied: If an authenticated user is denied.
+        """
+        await aget_access_set(request.user)
+        for permission in self.permission_classes:
+            if not permission().has_permission(request, self):
+                if not request.user.is_authenticated:
+                    raise NotAuthenticated()
+                raise PermissionDenied()
+
+    async def get_building(self, project_pk, object_pk):
+        """
+        Get the building object of the URL.
+
+        Args:
+            project_pk: The ID of the project in the URL.
+            object_pk: The ID of the building object in the URL.
+
+        Returns:
+            BuildingObject: The building object.
+
+        Raises:
+            NotFound: If the building object does not exist or belongs to another project.
+        """
+        try:
+            return await BuildingObject.objects.aget(id=object_pk, project_id=project_pk)
+        except BuildingObject.DoesNotExist:
+            raise NotFound()
+
+    def handle_exception(self, request, exc):
+        response = JsonResponse(exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail},
+                                status=exc.status_code, encoder=JSONEncoder, safe=False)
+        if exc.status_code == 401:
+            response['WWW-Authenticate'] = self.authentication.authenticate_header(request)
+        return response
+
+    def respond(self, data, status=200):
+        return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+class AsyncBuildingObjectListView(AsyncAPIView):
+    """
+    Async list of the building objects of a project, cached like the REST listing.
+    """
+
+    async def get(self, request, project_pk):
+        key = await aresponse_cache_key(request, ('project', 'building_object'))
+        cached = await cache.aget(key)
+        if cached is not None:
+            request.response_cache = 'hit'
+            return self.respond(cached)
+        request.response_cache = 'miss'
+
+        access = await aget_access_set(request.user)
+        if request.user.is_staff or access.has_project_permission(ProjectGrant.ACCESS, project_pk):
+            if not await Project.objects.filter(id=project_pk).aexists():
+                raise NotFound()
+            queryset = BuildingObject.objects.filter(project_id=project_pk)
+        else:
+            queryset = BuildingObject.objects.filter(id__in=access.building_ids(project_pk))
+
+        buildings = [building async for building in queryset.prefetch_related('users')]
+        data = BuildingObjectSerializer(buildings, many=True).data
+        await cache.aset(key, data, DEFAULT_CACHE_TIMEOUT)
+        return self.respond(data)
+
+
+class AsyncDataPointListView(AsyncAPIView):
+    """
+    Async data point listing with the filters and cursor pagination of the REST listing.
+    """
+
+    permission_classes = [IsAdminUser | CanAccessBuildingContent]
+
+    async def get(self, request, project_pk, object_pk):
+        building = await self.get_building(project_pk, object_pk)
+        drf_request = Request(request)
+        queryset = DataPointReadSerializer.values(DataPoint.objects.filter(building_object_id=building.id))
+        queryset = DataPointFilterBackend().filter_queryset(drf_request, queryset, self)
+
+        paginator = TimestampCursorPagination()
+        page = await paginator.apaginate_queryset(queryset, drf_request, self)
+        snapshot = await reference.aget(data_types={row['data_type'] for row in page})
+        return self.respond({'next': paginator.get_next_link(),
+                             'results': DataPointReadSerializer(page, many=True, context={'reference': snapshot}).data})
+
+
+class AsyncLatestView(AsyncAPIView):
+    """
+    Async current reading of every data type of a building object.
+    """
+
+    permission_classes = [IsAdminUser | CanAccessBuildingContent]
+
+    async def get(self, request, project_pk, object_pk):
+        building = await self.get_building(project_pk, object_pk)
+        readings = await latest_readings.aget(building.id)
+        snapshot = await reference.aget(data_types=readings)
+        return self.respond([
+            {
+                'data_type': data_type_id,
+                'data_type_name': snapshot.data_type_name(data_type_id),
+                'metric_name': snapshot.metric_name(data_type_id),
+                'value': reading['value'],
+                'timestamp': reading['timestamp'],
+                'device': reading['device'],
+            }
+            for data_type_id, reading in sorted(readings.items())
+            if data_type_id in snapshot.data_types
+        ])
+
+
+class AsyncLiveView(AsyncAPIView):
+    """
+    Server-Sent Events stream pushing the data points of a building object as they are stored.
+
+    Every stored batch is sent as one 'datapoints' event holding a JSON list of data points.
+    Browsers cannot send headers with EventSource, so the stream also accepts a token issued
+    by AsyncLiveTokenView in the token query parameter.
+    """
+
+    permission_classes = [IsAdminUser | CanAccessBuildingContent]
+
+    async def authenticate(self, request):
+        """
+        Authenticate the request by its stream token or, without one, by its bearer token.
+
+        Args:
+            request: The incoming HTTP request.
+
+        Returns:
+            The authenticated user, or an AnonymousUser if no token was given.
+
+        Raises:
+            AuthenticationFailed: If a token is invalid, expired or issued for another building
+                                  object, or its user is inactive.
+        """
+        token = request.GET.get('token')
+        if token is None:
+            return await super().authenticate(request)
+        user_id = live.read_token(token, self.kwargs['object_pk'])
+        if user_id is None:
+            raise AuthenticationFailed('Invalid or expired stream token.')
+        try:
+            return await User.objects.aget(id=user_id, is_active=True)
+        except User.DoesNotExist:
+            raise AuthenticationFailed('Invalid or expired stream token.')
+
+    async def get(self, request, project_pk, object_pk):
+        building = await self.get_building(project_pk, object_pk)
+        redis = get_async_redis()
+        if redis is None:
+            return self.respond({'detail': 'Live updates are not available.'},
+                                status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        response = StreamingHttpResponse(live.events(redis, building.id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class AsyncLiveTokenView(AsyncAPIView):
+    """
+    Issue a short-lived token opening the live stream of a building object with EventSource.
+
+    The token is checked when the stream is opened, so it has to be fetched again before
+    reconnecting once it expired.
+    """
+
+    permission_classes = [IsAdminUser | CanAccessBuildingContent]
+
+    async def get(self, request, project_pk, object_pk):
+        building = await self.get_building(project_pk, object_pk)
+        return self.respond({'token': live.issue_token(request.user.id, building.id),
+                             'expires_in': settings.LIVE_STREAM_TOKEN_SECONDS})
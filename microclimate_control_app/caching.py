@@ -0,0 +1,150 @@
+import time
+from functools import wraps
+from hashlib import sha1
+
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+from .access import aget_access_set, get_access_set
+
+GENERATION_KEY_PREFIX = 'generation:'
+
+RESPONSE_KEY_PREFIX = 'response:'
+
+
+def get_generations(resources):
+    """
+    Get the current generation counters of resources, initializing missing ones.
+
+    A missing counter starts from the current time rather than zero, so that responses
+    cached under an evicted counter are never served again.
+
+    Args:
+        resources: An iterable of resource names.
+
+    Returns:
+        list: The generation counters in the order of the resources.
+    """
+    keys = [f'{GENERATION_KEY_PREFIX}{resource}' for resource in resources]
+    generations = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in generations}
+    if missing:
+        cache.set_many(missing, None)
+        generations.update(missing)
+    return [generations[key] for key in keys]
+
+
+async def aget_generations(resources):
+    """
+    Get the current generation counters of resources from async code, initializing missing ones.
+
+    Args:
+        resources: An iterable of resource names.
+
+    Returns:
+        list: The generation counters in the order of the resources.
+    """
+    keys = [f'{GENERATION_KEY_PREFIX}{resource}' for resource in resources]
+    generations = await cache.aget_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in generations}
+    if missing:
+        await cache.aset_many(missing, None)
+        generations.update(missing)
+    return [generations[key] for key in keys]
+
+
+def bump_generation(resource):
+    """
+    Advance the generation counter of a resource once the current transaction is committed,
+    invalidating every response built from it.
+
+    Advancing it before the commit would let a concurrent request cache a response built from
+    the rows before the change under the new generation, where it would be served until it expires.
+
+    Args:
+        resource (str): The resource name.
+    """
+    key = f'{GENERATION_KEY_PREFIX}{resource}'
+
+    def bump():
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+    transaction.on_commit(bump)
+
+
+def response_cache_key(request, resources):
+    """
+    Build the cache key of a response.
+
+    Users with the same access set share cached responses, while any change of their
+    permissions or of the resources the response is built from leads to a new key.
+
+    Args:
+        request: The incoming HTTP request.
+        resources: The names of the resources the response is built from.
+
+    Returns:
+        str: The cache key.
+    """
+    return _build_key(request, get_access_set(request.user), get_generations(resources))
+
+
+async def aresponse_cache_key(request, resources):
+    """
+    Build the cache key of a response from async code.
+
+    Args:
+        request: The incoming HTTP request.
+        resources: The names of the resources the response is built from.
+
+    Returns:
+        str: The cache key.
+    """
+    return _build_key(request, await aget_access_set(request.user), await aget_generations(resources))
+
+
+def _build_key(request, access, generations):
+    parts = [
+        access.fingerprint(),
+        'staff' if request.user.is_staff else 'user',
+        *map(str, generations),
+        request.get_full_path(),
+    ]
+    return f'{RESPONSE_KEY_PREFIX}{sha1("|".join(parts).encode("utf-8")).hexdigest()}'
+
+
+def cache_response(*resources, timeout=None):
+    """
+    Decorator caching the successful responses of a viewset method.
+
+    The wrapped method runs after authentication and permission checks, so only the
+    response data is shared. Whether a request was served from the cache is recorded
+    in the response_cache attribute of the request.
+
+    Args:
+        resources: The names of the resources the response is built from.
+        timeout (int): The cache timeout in seconds, or None for the cache default.
+
+    Returns:
+        function: The decorator.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            key = response_cache_key(request, resources)
+            cached = cache.get(key)
+            if cached is not None:
+                request._request.response_cache = 'hit'
+                return Response(cached)
+
+            request._request.response_cache = 'miss'
+            response = method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, timeout)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis import asyncio as redis_asyncio
+
+
+def get_redis():
+    """
+    Get the raw Redis client behind the default cache.
+
+    Returns:
+        Redis: The Redis client, or None if the default cache is not backed by Redis.
+    """
+    try:
+        return get_redis_connection('default')
+    except NotImplementedError:
+        return None
+
+
+def get_async_redis():
+    """
+    Create an asyncio Redis client connected to the server behind the default cache.
+
+    The caller owns the client and has to close it.
+
+    Returns:
+        Redis: The asyncio Redis client, or None if the default cache is not backed by Redis.
+    """
+    if get_redis() is None:
+        return None
+    location = settings.CACHES['default']['LOCATION']
+    if isinstance(location, (list, tuple)):
+        location = location[0]
+    return redis_asyncio.from_url(location)
@@ -0,0 +1,222 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Min
+
+from .models import DataPoint, DeviceStats
+
+LOOKUP_CHUNK_SIZE = 500
+
+
+def _accumulate(counters, point):
+    """
+    Fold a single data point into the counters of its device and data type.
+
+    Args:
+        counters (dict): Counters keyed by (device_id, data_type_id).
+        point: A DataPoint instance.
+    """
+    key = (point.device_id, point.data_type_id)
+    counter = counters.get(key)
+    if counter is None:
+        counters[key] = {'count': 1, 'first_timestamp': point.timestamp, 'last_timestamp': point.timestamp,
+                         'last_value': point.value, 'last_building_object_id': point.building_object_id}
+        return
+    counter['count'] += 1
+    counter['first_timestamp'] = min(counter['first_timestamp'], point.timestamp)
+    if point.timestamp >= counter['last_timestamp']:
+        counter.update(last_timestamp=point.timestamp, last_value=point.value,
+                       last_building_object_id=point.building_object_id)
+
+
+def _merge(stats, counter):
+    """
+    Merge the counters of newly stored data points into an existing row.
+
+    Args:
+        stats: A DeviceStats instance.
+        counter (dict): The counters to merge in.
+    """
+    stats.count += counter['count']
+    stats.first_timestamp = min(stats.first_timestamp, counter['first_timestamp'])
+    if counter['last_timestamp'] >= stats.last_timestamp:
+        stats.last_timestamp = counter['last_timestamp']
+        stats.last_value = counter['last_value']
+        stats.last_building_object_id = counter['last_building_object_id']
+
+
+def _upsert(counters):
+    """
+    Add counters to the rows of their devices and data types, creating missing rows.
+
+    Args:
+        counters (dict): Counters keyed by (device_id, data_type_id).
+    """
+    existing = DeviceStats.objects.select_for_update().filter(
+        device_id__in={device_id for device_id, _ in counters},
+        data_type_id__in={data_type_id for _, data_type_id in counters},
+    )
+
+    updated = []
+    for stats in existing:
+        counter = counters.get((stats.device_id, stats.data_type_id))
+        if counter is not None:
+            _merge(stats, counter)
+            updated.append(stats)
+    DeviceStats.objects.bulk_update(
+        updated, ['count', 'first_timestamp', 'last_timestamp', 'last_value', 'last_building_object'])
+
+    existing_keys = {(stats.device_id, stats.data_type_id) for stats in updated}
+    DeviceStats.objects.bulk_create([
+        DeviceStats(device_id=device_id, data_type_id=data_type_id, **counter)
+        for (device_id, data_type_id), counter in counters.items()
+        if (device_id, data_type_id) not in existing_keys
+    ])
+
+
+def record(points):
+    """
+    Update the device statistics with newly stored data points.
+
+    Args:
+        points: An iterable of stored DataPoint instances.
+    """
+    counters = {}
+    for point in points:
+        _accumulate(counters, point)
+    if not counters:
+        return
+    try:
+        with transaction.atomic():
+            _upsert(counters)
+    except IntegrityError:
+        # Another writer created one of the rows concurrently, so it now exists to merge into
+        with transaction.atomic():
+            _upsert(counters)
+
+
+def revise(previous, current=None):
+    """
+    Update the device statistics after a stored data point was changed or deleted.
+
+    The old reading is taken out of the row of its device and data type and the new one is
+    added like a newly stored data point. Only if the old reading was the first or the latest
+    one of its row, the new boundary is looked up, along the (device, timestamp) index.
+
+    Args:
+        previous (DataPoint): The data point as it was stored before the change.
+        current (DataPoint): The data point as it is stored now, or None if it was deleted.
+    """
+    with transaction.atomic():
+        stats = DeviceStats.objects.select_for_update() \
+            .filter(device_id=previous.device_id, data_type_id=previous.data_type_id).first()
+        if stats is not None:
+            stats.count -= 1
+            points = DataPoint.objects.filter(device_id=previous.device_id, data_type_id=previous.data_type_id)
+            if stats.count and previous.timestamp <= stats.first_timestamp:
+                stats.first_timestamp = points.order_by('timestamp', 'id').values_list('timestamp', flat=True).first()
+            if stats.count and previous.timestamp >= stats.last_timestamp:
+                last = points.order_by('-timestamp', '-id').values_list('timestamp', 'value', 'building_object').first()
+                if last is None:
+                    stats.count = 0
+                else:
+                    stats.last_timestamp, stats.last_value, stats.last_building_object_id = last
+            if stats.count and stats.first_timestamp is not None:
+                stats.save(update_fields=['count', 'first_timestamp', 'last_timestamp', 'last_value',
+                                          'last_building_object'])
+            else:
+                stats.delete()
+        if current is not None:
+            record([current])
+
+
+def rebuild(device_ids=None):
+    """
+    Recompute the device statistics from the data points.
+
+    The counts and time ranges are computed with one GROUP BY query, and the latest values
+    are looked up by their timestamps in chunks.
+
+    Args:
+        device_ids: The IDs of the devices to rebuild, or None to rebuild all devices.
+
+    Returns:
+        int: The number of rebuilt rows.
+    """
+    queryset = DataPoint.objects.all()
+    if device_ids is not None:
+        queryset = queryset.filter(device_id__in=device_ids)
+    groups = {
+        (row['device'], row['data_type']): row
+        for row in queryset.values('device', 'data_type').annotate(
+            count=Count('id'), first_timestamp=Min('timestamp'), last_timestamp=Max('timestamp')
+        ).order_by()
+    }
+
+    latest = {}
+    timestamps = sorted({row['last_timestamp'] for row in groups.values()})
+    for offset in range(0, len(timestamps), LOOKUP_CHUNK_SIZE):
+        points = queryset.filter(timestamp__in=timestamps[offset:offset + LOOKUP_CHUNK_SIZE]) \
+            .order_by('id').values_list('device', 'data_type', 'timestamp', 'value', 'building_object')
+        for device_id, data_type_id, timestamp, value, building_id in points:
+            group = groups.get((device_id, data_type_id))
+            if group is not None and group['last_timestamp'] == timestamp:
+                latest[device_id, data_type_id] = (value, building_id)
+
+    with transaction.atomic():
+        stale = DeviceStats.objects.all()
+        if device_ids is not None:
+            stale = stale.filter(device_id__in=device_ids)
+        stale.delete()
+        DeviceStats.objects.bulk_create([
+            DeviceStats(device_id=device_id, data_type_id=data_type_id, count=row['count'],
+                        first_timestamp=row['first_timestamp'], last_timestamp=row['last_timestamp'],
+                        last_value=latest[device_id, data_type_id][0],
+                        last_building_object_id=latest[device_id, data_type_id][1])
+            for (device_id, data_type_id), row in groups.items()
+        ], batch_size=1000)
+    return len(groups)
+
+
+def summary(device):
+    """
+    Summarize the reporting of a device from its statistics.
+
+    The reading rate of a data type is the number of readings per hour between its first
+    and latest reading.
+
+    Args:
+        device: The Device instance, with its data_collected prefetched.
+
+    Returns:
+        dict: The last time the device was seen, where, its total number of readings and reading
+              rate, the statistics of every reported data type, and the IDs of the data types it
+              should collect but never reported and of those it reported without being expected to.
+    """
+    stats = list(device.stats.order_by('data_type_id'))
+    expected = {data_type.id for data_type in device.data_collected.all()}
+    reported = {row.data_type_id for row in stats}
+    latest = max(stats, key=lambda row: row.last_timestamp, default=None)
+
+    data_types = []
+    for row in stats:
+        hours = (row.last_timestamp - row.first_timestamp).total_seconds() / 3600
+        data_types.append({
+            'data_type': row.data_type_id,
+            'count': row.count,
+            'first_timestamp': row.first_timestamp,
+            'last_timestamp': row.last_timestamp,
+            'last_value': row.last_value,
+            'readings_per_hour': (row.count - 1) / hours if hours else None,
+            'expected': row.data_type_id in expected,
+        })
+
+    return {
+        'device': device.id,
+        'name': device.name,
+        'last_seen': latest.last_timestamp if latest else None,
+        'last_building_object': latest.last_building_object_id if latest else None,
+        'count': sum(row.count for row in stats),
+        'readings_per_hour': sum(data_type['readings_per_hour'] or 0 for data_type in data_types),
+        'data_types': data_types,
+        'missing_data_types': sorted(expected - reported),
+        'unexpected_data_types': sorted(reported - expected),
+    }
@@ -0,0 +1,87 @@
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+def parse_datetime_param(request, name):
+    """
+    Parse an optional ISO 8601 datetime query parameter.
+
+    Args:
+        request: The incoming HTTP request.
+        name (str): The name of the query parameter.
+
+    Returns:
+        datetime: The aware datetime, or None if the parameter is not given.
+
+    Raises:
+        ValidationError: If the parameter is not a valid datetime.
+    """
+    raw = request.query_params.get(name)
+    if not raw:
+        return None
+    try:
+        value = parse_datetime(raw)
+    except ValueError:
+        value = None
+    if value is None:
+        raise ValidationError({name: ['Datetime has wrong format. Use ISO 8601.']})
+    return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+
+def parse_int_param(request, name):
+    """
+    Parse an optional integer query parameter.
+
+    Args:
+        request: The incoming HTTP request.
+        name (str): The name of the query parameter.
+
+    Returns:
+        int: The parsed integer, or None if the parameter is not given.
+
+    Raises:
+        ValidationError: If the parameter is not a valid integer.
+    """
+    raw = request.query_params.get(name)
+    if not raw:
+        return None
+    try:
+        return int(raw)
+    except ValueError:
+        raise ValidationError({name: ['A valid integer is required.']})
+
+
+class DataPointFilterBackend(BaseFilterBackend):
+    """
+    Filter backend narrowing data points by time range, data type and device.
+
+    Supported query parameters are 'from' (inclusive) and 'to' (exclusive) as ISO 8601
+    datetimes, and 'data_type' and 'device' as IDs.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        """
+        Apply the query parameter filters to the queryset.
+
+        Args:
+            request: The incoming HTTP request.
+            queryset: The queryset of data points to filter.
+            view: The view associated with the request.
+
+        Returns:
+            queryset: The filtered queryset.
+        """
+        start, end = parse_datetime_param(request, 'from'), parse_datetime_param(request, 'to')
+        data_type_id, device_id = parse_int_param(request, 'data_type'), parse_int_param(request, 'device')
+
+        if start is not None:
+            queryset = queryset.filter(timestamp__gte=start)
+        if end is not None:
+            queryset = queryset.filter(timestamp__lt=end)
+        if data_type_id is not None:
+            queryset = queryset.filter(data_type_id=data_type_id)
+        if device_id is not None:
+            queryset = queryset.filter(device_id=device_id)
+        return queryset
@@ -0,0 +1,310 @@
+import csv
+import json
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import device_stats, latest, live, reference, rollups
+from .models import DataPoint
+
+# Error of a data point whose data type is not in the data_collected of its device
+INCOMPATIBLE_MESSAGE = 'Device {device} does not collect data type {data_type}.'
+
+
+class MalformedRow:
+    """
+    Placeholder for a streamed row that could not be decoded.
+
+    Attributes:
+        message (str): The reason the row could not be decoded.
+    """
+
+    def __init__(self, message):
+        self.message = message
+
+
+def parse_row(row):
+    """
+    Parse a single raw data point row without touching the database.
+
+    Args:
+        row: The raw row, expected to be a mapping with 'data_type', 'device', 'value'
+             and an optional 'timestamp'.
+
+    Returns:
+        tuple: The parsed values as a dict (or None) and a dict of field errors.
+    """
+    if isinstance(row, MalformedRow):
+        return None, {'non_field_errors': [row.message]}
+    if not isinstance(row, dict):
+        return None, {'non_field_errors': ['Expected an object.']}
+
+    parsed, errors = {}, {}
+    for field in ('data_type', 'device'):
+        raw = row.get(field)
+        if raw in (None, ''):
+            errors[field] = ['This field is required.']
+            continue
+        try:
+            if isinstance(raw, bool):
+                raise TypeError
+            parsed[field] = int(raw)
+        except (TypeError, ValueError):
+            errors[field] = ['A valid integer is required.']
+
+    raw = row.get('value')
+    if raw in (None, ''):
+        errors['value'] = ['This field is required.']
+    else:
+        try:
+            if isinstance(raw, bool):
+                raise TypeError
+            value = float(raw)
+        except (TypeError, ValueError):
+            errors['value'] = ['A valid number is required.']
+        else:
+            if math.isfinite(value):
+                parsed['value'] = value
+            else:
+                errors['value'] = ['A finite number is required.']
+
+    raw = row.get('timestamp')
+    if raw in (None, ''):
+        parsed['timestamp'] = timezone.now()
+    else:
+        try:
+            timestamp = parse_datetime(raw) if isinstance(raw, str) else None
+        except ValueError:
+            timestamp = None
+        if timestamp is None:
+            errors['timestamp'] = ['Datetime has wrong format. Use ISO 8601.']
+        else:
+            if timezone.is_naive(timestamp):
+                timestamp = timezone.make_aware(timestamp)
+            parsed['timestamp'] = timestamp
+
+    return (None, errors) if errors else (parsed, {})
+
+
+def validate_rows(rows, building_id, start_index=0):
+    """
+    Validate raw data point rows for a building object.
+
+    Field types are checked per row in plain Python. The data type and device foreign keys,
+    and whether the device collects the data type, are looked up in the reference data cached
+    by the process, so no queries are made.
+
+    Args:
+        rows: An iterable of raw rows.
+        building_id: The ID of the building object the rows belong to.
+        start_index: The index reported for the first row in error messages.
+
+    Returns:
+        tuple: A list of unsaved DataPoint instances and a list of per-row errors,
+               each error being a dict with 'index' and 'errors' keys.
+    """
+    parsed_rows, errors = [], []
+    for index, row in enumerate(rows, start=start_index):
+        parsed, row_errors = parse_row(row)
+        if row_errors:
+            errors.append({'index': index, 'errors': row_errors})
+        else:
+            parsed_rows.append((index, parsed))
+
+    snapshot = reference.get(data_types={parsed['data_type'] for _, parsed in parsed_rows},
+                             devices={parsed['device'] for _, parsed in parsed_rows},
+                             readings={(parsed['device'], parsed['data_type']) for _, parsed in parsed_rows})
+
+    points = []
+    for index, parsed in parsed_rows:
+        row_errors = {}
+        if parsed['data_type'] not in snapshot.data_types:
+            row_errors['data_type'] = [
+                f'Invalid pk "{parsed["data_type"]}" - object does not exist.']
+        if parsed['device'] not in snapshot.devices:
+            row_errors['device'] = [
+                f'Invalid pk "{parsed["device"]}" - object does not exist.']
+        if not row_errors and not snapshot.collects(parsed['device'], parsed['data_type']):
+            row_errors['data_type'] = [
+                INCOMPATIBLE_MESSAGE.format(device=parsed['device'], data_type=parsed['data_type'])]
+        if row_errors:
+            errors.append({'index': index, 'errors': row_errors})
+            continue
+        points.append(DataPoint(
+            timestamp=parsed['timestamp'],
+            value=parsed['value'],
+            data_type_id=parsed['data_type'],
+            device_id=parsed['device'],
+            building_object_id=building_id,
+        ))
+
+    errors.sort(key=lambda error: error['index'])
+    return points, errors
+
+
+def store(points):
+    """
+    Write validated data points to the database with a bulk insert.
+
+    The rollups of the affected buckets and the device statistics are updated in the same
+    transaction. Once the transaction is committed, the latest readings are updated and the
+    data points are published to live subscribers.
+
+    Args:
+        points: A list of unsaved DataPoint instances.
+
+    Returns:
+        list: The stored DataPoint instances.
+    """
+    if not points:
+        return []
+    with transaction.atomic():
+        stored = DataPoint.objects.bulk_create(points, batch_size=settings.DATA_POINT_BULK_BATCH_SIZE)
+        rollups.record(stored)
+        device_stats.record(stored)
+        transaction.on_commit(lambda: latest.record(stored))
+        transaction.on_commit(lambda: live.publish(stored))
+    return stored
+
+
+def revise(previous, current=None):
+    """
+    Update the data derived from a data point after it was changed or deleted.
+
+    The days of the rollups holding the old and the new reading are rebuilt from the data
+    points and the old reading is replaced in the device statistics, in the same transaction
+    as the change. Once it is committed, the latest readings of the building objects are reloaded.
+
+    Args:
+        previous (DataPoint): The data point as it was stored before the change.
+        current (DataPoint): The data point as it is stored now, or None if it was deleted.
+    """
+    points = [point for point in (previous, current) if point is not None]
+    with transaction.atomic():
+        for building_id, data_type_id, day in {
+            (point.building_object_id, point.data_type_id, rollups.truncate(point.timestamp, 'day'))
+            for point in points
+        }:
+            rollups.rebuild(day, day + timedelta(days=1), building_id=building_id, data_type_id=data_type_id)
+        device_stats.revise(previous, current)
+        building_ids = {point.building_object_id for point in points}
+        transaction.on_commit(lambda: latest.refresh(building_ids))
+
+
+def iter_lines(stream, max_length):
+    """
+    Read a byte stream line by line without buffering the whole body.
+
+    Args:
+        stream: A file-like object supporting readline.
+        max_length: The maximum accepted length of a single line in bytes.
+
+    Yields:
+        str: Decoded lines without the trailing newline, or a MalformedRow for lines
+             that are too long or not valid UTF-8.
+    """
+    while True:
+        line = stream.readline(max_length + 1)
+        if not line:
+            return
+        if len(line) > max_length and not line.endswith(b'\n'):
+            while line and not line.endswith(b'\n'):
+                line = stream.readline(max_length + 1)
+            yield MalformedRow(f'Line is longer than {max_length} bytes.')
+            continue
+        try:
+            yield line.decode('utf-8').rstrip('\r\n')
+        except UnicodeDecodeError:
+            yield MalformedRow('Line is not valid UTF-8.')
+
+
+def iter_ndjson(lines):
+    """
+    Decode newline-delimited JSON rows, skipping blank lines.
+
+    Args:
+        lines: An iterable of lines as produced by iter_lines.
+
+    Yields:
+        The decoded rows, or a MalformedRow for lines that are not valid JSON.
+    """
+    for line in lines:
+        if isinstance(line, MalformedRow):
+            yield line
+        elif line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield MalformedRow('Line is not valid JSON.')
+
+
+def iter_csv(lines):
+    """
+    Decode CSV rows using the first line as the header, skipping blank lines.
+
+    Args:
+        lines: An iterable of lines as produced by iter_lines.
+
+    Yields:
+        The decoded rows keyed by the header columns, or a MalformedRow for lines
+        that cannot be decoded.
+    """
+    header = None
+    for line in lines:
+        if isinstance(line, MalformedRow):
+            yield line
+            continue
+        if not line.strip():
+            continue
+        try:
+            values = next(csv.reader([line]))
+        except csv.Error:
+            yield MalformedRow('Line is not valid CSV.')
+            continue
+        if header is None:
+            header = [column.strip() for column in values]
+        elif len(values) != len(header):
+            yield MalformedRow(f'Expected {len(header)} columns, got {len(values)}.')
+        else:
+            yield dict(zip(header, values))
+
+
+def ingest_stream(rows, building_id, chunk_size, max_errors):
+    """
+    Validate and store a stream of raw rows in fixed-size chunks.
+
+    Each chunk is validated and committed on its own, so memory use does not depend
+    on the size of the upload and rows stored before a failure stay stored.
+
+    Args:
+        rows: An iterable of raw rows.
+        building_id: The ID of the building object the rows belong to.
+        chunk_size: The number of rows validated and inserted at a time.
+        max_errors: The maximum number of row errors included in the summary.
+
+    Returns:
+        dict: A summary with the number of accepted and rejected rows and the first errors.
+    """
+    summary = {'accepted': 0, 'rejected': 0, 'errors': []}
+
+    def flush(chunk, start_index):
+        points, errors = validate_rows(chunk, building_id, start_index)
+        summary['accepted'] += len(store(points))
+        summary['rejected'] += len(errors)
+        summary['errors'].extend(errors[:max_errors - len(summary['errors'])])
+
+    chunk, start_index = [], 0
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            flush(chunk, start_index)
+            start_index += len(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk, start_index)
+
+    return summary
@@ -0,0 +1,229 @@
+import json
+import logging
+
+from redis.exceptions import RedisError, ResponseError
+
+from .connections import get_redis
+from .ingest import parse_row, validate_rows, store
+from .models import BuildingObject
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEY = 'ingest:datapoints'
+DEAD_LETTER_KEY = 'ingest:datapoints:dead'
+GROUP = 'ingest-workers'
+
+# Rejected rows are kept for inspection in a capped stream
+DEAD_LETTER_MAX_LENGTH = 10000
+
+
+class QueueUnavailable(Exception):
+    """
+    Raised when readings cannot be appended to the ingest queue.
+    """
+
+
+def _text(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def enqueue(rows, building_id):
+    """
+    Validate raw rows without touching the database and append the valid ones to the ingest queue.
+
+    Rows without a timestamp are stamped with the time they were received. Foreign keys are
+    only checked by the worker when the rows are stored.
+
+    Args:
+        rows: A list of raw rows.
+        building_id (int): The ID of the building object the rows belong to.
+
+    Returns:
+        tuple: The number of queued rows and a list of per-row errors, each error being a dict
+               with 'index' and 'errors' keys.
+
+    Raises:
+        QueueUnavailable: If the default cache is not backed by Redis or Redis cannot be reached.
+    """
+    redis = get_redis()
+    if redis is None:
+        raise QueueUnavailable('The ingest queue requires a Redis cache.')
+
+    queued, errors = [], []
+    for index, row in enumerate(rows):
+        parsed, row_errors = parse_row(row)
+        if row_errors:
+            errors.append({'index': index, 'errors': row_errors})
+        else:
+            queued.append({**parsed, 'timestamp': parsed['timestamp'].isoformat()})
+    if queued:
+        try:
+            redis.xadd(STREAM_KEY, {'building_object': building_id, 'rows': json.dumps(queued)})
+        except RedisError as error:
+            raise QueueUnavailable('Could not append to the ingest queue.') from error
+    return len(queued), errors
+
+
+def ensure_group(redis):
+    """
+    Create the stream and its consumer group unless they exist.
+
+    Args:
+        redis: The Redis client.
+    """
+    try:
+        redis.xgroup_create(STREAM_KEY, GROUP, id='0', mkstream=True)
+    except ResponseError as error:
+        if 'BUSYGROUP' not in str(error):
+            raise
+
+
+def read(redis, consumer, count, block, claim_idle, max_deliveries):
+    """
+    Read a batch of entries for a consumer, first reclaiming entries other consumers left pending.
+
+    Entries stay pending until they are acknowledged, so the entries of a worker that died
+    before acknowledging them are delivered again once they were idle for claim_idle milliseconds.
+    Reclaimed entries that were already delivered max_deliveries times, such as entries whose
+    rows keep failing to be stored, are moved to the dead letter stream instead.
+
+    Args:
+        redis: The Redis client.
+        consumer (str): The name of the consumer.
+        count (int): The maximum number of entries to read.
+        block (int): The number of milliseconds to wait for new entries.
+        claim_idle (int): The number of milliseconds after which pending entries are reclaimed.
+        max_deliveries (int): The number of deliveries after which entries are dead lettered.
+
+    Returns:
+        list: (entry ID, fields) tuples.
+    """
+    claimed = redis.xautoclaim(STREAM_KEY, GROUP, consumer, min_idle_time=claim_idle, count=count)[1]
+    entries = [(entry_id, fields) for entry_id, fields in claimed if fields]
+    if entries:
+        entries = _drop_undeliverable(redis, entries, max_deliveries)
+        if entries:
+            return entries
+    response = redis.xreadgroup(GROUP, consumer, {STREAM_KEY: '>'}, count=count, block=block)
+    return response[0][1] if response else []
+
+
+def _drop_undeliverable(redis, entries, max_deliveries):
+    """
+    Move reclaimed entries that were delivered too often to the dead letter stream.
+
+    The delivery counts are looked up in the pending entries list, which counts the delivery
+    of the reclaim itself.
+
+    Args:
+        redis: The Redis client.
+        entries (list): Reclaimed (entry ID, fields) tuples.
+        max_deliveries (int): The number of deliveries after which entries are dead lettered.
+
+    Returns:
+        list: The (entry ID, fields) tuples that may be processed again.
+    """
+    pipeline = redis.pipeline()
+    for entry_id, _ in entries:
+        pipeline.xpending_range(STREAM_KEY, GROUP, min=entry_id, max=entry_id, count=1)
+    deliveries = [pending[0]['times_delivered'] if pending else 0 for pending in pipeline.execute()]
+
+    retried, undeliverable = [], []
+    for (entry_id, fields), times_delivered in zip(entries, deliveries):
+        (undeliverable if times_delivered > max_deliveries else retried).append((entry_id, fields))
+    if undeliverable:
+        pipeline = redis.pipeline()
+        for entry_id, fields in undeliverable:
+            logger.error('Dead lettering ingest queue entry %s after %s deliveries',
+                         _text(entry_id), max_deliveries)
+            pipeline.xadd(DEAD_LETTER_KEY, {
+                **{_text(key): _text(value) for key, value in fields.items()},
+                'entry': _text(entry_id),
+                'errors': json.dumps([f'Not stored after {max_deliveries} deliveries.']),
+            }, maxlen=DEAD_LETTER_MAX_LENGTH, approximate=True)
+        entry_ids = [entry_id for entry_id, _ in undeliverable]
+        pipeline.xack(STREAM_KEY, GROUP, *entry_ids)
+        pipeline.xdel(STREAM_KEY, *entry_ids)
+        pipeline.execute()
+    return retried
+
+
+def process(redis, entries):
+    """
+    Store the rows of a batch of entries with one bulk insert and acknowledge the entries.
+
+    Rows that fail validation are moved to the dead letter stream, as are all rows of entries
+    whose building object no longer exists, which are found with one query for the batch.
+    If storing fails, nothing is acknowledged and the entries are delivered again later, so
+    every row is stored at least once, until read gives up on them.
+
+    Args:
+        redis: The Redis client.
+        entries (list): (entry ID, fields) tuples as returned by read.
+
+    Returns:
+        tuple: The number of stored and rejected rows.
+    """
+    decoded, dead_letters = [], []
+    for entry_id, fields in entries:
+        fields = {_text(key): _text(value) for key, value in fields.items()}
+        try:
+            decoded.append((entry_id, int(fields['building_object']), json.loads(fields['rows'])))
+        except (KeyError, TypeError, ValueError):
+            logger.warning('Dropping malformed ingest queue entry %s', _text(entry_id))
+            dead_letters.append({'entry': _text(entry_id), 'errors': json.dumps(['Malformed entry.'])})
+
+    building_ids = set(BuildingObject.objects.filter(
+        id__in={building_id for _, building_id, _ in decoded}).values_list('id', flat=True))
+
+    points = []
+    for entry_id, building_id, rows in decoded:
+        if building_id not in building_ids:
+            logger.warning('Rejecting ingest queue entry %s of missing building object %s',
+                           _text(entry_id), building_id)
+            missing = {'building_object': [f'Invalid pk "{building_id}" - object does not exist.']}
+            errors = [{'index': index, 'errors': missing} for index in range(len(rows))]
+        else:
+            valid, errors = validate_rows(rows, building_id)
+            points.extend(valid)
+        dead_letters.extend({
+            'entry': _text(entry_id),
+            'building_object': building_id,
+            'row': json.dumps(rows[error['index']]),
+            'errors': json.dumps(error['errors']),
+        } for error in errors)
+
+    stored = store(points)
+
+    pipeline = redis.pipeline()
+    for dead_letter in dead_letters:
+        pipeline.xadd(DEAD_LETTER_KEY, dead_letter, maxlen=DEAD_LETTER_MAX_LENGTH, approximate=True)
+    entry_ids = [entry_id for entry_id, _ in entries]
+    if entry_ids:
+        pipeline.xack(STREAM_KEY, GROUP, *entry_ids)
+        pipeline.xdel(STREAM_KEY, *entry_ids)
+    pipeline.execute()
+    rejected = sum(1 for dead_letter in dead_letters if 'row' in dead_letter)
+    return len(stored), rejected
+
+
+def stats(redis):
+    """
+    Get the backlog of the ingest queue.
+
+    Args:
+        redis: The Redis client.
+
+    Returns:
+        dict: The number of entries in the stream, delivered but unacknowledged entries,
+              entries not delivered yet, consumers and dead letters.
+    """
+    ensure_group(redis)
+    group = next(group for group in redis.xinfo_groups(STREAM_KEY) if _text(group['name']) == GROUP)
+    return {
+        'length': redis.xlen(STREAM_KEY),
+        'pending': group['pending'],
+        'lag': group.get('lag'),
+        'consumers': group['consumers'],
+        'dead_letters': redis.xlen(DEAD_LETTER_KEY),
+    }
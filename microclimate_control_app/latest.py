@@ -0,0 +1,223 @@
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.db.models import OuterRef, Subquery
+from django.utils.dateparse import parse_datetime
+from redis.exceptions import RedisError
+
+from .connections import get_async_redis, get_redis
+from .models import DataPoint, DataType
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'latest:building:'
+
+# Replaces a data type's entry only if the stored reading is not newer than the given one
+UPDATE_SCRIPT = """
+for i = 1, #ARGV, 3 do
+    local current = redis.call('HGET', KEYS[1], ARGV[i])
+    if not current or tonumber(cjson.decode(current)['epoch']) <= tonumber(ARGV[i + 1]) then
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 2])
+    end
+end
+"""
+
+
+def _key(building_id):
+    return f'{KEY_PREFIX}{building_id}'
+
+
+def _write(redis, readings):
+    """
+    Store the given readings unless newer ones are already stored.
+
+    Args:
+        redis: The Redis client.
+        readings (dict): Readings keyed by (building_object_id, data_type_id), each a dict
+                         with 'value', 'timestamp' and 'device' keys.
+    """
+    script = redis.register_script(UPDATE_SCRIPT)
+    by_building = {}
+    for (building_id, data_type_id), reading in readings.items():
+        by_building.setdefault(building_id, []).extend([
+            data_type_id,
+            reading['timestamp'].timestamp(),
+            json.dumps({
+                'value': reading['value'],
+                'timestamp': reading['timestamp'].isoformat(),
+                'device': reading['device'],
+                'epoch': reading['timestamp'].timestamp(),
+            }),
+        ])
+    pipeline = redis.pipeline(transaction=False)
+    for building_id, args in by_building.items():
+        script(keys=[_key(building_id)], args=args, client=pipeline)
+    pipeline.execute()
+
+
+def record(points):
+    """
+    Update the latest readings with newly stored data points.
+
+    Failures to reach Redis are logged and otherwise ignored, as the database stays the
+    source of truth.
+
+    Args:
+        points: An iterable of stored DataPoint instances.
+    """
+    redis = get_redis()
+    if redis is None:
+        return
+
+    readings = {}
+    for point in points:
+        key = (point.building_object_id, point.data_type_id)
+        if key not in readings or point.timestamp >= readings[key]['timestamp']:
+            readings[key] = {'value': point.value, 'timestamp': point.timestamp, 'device': point.device_id}
+    if not readings:
+        return
+
+    try:
+        _write(redis, readings)
+    except RedisError:
+        logger.warning('Could not update latest readings', exc_info=True)
+
+
+def refresh(building_ids):
+    """
+    Reload the latest readings of building objects from the database.
+
+    Used after stored data points were changed or deleted, when the cached readings may be
+    newer than what is left in the database. Failures to reach Redis are logged and otherwise
+    ignored.
+
+    Args:
+        building_ids: An iterable of building object IDs.
+    """
+    redis = get_redis()
+    if redis is None:
+        return
+
+    readings = {}
+    for building_id in set(building_ids):
+        readings.update({(building_id, data_type_id): reading
+                         for data_type_id, reading in _load(building_id).items()})
+    try:
+        redis.delete(*(_key(building_id) for building_id in set(building_ids)))
+        if readings:
+            _write(redis, readings)
+    except RedisError:
+        logger.warning('Could not refresh latest readings', exc_info=True)
+
+
+def _load(building_id):
+    """
+    Read the latest reading of every data type of a building object from the database.
+
+    The newest data point of every data type is looked up in a single query.
+
+    Args:
+        building_id (int): The ID of the building object.
+
+    Returns:
+        dict: Readings keyed by data type ID.
+    """
+    newest = DataPoint.objects.filter(building_object_id=building_id, data_type_id=OuterRef('id')) \
+        .order_by('-timestamp', '-id').values('id')[:1]
+    ids = DataType.objects.annotate(newest=Subquery(newest)).filter(newest__isnull=False).values('newest')
+    readings = {}
+    for point in DataPoint.objects.filter(id__in=ids).values('data_type', 'value', 'timestamp', 'device'):
+        readings[point['data_type']] = {'value': point['value'], 'timestamp': point['timestamp'],
+                                        'device': point['device']}
+    return readings
+
+
+def _decode(cached):
+    """
+    Decode the readings of a building object read from its Redis hash.
+
+    Args:
+        cached (dict): The fields and values of the hash.
+
+    Returns:
+        dict: Readings keyed by data type ID.
+    """
+    readings = {}
+    for data_type_id, payload in cached.items():
+        reading = json.loads(payload)
+        readings[int(data_type_id)] = {'value': reading['value'], 'device': reading['device'],
+                                       'timestamp': parse_datetime(reading['timestamp'])}
+    return readings
+
+
+def _load_and_cache(building_id):
+    """
+    Read the latest readings of a building object from the database and cache them again.
+
+    Args:
+        building_id (int): The ID of the building object.
+
+    Returns:
+        dict: Readings keyed by data type ID.
+    """
+    readings = _load(building_id)
+    redis = get_redis()
+    if redis is not None and readings:
+        try:
+            _write(redis, {(building_id, data_type_id): reading for data_type_id, reading in readings.items()})
+        except RedisError:
+            logger.warning('Could not update latest readings', exc_info=True)
+    return readings
+
+
+def get(building_id):
+    """
+    Get the latest reading of every data type of a building object.
+
+    Readings are served from a Redis hash per building object. Only when the hash is missing,
+    for example after Redis was flushed, they are loaded from the database and cached again.
+
+    Args:
+        building_id (int): The ID of the building object.
+
+    Returns:
+        dict: Readings keyed by data type ID, each a dict with 'value', 'timestamp' and 'device' keys.
+    """
+    redis = get_redis()
+    if redis is not None:
+        try:
+            cached = redis.hgetall(_key(building_id))
+        except RedisError:
+            logger.warning('Could not read latest readings', exc_info=True)
+            cached = None
+        if cached:
+            return _decode(cached)
+    return _load_and_cache(building_id)
+
+
+async def aget(building_id):
+    """
+    Get the latest reading of every data type of a building object from async code.
+
+    The Redis hash is read with an asyncio client, so serving cached readings does not take a
+    thread. Only a missing hash is loaded from the database in a thread.
+
+    Args:
+        building_id (int): The ID of the building object.
+
+    Returns:
+        dict: Readings keyed by data type ID, each a dict with 'value', 'timestamp' and 'device' keys.
+    """
+    redis = get_async_redis()
+    if redis is not None:
+        try:
+            cached = await redis.hgetall(_key(building_id))
+        except RedisError:
+            logger.warning('Could not read latest readings', exc_info=True)
+            cached = None
+        finally:
+            await redis.aclose()
+        if cached:
+            return _decode(cached)
+    return await sync_to_async(_load_and_cache)(building_id)
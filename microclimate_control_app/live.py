@@ -0,0 +1,122 @@
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core import signing
+from redis.exceptions import RedisError
+
+from .connections import get_redis
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = 'live:building:'
+
+TOKEN_SALT = 'microclimate_control_app.live'
+
+
+def channel(building_id):
+    return f'{CHANNEL_PREFIX}{building_id}'
+
+
+def issue_token(user_id, building_id):
+    """
+    Issue a signed token opening the live stream of one building object as a user.
+
+    Args:
+        user_id (int): The ID of the user.
+        building_id (int): The ID of the building object.
+
+    Returns:
+        str: The token.
+    """
+    return signing.dumps({'user': user_id, 'building': building_id}, salt=TOKEN_SALT)
+
+
+def read_token(token, building_id):
+    """
+    Check a stream token.
+
+    Args:
+        token (str): The token, as returned by issue_token.
+        building_id (int): The ID of the building object whose stream is opened.
+
+    Returns:
+        int: The ID of the user the token was issued to, or None if the token is invalid, expired
+             or issued for another building object.
+    """
+    try:
+        payload = signing.loads(token, salt=TOKEN_SALT, max_age=settings.LIVE_STREAM_TOKEN_SECONDS)
+    except signing.BadSignature:
+        return None
+    return payload['user'] if payload['building'] == building_id else None
+
+
+def publish(points):
+    """
+    Publish newly stored data points to the live channels of their building objects.
+
+    Failures to reach Redis are logged and otherwise ignored, subscribers simply miss the update.
+
+    Args:
+        points: An iterable of stored DataPoint instances.
+    """
+    redis = get_redis()
+    if redis is None:
+        return
+
+    by_building = {}
+    for point in points:
+        by_building.setdefault(point.building_object_id, []).append({
+            'id': point.id,
+            'timestamp': point.timestamp.isoformat(),
+            'data_type': point.data_type_id,
+            'value': point.value,
+            'device': point.device_id,
+            'building_object': point.building_object_id,
+        })
+    if not by_building:
+        return
+
+    try:
+        pipeline = redis.pipeline(transaction=False)
+        for building_id, rows in by_building.items():
+            pipeline.publish(channel(building_id), json.dumps(rows))
+        pipeline.execute()
+    except RedisError:
+        logger.warning('Could not publish live data points', exc_info=True)
+
+
+async def events(redis, building_id):
+    """
+    Stream the data points published for a building object as Server-Sent Events.
+
+    A comment line is sent whenever nothing was published for the heartbeat interval, so that
+    proxies keep the connection open. The stream ends after the maximum stream duration and the
+    client reconnects, which bounds the lifetime of subscriptions of clients that went away:
+    Django 4.2 does not stop streaming responses when the client disconnects, so the
+    subscription of a closed stream is only dropped once the duration is reached.
+
+    Args:
+        redis: An asyncio Redis client, closed when the stream ends.
+        building_id (int): The ID of the building object.
+
+    Yields:
+        str: The encoded events.
+    """
+    pubsub = redis.pubsub()
+    try:
+        await pubsub.subscribe(channel(building_id))
+        yield f'retry: {settings.LIVE_STREAM_RETRY_MS}\n\n'
+        deadline = time.monotonic() + settings.LIVE_STREAM_MAX_SECONDS
+        while time.monotonic() < deadline:
+            message = await pubsub.get_message(ignore_subscribe_messages=True,
+                                               timeout=settings.LIVE_STREAM_HEARTBEAT_SECONDS)
+            if message is None:
+                yield ': keepalive\n\n'
+                continue
+            data = message['data'].decode('utf-8') if isinstance(message['data'], bytes) else message['data']
+            yield f'event: datapoints\ndata: {data}\n\n'
+    finally:
+        await pubsub.aclose()
+        await redis.aclose()
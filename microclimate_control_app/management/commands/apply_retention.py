@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from microclimate_control_app import retention
+
+
+class Command(BaseCommand):
+    """
+    Management command applying the retention policies, meant to run periodically.
+
+    Rollups of expiring raw data points are rebuilt before the raw rows are deleted, and rows
+    are deleted in bounded batches to avoid long locks and bursts of write-ahead log.
+    """
+
+    help = 'Downsample and delete expired data points and rollups according to the retention policies.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.RETENTION_DELETE_BATCH_SIZE,
+                            help='Maximum number of rows deleted per statement.')
+        parser.add_argument('--rebuild-days', type=int, default=settings.RETENTION_REBUILD_DAYS,
+                            help='Number of days of rollups rebuilt per transaction.')
+        parser.add_argument('--pause', type=float, default=0,
+                            help='Seconds to sleep between delete batches.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report the number of expired rows.')
+
+    def handle(self, *args, **options):
+        total = 0
+        for summary in retention.expire(batch_size=options['batch_size'], rebuild_days=options['rebuild_days'],
+                                        pause=options['pause'], dry_run=options['dry_run']):
+            total += summary['deleted']
+            self.stdout.write(
+                f"{summary['deleted']} {summary['tier']} rows kept for {summary['days']} days, "
+                f"before {summary['cutoff'].isoformat()}, "
+                f"{'expired' if options['dry_run'] else 'deleted'}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} rows {'expired' if options['dry_run'] else 'deleted'}"))
@@ -0,0 +1,310 @@
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.utils import timezone
+
+from microclimate_control_app import device_stats, reference, rollups
+from microclimate_control_app.models import Project, BuildingObject, Metric, DataType, Device, DataPoint
+from microclimate_control_app.management.commands.rebuild_rollups import parse_datetime_arg
+
+# Generated data types by code, with their names and metrics
+DATA_TYPES = {
+    'TEMP': ('Temperature', '°C'),
+    'CO2': ('CO2', 'ppm'),
+    'HUM': ('Humidity', '%'),
+    'EC': ('Electricity Counter', 'kWh'),
+}
+
+COLUMNS = ('timestamp', 'value', 'data_type_id', 'device_id', 'building_object_id')
+
+
+def occupancy(hour, weekday):
+    """
+    Get the share of a building's occupants present at a time of the week.
+
+    Args:
+        hour (float): The hour of the day in UTC.
+        weekday (int): The day of the week, 0 being Monday.
+
+    Returns:
+        float: The occupancy between 0 and 1.
+    """
+    if weekday >= 5:
+        return 0.05
+    if 8 <= hour < 18:
+        return math.sin(math.pi * (hour - 8) / 10) ** 0.5
+    return 0.0
+
+
+def generate_rows(seed, data_type_ids, device_id, building_id, start, end, interval):
+    """
+    Generate the readings of one device as (timestamp, value, data type, device, building) rows.
+
+    Temperature and humidity follow a daily cycle, CO2 rises with the occupancy of working
+    hours and decays outside of them, and the electricity counter grows monotonically with a
+    base load and an occupancy dependent load.
+
+    Args:
+        seed (int): The seed of the random noise, making the series repeatable.
+        data_type_ids (dict): Data type IDs keyed by code.
+        device_id (int): The ID of the device.
+        building_id (int): The ID of the building object.
+        start (datetime): The timestamp of the first reading.
+        end (datetime): The end of the series (exclusive).
+        interval (int): The number of seconds between readings.
+
+    Yields:
+        tuple: The rows in the order of COLUMNS.
+    """
+    rng = random.Random(seed)
+    temperature_offset = rng.uniform(-1.5, 1.5)
+    base_load, peak_load = rng.uniform(0.5, 2.0), rng.uniform(2.0, 10.0)
+    counter, co2 = rng.uniform(0, 10000), 420.0
+    hours = interval / 3600
+    co2_rate = min(1.0, hours / 0.5)
+    temperature_id, co2_id, humidity_id, counter_id = (
+        data_type_ids['TEMP'], data_type_ids['CO2'], data_type_ids['HUM'], data_type_ids['EC'])
+
+    step = timedelta(seconds=interval)
+    timestamp, epoch = start, start.timestamp()
+    while timestamp < end:
+        hour = epoch % 86400 / 3600
+        # 1970-01-01 was a Thursday
+        present = occupancy(hour, (int(epoch // 86400) + 3) % 7)
+        diurnal = math.sin(2 * math.pi * (hour - 9) / 24)
+
+        co2 += (420 + 900 * present - co2) * co2_rate + rng.gauss(0, 5)
+        counter += (base_load + peak_load * present) * hours
+
+        yield timestamp, round(21 + temperature_offset + 2.5 * diurnal + present + rng.gauss(0, 0.2), 2), \
+            temperature_id, device_id, building_id
+        yield timestamp, round(max(co2, 350.0), 1), co2_id, device_id, building_id
+        yield timestamp, round(45 - 8 * diurnal + rng.gauss(0, 1), 1), humidity_id, device_id, building_id
+        yield timestamp, round(counter, 3), counter_id, device_id, building_id
+
+        timestamp += step
+        epoch += interval
+
+
+def copy_rows(rows):
+    """
+    Write rows into the data point table with PostgreSQL COPY.
+
+    Args:
+        rows: An iterable of rows in the order of COLUMNS.
+
+    Returns:
+        int: The number of written rows.
+    """
+    count = 0
+    sql = f'COPY {connection.ops.quote_name(DataPoint._meta.db_table)} ({", ".join(COLUMNS)}) FROM STDIN'
+    with connection.cursor() as cursor:
+        with cursor.cursor.copy(sql) as copy:
+            for row in rows:
+                copy.write_row(row)
+                count += 1
+    return count
+
+
+def insert_rows(rows, batch_size):
+    """
+    Write rows into the data point table with bulk inserts.
+
+    Args:
+        rows: An iterable of rows in the order of COLUMNS.
+        batch_size (int): The number of rows per insert.
+
+    Returns:
+        int: The number of written rows.
+    """
+    count, batch = 0, []
+    for row in rows:
+        batch.append(DataPoint(**dict(zip(COLUMNS, row))))
+        if len(batch) >= batch_size:
+            count += len(DataPoint.objects.bulk_create(batch))
+            batch = []
+    if batch:
+        count += len(DataPoint.objects.bulk_create(batch))
+    return count
+
+
+def generate_building(job):
+    """
+    Generate and write the data points of all devices of one building object.
+
+    Runs in worker processes, so it only takes plain values.
+
+    Args:
+        job (tuple): The building ID, the device IDs, the data type IDs, the start, end and
+                     interval of the series, the write method, the batch size and the seed.
+
+    Returns:
+        tuple: The building ID and the number of written rows.
+    """
+    building_id, device_ids, data_type_ids, start, end, interval, method, batch_size, seed = job
+    count = 0
+    for device_id in device_ids:
+        rows = generate_rows(seed * 1000003 + device_id, data_type_ids, device_id, building_id, start, end, interval)
+        count += copy_rows(rows) if method == 'copy' else insert_rows(rows, batch_size)
+    return building_id, count
+
+
+def generate_building_in_worker(job):
+    """
+    Run generate_building in a worker process, closing the worker's connections afterwards.
+
+    Args:
+        job (tuple): The job as taken by generate_building.
+
+    Returns:
+        tuple: The building ID and the number of written rows.
+    """
+    try:
+        return generate_building(job)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    """
+    Management command generating realistic synthetic data for capacity testing.
+
+    Creates projects with building objects and devices and fills them with series of
+    temperature, CO2, humidity and electricity counter readings. Data points are written with
+    PostgreSQL COPY or bulk inserts, one building object per worker process, bypassing the
+    per-request ingestion path; the rollups of the generated range and the device statistics
+    are rebuilt afterwards.
+    """
+
+    help = 'Generate projects, building objects, devices and synthetic data point series.'
+
+    def add_arguments(self, parser):
+        now = timezone.now().replace(second=0, microsecond=0)
+        parser.add_argument('--projects', type=int, default=1, help='Number of projects (default: 1).')
+        parser.add_argument('--buildings', type=int, default=3,
+                            help='Number of building objects per project (default: 3).')
+        parser.add_argument('--devices', type=int, default=2,
+                            help='Number of devices per building object (default: 2).')
+        parser.add_argument('--from', dest='start', type=parse_datetime_arg, default=now - timedelta(days=7),
+                            help='Start of the series (ISO 8601, default: 7 days ago).')
+        parser.add_argument('--to', dest='end', type=parse_datetime_arg, default=now,
+                            help='End of the series (ISO 8601, default: now).')
+        parser.add_argument('--interval', type=int, default=60,
+                            help='Seconds between the readings of a device (default: 60).')
+        parser.add_argument('--method', choices=['copy', 'bulk'],
+                            help='Write with COPY (default on PostgreSQL) or bulk inserts (default otherwise).')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Rows per bulk insert (default: 10000).')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Number of processes writing building objects in parallel (default: 1).')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random noise (default: 0).')
+        parser.add_argument('--skip-rollups', action='store_true',
+                            help='Do not rebuild the rollups of the generated range and the device statistics.')
+
+    def handle(self, *args, **options):
+        start, end, interval = options['start'], options['end'], options['interval']
+        if start >= end:
+            raise CommandError('--from must be earlier than --to.')
+        if interval <= 0:
+            raise CommandError('--interval must be positive.')
+        method = options['method'] or ('copy' if connection.vendor == 'postgresql' else 'bulk')
+        if method == 'copy' and connection.vendor != 'postgresql':
+            raise CommandError('COPY is only supported on PostgreSQL.')
+        workers = options['workers'] if connection.vendor != 'sqlite' else 1
+
+        data_type_ids = self.create_data_types()
+        buildings = self.create_buildings(options['projects'], options['buildings'], options['devices'],
+                                          list(data_type_ids.values()))
+
+        ticks = math.ceil((end - start).total_seconds() / interval)
+        total = ticks * len(DATA_TYPES) * sum(len(device_ids) for device_ids in buildings.values())
+        self.stdout.write(f'Generating {total} data points for {len(buildings)} building objects with {method}')
+
+        jobs = [(building_id, device_ids, data_type_ids, start, end, interval, method,
+                 options['batch_size'], options['seed'])
+                for building_id, device_ids in buildings.items()]
+        began, written = time.perf_counter(), 0
+        if workers > 1:
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = executor.map(generate_building_in_worker, jobs)
+                for building_id, count in results:
+                    written += count
+                    self.report(building_id, written, total, began)
+        else:
+            for job in jobs:
+                building_id, count = generate_building(job)
+                written += count
+                self.report(building_id, written, total, began)
+
+        if not options['skip_rollups']:
+            for building_id in buildings:
+                window_start = start
+                while window_start < end:
+                    window_start = rollups.rebuild(window_start, min(window_start + timedelta(days=7), end),
+                                                   building_id=building_id)[1]
+            device_stats.rebuild([device_id for device_ids in buildings.values() for device_id in device_ids])
+            self.stdout.write(f'Rebuilt rollups and device statistics after {time.perf_counter() - began:.1f} s')
+
+        self.stdout.write(self.style.SUCCESS(f'Generated {written} data points'))
+
+    def report(self, building_id, written, total, began):
+        elapsed = time.perf_counter() - began
+        self.stdout.write(f'Building object {building_id} done, {written}/{total} data points '
+                          f'in {elapsed:.1f} s ({written / elapsed:.0f} per second)')
+
+    def create_data_types(self):
+        """
+        Get or create the generated data types and their metrics.
+
+        Returns:
+            dict: Data type IDs keyed by code.
+        """
+        data_type_ids = {}
+        for code, (name, metric_name) in DATA_TYPES.items():
+            metric, _ = Metric.objects.get_or_create(name=metric_name)
+            data_type, _ = DataType.objects.get_or_create(code=code, defaults={'name': name, 'metric': metric})
+            data_type_ids[code] = data_type.id
+        return data_type_ids
+
+    def create_buildings(self, projects, buildings, devices, data_type_ids):
+        """
+        Create projects with building objects and the devices of every building object.
+
+        Args:
+            projects (int): The number of projects.
+            buildings (int): The number of building objects per project.
+            devices (int): The number of devices per building object.
+            data_type_ids (list): The IDs of the data types collected by every device.
+
+        Returns:
+            dict: Lists of device IDs keyed by building object ID.
+        """
+        first = Project.objects.count() + 1
+        created_projects = Project.objects.bulk_create([
+            Project(name=f'Generated project {number}', description='Synthetic data')
+            for number in range(first, first + projects)
+        ])
+        created_buildings = BuildingObject.objects.bulk_create([
+            BuildingObject(name=f'{project.name} building {number}', location='Generated', project=project)
+            for project in created_projects for number in range(1, buildings + 1)
+        ])
+        created_devices = Device.objects.bulk_create([
+            Device(name=f'gen-{building.id}-{number}')
+            for building in created_buildings for number in range(1, devices + 1)
+        ])
+        Device.data_collected.through.objects.bulk_create([
+            Device.data_collected.through(device_id=device.id, datatype_id=data_type_id)
+            for device in created_devices for data_type_id in data_type_ids
+        ])
+        # Bulk inserts send no signals, so the cached reference data is invalidated here
+        reference.invalidate()
+
+        return {
+            building.id: [device.id for device in created_devices[offset * devices:(offset + 1) * devices]]
+            for offset, building in enumerate(created_buildings)
+        }
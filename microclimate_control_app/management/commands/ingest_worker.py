@@ -0,0 +1,63 @@
+import json
+import os
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections
+from redis.exceptions import RedisError
+
+from microclimate_control_app import ingest_queue
+from microclimate_control_app.connections import get_redis
+
+
+class Command(BaseCommand):
+    """
+    Management command draining the ingest queue into the database.
+
+    Any number of workers may run next to each other as consumers of the same group. Queued
+    requests are stored in one bulk insert per batch and acknowledged afterwards, so a worker
+    dying in between causes its batch to be stored again by another worker.
+    """
+
+    help = 'Store data points queued by the data point queue endpoint in bulk batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consumer', default=f'{socket.gethostname()}-{os.getpid()}',
+                            help='Name of this worker in the consumer group (default: host name and PID).')
+        parser.add_argument('--count', type=int, default=settings.INGEST_QUEUE_READ_COUNT,
+                            help='Maximum number of queued requests stored per batch.')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is drained instead of waiting for new requests.')
+        parser.add_argument('--stats', action='store_true',
+                            help='Print the backlog of the queue as JSON and exit.')
+
+    def handle(self, *args, **options):
+        redis = get_redis()
+        if redis is None:
+            raise CommandError('The ingest queue requires a Redis cache.')
+        ingest_queue.ensure_group(redis)
+
+        if options['stats']:
+            self.stdout.write(json.dumps(ingest_queue.stats(redis)))
+            return
+
+        while True:
+            try:
+                entries = ingest_queue.read(redis, options['consumer'], options['count'],
+                                            settings.INGEST_QUEUE_BLOCK_MS, settings.INGEST_QUEUE_CLAIM_IDLE_MS,
+                                            settings.INGEST_QUEUE_MAX_DELIVERIES)
+                if not entries:
+                    if options['once']:
+                        return
+                    continue
+                close_old_connections()
+                stored, rejected = ingest_queue.process(redis, entries)
+            except (DatabaseError, RedisError) as error:
+                # Unacknowledged entries are reclaimed once they were idle long enough and dead
+                # lettered once they were delivered INGEST_QUEUE_MAX_DELIVERIES times
+                self.stderr.write(f'Could not store queued data points: {error}')
+                time.sleep(1)
+                continue
+            self.stdout.write(f'Stored {stored} data points from {len(entries)} requests, rejected {rejected}')
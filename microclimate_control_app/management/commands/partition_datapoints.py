@@ -0,0 +1,225 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from microclimate_control_app.models import DataPoint, DataType, Device, BuildingObject
+
+
+def month_start(year, month):
+    """
+    Get the start of a month in UTC, normalizing months outside of 1-12.
+
+    Args:
+        year (int): The year.
+        month (int): The month, may be smaller than 1 or larger than 12.
+
+    Returns:
+        datetime: The start of the month.
+    """
+    year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+    return datetime(year, month, 1, tzinfo=dt_timezone.utc)
+
+
+def retention_cutoff(now, retain_months):
+    """
+    Get the time before which monthly partitions expire.
+
+    Args:
+        now (datetime): The current time.
+        retain_months (int): The number of months kept before the current one.
+
+    Returns:
+        datetime: The start of the month retain_months before the current one.
+    """
+    return month_start(now.year, now.month - retain_months)
+
+
+class Command(BaseCommand):
+    """
+    Management command maintaining monthly range partitions of the data point table on PostgreSQL.
+
+    The table is converted once with --convert, after which this command is meant to run
+    periodically to create partitions ahead of time and detach or drop expired ones.
+    Queries filtering data points by timestamp are then pruned to the matching partitions.
+    """
+
+    help = 'Partition the data point table by month on PostgreSQL and maintain its partitions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true',
+                            help='Convert the data point table into a partitioned table, copying all rows.')
+        parser.add_argument('--ahead', type=int, default=3,
+                            help='Number of future months to create partitions for (default: 3).')
+        parser.add_argument('--retain-months', type=int,
+                            help='Detach partitions that ended more than this many months ago.')
+        parser.add_argument('--drop', action='store_true',
+                            help='Drop expired partitions instead of only detaching them.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partitioning is only supported on PostgreSQL.')
+        self.table = DataPoint._meta.db_table
+
+        if options['convert']:
+            with transaction.atomic():
+                self.convert()
+        elif not self.is_partitioned():
+            raise CommandError(f'{self.table} is not partitioned yet, run with --convert first.')
+
+        # Every partition is created in its own transaction, so one failure does not undo the others
+        now = timezone.now()
+        for offset in range(options['ahead'] + 1):
+            self.create_partition(month_start(now.year, now.month + offset))
+
+        if options['retain_months'] is not None:
+            self.expire_partitions(retention_cutoff(now, options['retain_months']), options['drop'])
+
+    def execute_sql(self, sql, params=None):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall() if cursor.description else None
+
+    def is_partitioned(self):
+        rows = self.execute_sql('SELECT relkind FROM pg_class WHERE oid = %s::regclass', [self.table])
+        return rows[0][0] == 'p'
+
+    def table_exists(self, name):
+        return self.execute_sql('SELECT to_regclass(%s)', [name])[0][0] is not None
+
+    def partition_name(self, start):
+        return f'{self.table}_p{start:%Y%m}'
+
+    @property
+    def default_partition_name(self):
+        return f'{self.table}_default'
+
+    def create_partition(self, start):
+        """
+        Create the partition of the month starting at start, unless it exists.
+
+        Rows of the month may already be stored in the default partition, for example readings
+        with future timestamps, and PostgreSQL refuses to create a partition overlapping rows of
+        the default partition. The default partition is then detached while its rows of the
+        month are moved into the new partition.
+
+        Args:
+            start (datetime): The start of the month.
+        """
+        end = month_start(start.year, start.month + 1)
+        name = self.partition_name(start)
+        if self.table_exists(name):
+            self.stdout.write(f'Partition {name} is present')
+            return
+
+        table, default = connection.ops.quote_name(self.table), connection.ops.quote_name(self.default_partition_name)
+        in_month = '"timestamp" >= %s AND "timestamp" < %s'
+        with transaction.atomic():
+            moved = 0
+            if self.table_exists(self.default_partition_name):
+                moved = self.execute_sql(f'SELECT COUNT(*) FROM {default} WHERE {in_month}', [start, end])[0][0]
+            if moved:
+                self.execute_sql(f'ALTER TABLE {table} DETACH PARTITION {default}')
+            self.execute_sql(
+                f'CREATE TABLE {connection.ops.quote_name(name)} PARTITION OF {table} '
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )
+            if moved:
+                self.execute_sql(f'INSERT INTO {table} SELECT * FROM {default} WHERE {in_month}', [start, end])
+                self.execute_sql(f'DELETE FROM {default} WHERE {in_month}', [start, end])
+                self.execute_sql(f'ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT')
+        self.stdout.write(f'Partition {name} created' + (f', {moved} rows moved from the default partition'
+                                                         if moved else ''))
+
+    def expired_partitions(self, names, cutoff):
+        """
+        Select the monthly partitions that ended before a cutoff.
+
+        Args:
+            names: The names of the partitions of the table.
+            cutoff (datetime): Partitions of months ending at or before this time are expired.
+
+        Returns:
+            list: The names of the expired monthly partitions, the default partition is never expired.
+        """
+        prefix = f'{self.table}_p'
+        expired = []
+        for name in names:
+            suffix = name[len(prefix):]
+            if not name.startswith(prefix) or len(suffix) != 6 or not suffix.isdigit():
+                continue
+            start = month_start(int(suffix[:4]), int(suffix[4:]))
+            if month_start(start.year, start.month + 1) <= cutoff:
+                expired.append(name)
+        return expired
+
+    def expire_partitions(self, cutoff, drop):
+        """
+        Detach, and optionally drop, the monthly partitions that ended before the cutoff.
+
+        Args:
+            cutoff (datetime): Partitions of months ending at or before this time are expired.
+            drop (bool): Whether to drop the detached partitions.
+        """
+        partitions = self.execute_sql(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE parent.relname = %s', [self.table])
+        for name in self.expired_partitions([name for (name,) in partitions], cutoff):
+            self.execute_sql(f'ALTER TABLE {connection.ops.quote_name(self.table)} '
+                             f'DETACH PARTITION {connection.ops.quote_name(name)}')
+            if drop:
+                self.execute_sql(f'DROP TABLE {connection.ops.quote_name(name)}')
+            self.stdout.write(f'Partition {name} {"dropped" if drop else "detached"}')
+
+    def convert(self):
+        """
+        Replace the data point table with a partitioned copy.
+
+        The primary key becomes (id, timestamp) as PostgreSQL requires the partition key in
+        unique constraints. Indexes and foreign keys are recreated on the partitioned table,
+        rows outside of the created monthly partitions go to a default partition.
+        """
+        if self.is_partitioned():
+            raise CommandError(f'{self.table} is already partitioned.')
+
+        table, legacy = connection.ops.quote_name(self.table), connection.ops.quote_name(f'{self.table}_legacy')
+        indexes = self.execute_sql(
+            'SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s',
+            [self.table])
+
+        self.execute_sql(f'ALTER TABLE {table} RENAME TO {legacy}')
+        for name, _ in indexes:
+            self.execute_sql(f'ALTER INDEX {connection.ops.quote_name(name)} '
+                             f'RENAME TO {connection.ops.quote_name(f"{name[:56]}_legacy")}')
+        indexes = [(name, definition) for name, definition in indexes if name != f'{self.table}_pkey']
+
+        self.execute_sql(f'CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING IDENTITY) '
+                         f'PARTITION BY RANGE ("timestamp")')
+        self.execute_sql(f'ALTER TABLE {table} ADD PRIMARY KEY ("id", "timestamp")')
+        for name, definition in indexes:
+            self.execute_sql(definition.replace(f' ON public.{self.table} ', f' ON {table} ')
+                             .replace(f' ON {self.table} ', f' ON {table} '))
+        for field, model in (('building_object_id', BuildingObject), ('data_type_id', DataType),
+                             ('device_id', Device)):
+            self.execute_sql(
+                f'ALTER TABLE {table} ADD FOREIGN KEY ({connection.ops.quote_name(field)}) '
+                f'REFERENCES {connection.ops.quote_name(model._meta.db_table)} ("id") '
+                f'DEFERRABLE INITIALLY DEFERRED')
+
+        self.execute_sql(f'CREATE TABLE {connection.ops.quote_name(self.default_partition_name)} '
+                         f'PARTITION OF {table} DEFAULT')
+        first, last = self.execute_sql(f'SELECT MIN("timestamp"), MAX("timestamp") FROM {legacy}')[0]
+        if first is not None:
+            month = month_start(first.year, first.month)
+            while month <= last:
+                self.create_partition(month)
+                month = month_start(month.year, month.month + 1)
+
+        self.execute_sql(f'INSERT INTO {table} SELECT * FROM {legacy}')
+        self.execute_sql(f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                         f'COALESCE((SELECT MAX("id") FROM {table}), 0) + 1, false)', [self.table])
+        self.execute_sql(f'DROP TABLE {legacy}')
+        self.stdout.write(self.style.SUCCESS(f'{self.table} converted to a partitioned table'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from microclimate_control_app import device_stats
+
+
+class Command(BaseCommand):
+    """
+    Management command recomputing the device statistics from the data points.
+    """
+
+    help = 'Recompute the per device and data type statistics from the raw data points.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--device', type=int, action='append',
+                            help='Only rebuild the statistics of this device (may be repeated).')
+
+    def handle(self, *args, **options):
+        rebuilt = device_stats.rebuild(options['device'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} device statistics'))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from microclimate_control_app import rollups
+
+
+def parse_datetime_arg(value):
+    """
+    Parse an ISO 8601 command line argument into an aware datetime.
+
+    Args:
+        value (str): The raw argument.
+
+    Returns:
+        datetime: The aware datetime.
+
+    Raises:
+        CommandError: If the argument is not a valid datetime.
+    """
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise CommandError(f'"{value}" is not a valid ISO 8601 datetime.')
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+class Command(BaseCommand):
+    """
+    Management command recomputing the minute, hour and day rollups of a time window.
+    """
+
+    help = 'Recompute data point rollups of a time window from the raw data points.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', required=True, type=parse_datetime_arg,
+                            help='Start of the window (ISO 8601), widened to the start of its UTC day.')
+        parser.add_argument('--to', dest='end', required=True, type=parse_datetime_arg,
+                            help='End of the window (ISO 8601), widened to the end of its UTC day.')
+        parser.add_argument('--building', type=int, help='Only rebuild rollups of this building object.')
+        parser.add_argument('--data-type', type=int, help='Only rebuild rollups of this data type.')
+
+    def handle(self, *args, **options):
+        if options['start'] >= options['end']:
+            raise CommandError('--from must be earlier than --to.')
+        start, end = rollups.rebuild(options['start'], options['end'],
+                                     building_id=options['building'], data_type_id=options['data_type'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rollups from {start.isoformat()} to {end.isoformat()}'))
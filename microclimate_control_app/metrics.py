@@ -0,0 +1,213 @@
+import contextvars
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from redis.exceptions import RedisError
+
+from .connections import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Redis hash holding the metrics of all worker processes, one field per series
+METRICS_KEY = 'metrics:http'
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Histograms by name, with their help text and bucket upper bounds
+HISTOGRAMS = {
+    'http_request_duration_seconds': ('Request latency in seconds.', DURATION_BUCKETS),
+    'http_request_queries': ('Number of SQL queries per request.', QUERY_BUCKETS),
+    'http_response_size_bytes': ('Size of the response body in bytes.', SIZE_BUCKETS),
+}
+
+# Counters by name, with their help text
+COUNTERS = {
+    'http_requests_total': 'Number of requests.',
+    'http_request_query_seconds_total': 'Time spent in SQL queries in seconds.',
+    'http_response_cache_total': 'Response cache lookups of the cached views by result.',
+}
+
+# Metrics of processes without a Redis cache are only kept in the process
+_local = defaultdict(float)
+_local_lock = threading.Lock()
+
+_request_stats = contextvars.ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    """
+    SQL statistics of the request being handled.
+
+    Attributes:
+        queries (int): The number of SQL queries executed.
+        query_time (float): The seconds spent executing them.
+    """
+
+    __slots__ = ('queries', 'query_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+
+
+def start():
+    """
+    Start collecting the SQL statistics of a request.
+
+    The statistics are kept in a context variable, which is copied into the threads that run
+    the database calls of async views, so queries are counted for both sync and async views.
+
+    Returns:
+        tuple: The RequestStats of the request and the token to pass to stop.
+    """
+    stats = RequestStats()
+    return stats, _request_stats.set(stats)
+
+
+def stop(token):
+    """
+    Stop collecting the SQL statistics of a request.
+
+    Args:
+        token: The token returned by start.
+    """
+    _request_stats.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper counting and timing the queries of the current request.
+    """
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.query_time += time.perf_counter() - started
+
+
+def install(connection):
+    """
+    Install the query wrapper on a database connection unless it is installed.
+
+    Args:
+        connection: The database connection.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _observe(increments, name, labels, value):
+    bound = next((_format(bound) for bound in HISTOGRAMS[name][1] if value <= bound), '+Inf')
+    increments[f'{name}_bucket|{labels},le="{bound}"'] += 1
+    increments[f'{name}_sum|{labels}'] += value
+    increments[f'{name}_count|{labels}'] += 1
+
+
+def record(route, method, status_code, duration, stats, cache_result=None, size=None):
+    """
+    Add a handled request to the metrics.
+
+    All series are incremented in one Redis pipeline. Failures to reach Redis are logged and
+    otherwise ignored, so metrics never fail a request.
+
+    Args:
+        route (str): The name of the matched URL pattern.
+        method (str): The HTTP method.
+        status_code (int): The status code of the response.
+        duration (float): The seconds spent handling the request.
+        stats (RequestStats): The SQL statistics of the request.
+        cache_result (str): 'hit' or 'miss' for requests to cached views, otherwise None.
+        size (int): The size of the response body, or None for streaming responses.
+    """
+    labels = f'route="{_label(route)}",method="{_label(method)}"'
+    increments = defaultdict(float)
+    increments[f'http_requests_total|{labels},status="{status_code}"'] += 1
+    increments[f'http_request_query_seconds_total|{labels}'] += stats.query_time
+    _observe(increments, 'http_request_duration_seconds', labels, duration)
+    _observe(increments, 'http_request_queries', labels, stats.queries)
+    if size is not None:
+        _observe(increments, 'http_response_size_bytes', labels, size)
+    if cache_result is not None:
+        increments[f'http_response_cache_total|route="{_label(route)}",result="{_label(cache_result)}"'] += 1
+
+    redis = get_redis()
+    if redis is None:
+        with _local_lock:
+            for field, amount in increments.items():
+                _local[field] += amount
+        return
+
+    try:
+        # HINCRBY fails on fields holding a fraction, which sums may hold after any request
+        pipeline = redis.pipeline(transaction=False)
+        for field, amount in increments.items():
+            pipeline.hincrbyfloat(METRICS_KEY, field, amount)
+        pipeline.execute()
+    except RedisError:
+        logger.warning('Could not record request metrics', exc_info=True)
+
+
+def _read():
+    """
+    Read the values of all series.
+
+    Returns:
+        dict: Values keyed by their field, a metric name and its labels separated by '|'.
+    """
+    redis = get_redis()
+    if redis is None:
+        with _local_lock:
+            return dict(_local)
+    return {
+        (field.decode('utf-8') if isinstance(field, bytes) else field): float(value)
+        for field, value in redis.hgetall(METRICS_KEY).items()
+    }
+
+
+def render():
+    """
+    Render the metrics of all worker processes in the Prometheus text exposition format.
+
+    Returns:
+        str: The metrics.
+
+    Raises:
+        RedisError: If the metrics cannot be read from Redis.
+    """
+    values = _read()
+    series = defaultdict(dict)
+    for field, value in values.items():
+        name, _, labels = field.partition('|')
+        series[name][labels] = value
+
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for labels in sorted(series[f'{name}_count']):
+            cumulative = 0
+            for bound in [_format(bound) for bound in buckets] + ['+Inf']:
+                cumulative += series[f'{name}_bucket'].get(f'{labels},le="{bound}"', 0)
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {_format(cumulative)}')
+            lines.append(f'{name}_sum{{{labels}}} {_format(series[f"{name}_sum"].get(labels, 0))}')
+            lines.append(f'{name}_count{{{labels}}} {_format(series[f"{name}_count"][labels])}')
+    for name, help_text in COUNTERS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for labels, value in sorted(series[name].items()):
+            lines.append(f'{name}{{{labels}}} {_format(value)}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,133 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.http import JsonResponse
+
+from . import metrics, profiling
+
+
+class MetricsMiddleware:
+    """
+    Middleware recording the latency, SQL queries, response cache result and response size of
+    every request, labelled with the name of the matched URL pattern.
+
+    It is placed first in MIDDLEWARE so that the time spent in all other middleware is included.
+    Requests to the metrics endpoint itself are not recorded.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token = metrics.start()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.stop(token)
+        self.record(request, response, time.perf_counter() - started, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats, token = metrics.start()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.stop(token)
+        await sync_to_async(self.record, thread_sensitive=False)(
+            request, response, time.perf_counter() - started, stats)
+        return response
+
+    def record(self, request, response, duration, stats):
+        """
+        Record a handled request.
+
+        Args:
+            request: The HTTP request.
+            response: The HTTP response.
+            duration (float): The seconds spent handling the request.
+            stats (RequestStats): The SQL statistics of the request.
+        """
+        route = request.resolver_match.view_name if request.resolver_match else 'unmatched'
+        if route == 'metrics':
+            return
+        size = None if response.streaming else len(response.content)
+        metrics.record(route, request.method, response.status_code, duration, stats,
+                       getattr(request, 'response_cache', None), size)
+
+
+class ProfilingMiddleware:
+    """
+    Middleware profiling single requests of staff users on demand.
+
+    A request carrying the X-Profile header or the profile query parameter with a true value
+    is run under cProfile with its SQL statements recorded. The profile is stored in the cache,
+    and its ID is returned in the X-Profile-Id response header. Requests of other users run
+    as usual.
+
+    Staff users take shortcuts around the access checks, so a profiled request can instead run
+    as the user with the ID in the X-Profile-User header or the profile_user query parameter.
+    Only the user making the request has to be a staff user.
+
+    It is placed after the authentication middleware, so that session users are recognized
+    as well as bearer tokens.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not profiling.requested(request) or not profiling.is_admin(request):
+            return self.get_response(request)
+        try:
+            user = profiling.target_user(request)
+        except profiling.UnknownUser:
+            return self.unknown_user()
+        if user is not None:
+            profiling.run_as(request, user)
+        profile = profiling.Profile(user.id if user else None)
+        profile.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.stop()
+        profile.save(request, response)
+        response['X-Profile-Id'] = profile.id
+        return response
+
+    async def __acall__(self, request):
+        if not profiling.requested(request) or not await sync_to_async(profiling.is_admin)(request):
+            return await self.get_response(request)
+        try:
+            user = await sync_to_async(profiling.target_user)(request)
+        except profiling.UnknownUser:
+            return self.unknown_user()
+        if user is not None:
+            profiling.run_as(request, user)
+        profile = profiling.Profile(user.id if user else None)
+        profile.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profile.stop()
+        await sync_to_async(profile.save)(request, response)
+        response['X-Profile-Id'] = profile.id
+        return response
+
+    def unknown_user(self):
+        return JsonResponse({'detail': 'The user to run the profiled request as does not exist.'}, status=400)
@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-18 10:09
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('microclimate_control_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='datapoint',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
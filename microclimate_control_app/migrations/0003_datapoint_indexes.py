@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-18 10:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('microclimate_control_app', '0002_datapoint_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='datapoint',
+            index=models.Index(fields=['building_object', 'data_type', 'timestamp'], name='datapoint_building_type_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='datapoint',
+            index=models.Index(fields=['building_object', 'timestamp', 'id'], name='datapoint_building_ts_idx'),
+        ),
+    ]
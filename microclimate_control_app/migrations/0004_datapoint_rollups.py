@@ -0,0 +1,80 @@
+# Generated by Django 4.2 on 2026-10-18 10:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('microclimate_control_app', '0003_datapoint_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MinuteRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('count', models.PositiveIntegerField()),
+                ('min_value', models.FloatField()),
+                ('max_value', models.FloatField()),
+                ('sum_value', models.FloatField()),
+                ('last_value', models.FloatField()),
+                ('last_timestamp', models.DateTimeField()),
+                ('building_object', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='microclimate_control_app.buildingobject')),
+                ('data_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='microclimate_control_app.datatype')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='HourRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('count', models.PositiveIntegerField()),
+                ('min_value', models.FloatField()),
+                ('max_value', models.FloatField()),
+                ('sum_value', models.FloatField()),
+                ('last_value', models.FloatField()),
+                ('last_timestamp', models.DateTimeField()),
+                ('building_object', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='microclimate_control_app.buildingobject')),
+                ('data_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='microclimate_control_app.datatype')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='DayRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('count', models.PositiveIntegerField()),
+                ('min_value', models.FloatField()),
+                ('max_value', models.FloatField()),
+                ('sum_value', models.FloatField()),
+                ('last_value', models.FloatField()),
+                ('last_timestamp', models.DateTimeField()),
+                ('building_object', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='microclimate_control_app.buildingobject')),
+                ('data_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='microclimate_control_app.datatype')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='minuterollup',
+            constraint=models.UniqueConstraint(fields=('building_object', 'data_type', 'bucket'), name='minuterollup_unique_bucket'),
+        ),
+        migrations.AddConstraint(
+            model_name='hourrollup',
+            constraint=models.UniqueConstraint(fields=('building_object', 'data_type', 'bucket'), name='hourrollup_unique_bucket'),
+        ),
+        migrations.AddConstraint(
+            model_name='dayrollup',
+            constraint=models.UniqueConstraint(fields=('building_object', 'data_type', 'bucket'), name='dayrollup_unique_bucket'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.2 on 2026-10-18 10:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('microclimate_control_app', '0004_datapoint_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectGrant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('access', 'Access project and all its building objects'), ('update', 'Update project'), ('create_buildings', 'Create building objects'), ('update_buildings', 'Update building objects'), ('delete_buildings', 'Delete building objects')], max_length=20)),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='project_grants', to='auth.group')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grants', to='microclimate_control_app.project')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='project_grants', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BuildingGrant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('access', 'Access building object')], default='access', max_length=20)),
+                ('building_object', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grants', to='microclimate_control_app.buildingobject')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='building_grants', to='auth.group')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='building_grants', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='projectgrant',
+            index=models.Index(fields=['user', 'action', 'project'], name='projectgrant_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectgrant',
+            index=models.Index(fields=['group', 'action', 'project'], name='projectgrant_group_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='projectgrant',
+            constraint=models.CheckConstraint(check=models.Q(('user__isnull', True), ('group__isnull', True), _connector='XOR'), name='projectgrant_user_xor_group'),
+        ),
+        migrations.AddConstraint(
+            model_name='projectgrant',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', False)), fields=('user', 'project', 'action'), name='projectgrant_unique_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='projectgrant',
+            constraint=models.UniqueConstraint(condition=models.Q(('group__isnull', False)), fields=('group', 'project', 'action'), name='projectgrant_unique_group'),
+        ),
+        migrations.AddIndex(
+            model_name='buildinggrant',
+            index=models.Index(fields=['user', 'action', 'building_object'], name='buildinggrant_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='buildinggrant',
+            index=models.Index(fields=['group', 'action', 'building_object'], name='buildinggrant_group_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='buildinggrant',
+            constraint=models.CheckConstraint(check=models.Q(('user__isnull', True), ('group__isnull', True), _connector='XOR'), name='buildinggrant_user_xor_group'),
+        ),
+        migrations.AddConstraint(
+            model_name='buildinggrant',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', False)), fields=('user', 'building_object', 'action'), name='buildinggrant_unique_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='buildinggrant',
+            constraint=models.UniqueConstraint(condition=models.Q(('group__isnull', False)), fields=('group', 'building_object', 'action'), name='buildinggrant_unique_group'),
+        ),
+    ]
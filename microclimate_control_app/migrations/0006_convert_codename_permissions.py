@@ -0,0 +1,67 @@
+import re
+
+from django.db import migrations
+
+APP_NAME = 'microclimate_control_app'
+
+PROJECT_CODENAME_PATTERNS = {
+    'access': re.compile(r'^can_access_project_(\d+)$'),
+    'update': re.compile(r'^can_update_project_(\d+)$'),
+    'create_buildings': re.compile(r'^can_create_buildings_project_(\d+)$'),
+    'update_buildings': re.compile(r'^can_update_buildings_project_(\d+)$'),
+    'delete_buildings': re.compile(r'^can_delete_buildings_project_(\d+)$'),
+}
+
+BUILDING_CODENAME_PATTERN = re.compile(r'^can_access_project_(\d+)_building_(\d+)$')
+
+
+def convert_codename_permissions(apps, schema_editor):
+    """
+    Create access grants for every user and group holding a per-object codename permission.
+    """
+    Permission = apps.get_model('auth', 'Permission')
+    Project = apps.get_model(APP_NAME, 'Project')
+    BuildingObject = apps.get_model(APP_NAME, 'BuildingObject')
+    ProjectGrant = apps.get_model(APP_NAME, 'ProjectGrant')
+    BuildingGrant = apps.get_model(APP_NAME, 'BuildingGrant')
+
+    project_ids = set(Project.objects.values_list('id', flat=True))
+    building_ids = set(BuildingObject.objects.values_list('id', flat=True))
+
+    project_grants, building_grants = set(), set()
+    for permission in Permission.objects.filter(content_type__app_label=APP_NAME):
+        holders = [('user', user_id) for user_id in permission.user_set.values_list('id', flat=True)] + \
+                  [('group', group_id) for group_id in permission.group_set.values_list('id', flat=True)]
+
+        match = BUILDING_CODENAME_PATTERN.match(permission.codename)
+        if match:
+            if int(match.group(2)) in building_ids:
+                building_grants.update((holder, int(match.group(2))) for holder in holders)
+            continue
+        for action, pattern in PROJECT_CODENAME_PATTERNS.items():
+            match = pattern.match(permission.codename)
+            if match:
+                if int(match.group(1)) in project_ids:
+                    project_grants.update((holder, int(match.group(1)), action) for holder in holders)
+                break
+
+    ProjectGrant.objects.bulk_create([
+        ProjectGrant(**{f'{holder_type}_id': holder_id}, project_id=project_id, action=action)
+        for (holder_type, holder_id), project_id, action in project_grants
+    ], ignore_conflicts=True)
+    BuildingGrant.objects.bulk_create([
+        BuildingGrant(**{f'{holder_type}_id': holder_id}, building_object_id=building_id, action='access')
+        for (holder_type, holder_id), building_id in building_grants
+    ], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('microclimate_control_app', '0005_access_grants'),
+    ]
+
+    operations = [
+        migrations.RunPython(convert_codename_permissions, migrations.RunPython.noop),
+    ]
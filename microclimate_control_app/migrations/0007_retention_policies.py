@@ -0,0 +1,45 @@
+# Generated by Django 4.2 on 2026-10-18 10:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('microclimate_control_app', '0006_convert_codename_permissions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RetentionPolicy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('raw_days', models.PositiveIntegerField(blank=True, null=True)),
+                ('minute_days', models.PositiveIntegerField(blank=True, null=True)),
+                ('hour_days', models.PositiveIntegerField(blank=True, null=True)),
+                ('day_days', models.PositiveIntegerField(blank=True, null=True)),
+                ('data_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='retention_policies', to='microclimate_control_app.datatype')),
+                ('project', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='retention_policies', to='microclimate_control_app.project')),
+            ],
+            options={
+                'verbose_name_plural': 'retention policies',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='retentionpolicy',
+            constraint=models.CheckConstraint(check=models.Q(('project__isnull', False), ('data_type__isnull', False), _connector='OR'), name='retentionpolicy_has_scope'),
+        ),
+        migrations.AddConstraint(
+            model_name='retentionpolicy',
+            constraint=models.UniqueConstraint(fields=('project', 'data_type'), name='retentionpolicy_unique_scope'),
+        ),
+        migrations.AddConstraint(
+            model_name='retentionpolicy',
+            constraint=models.UniqueConstraint(condition=models.Q(('data_type__isnull', True)), fields=('project',), name='retentionpolicy_unique_project'),
+        ),
+        migrations.AddConstraint(
+            model_name='retentionpolicy',
+            constraint=models.UniqueConstraint(condition=models.Q(('project__isnull', True)), fields=('data_type',), name='retentionpolicy_unique_data_type'),
+        ),
+    ]
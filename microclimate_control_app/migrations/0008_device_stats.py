@@ -0,0 +1,50 @@
+# Generated by Django 4.2 on 2026-10-18 10:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('microclimate_control_app', '0007_retention_policies'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveBigIntegerField()),
+                ('first_timestamp', models.DateTimeField()),
+                ('last_timestamp', models.DateTimeField()),
+                ('last_value', models.FloatField()),
+            ],
+            options={
+                'verbose_name_plural': 'device stats',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='datapoint',
+            index=models.Index(fields=['device', 'timestamp', 'id'], name='datapoint_device_ts_idx'),
+        ),
+        migrations.AddField(
+            model_name='devicestats',
+            name='data_type',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='microclimate_control_app.datatype'),
+        ),
+        migrations.AddField(
+            model_name='devicestats',
+            name='device',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='microclimate_control_app.device'),
+        ),
+        migrations.AddField(
+            model_name='devicestats',
+            name='last_building_object',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='microclimate_control_app.buildingobject'),
+        ),
+        migrations.AddConstraint(
+            model_name='devicestats',
+            constraint=models.UniqueConstraint(fields=('device', 'data_type'), name='devicestats_unique_data_type'),
+        ),
+    ]
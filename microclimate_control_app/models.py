@@ -1,6 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
 from django.db import models
+from django.utils import timezone
 
 import pdb
 
@@ -180,7 +181,7 @@ class DataPoint(models.Model):
 
     """
 
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)
     value = models.FloatField()
 
     data_type = models.ForeignKey(DataType, on_delete=models.PROTECT)
@@ -190,3 +191,274 @@ class DataPoint(models.Model):
 
     def __str__(self):
         return f"{self.data_type}: {self.value} {self.data_type.metric}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['building_object', 'data_type', 'timestamp'],
+                         name='datapoint_building_type_ts_idx'),
+            models.Index(fields=['building_object', 'timestamp', 'id'],
+                         name='datapoint_building_ts_idx'),
+            models.Index(fields=['device', 'timestamp', 'id'],
+                         name='datapoint_device_ts_idx'),
+        ]
+
+
+class ProjectGrant(models.Model):
+    """
+    Model representing a permission of a user or a group on a project.
+
+    Exactly one of user and group is set.
+
+    Attributes:
+        action (str): The granted action.
+        user (User): The user the action is granted to.
+        group (Group): The group the action is granted to.
+        project (Project): The project the action is granted on.
+
+    Methods:
+        __str__: Returns a string representation of the grant.
+
+    """
+
+    ACCESS = 'access'
+    UPDATE = 'update'
+    CREATE_BUILDINGS = 'create_buildings'
+    UPDATE_BUILDINGS = 'update_buildings'
+    DELETE_BUILDINGS = 'delete_buildings'
+    ACTIONS = [
+        (ACCESS, 'Access project and all its building objects'),
+        (UPDATE, 'Update project'),
+        (CREATE_BUILDINGS, 'Create building objects'),
+        (UPDATE_BUILDINGS, 'Update building objects'),
+        (DELETE_BUILDINGS, 'Delete building objects'),
+    ]
+
+    action = models.CharField(max_length=20, choices=ACTIONS)
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True,
+                             related_name='project_grants')
+    group = models.ForeignKey('auth.Group', on_delete=models.CASCADE, null=True, blank=True,
+                              related_name='project_grants')
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='grants')
+
+    def __str__(self):
+        return f"{self.user or self.group}: {self.get_action_display()} of {self.project}"
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(check=models.Q(user__isnull=True) ^ models.Q(group__isnull=True),
+                                   name='projectgrant_user_xor_group'),
+            models.UniqueConstraint(fields=['user', 'project', 'action'], condition=models.Q(user__isnull=False),
+                                    name='projectgrant_unique_user'),
+            models.UniqueConstraint(fields=['group', 'project', 'action'], condition=models.Q(group__isnull=False),
+                                    name='projectgrant_unique_group'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'action', 'project'], name='projectgrant_user_idx'),
+            models.Index(fields=['group', 'action', 'project'], name='projectgrant_group_idx'),
+        ]
+
+
+class BuildingGrant(models.Model):
+    """
+    Model representing a permission of a user or a group on a single building object.
+
+    Exactly one of user and group is set.
+
+    Attributes:
+        action (str): The granted action.
+        user (User): The user the action is granted to.
+        group (Group): The group the action is granted to.
+        building_object (BuildingObject): The building object the action is granted on.
+
+    Methods:
+        __str__: Returns a string representation of the grant.
+
+    """
+
+    ACCESS = 'access'
+    ACTIONS = [
+        (ACCESS, 'Access building object'),
+    ]
+
+    action = models.CharField(max_length=20, choices=ACTIONS, default=ACCESS)
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True,
+                             related_name='building_grants')
+    group = models.ForeignKey('auth.Group', on_delete=models.CASCADE, null=True, blank=True,
+                              related_name='building_grants')
+    building_object = models.ForeignKey(BuildingObject, on_delete=models.CASCADE, related_name='grants')
+
+    def __str__(self):
+        return f"{self.user or self.group}: {self.get_action_display()} of {self.building_object}"
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(check=models.Q(user__isnull=True) ^ models.Q(group__isnull=True),
+                                   name='buildinggrant_user_xor_group'),
+            models.UniqueConstraint(fields=['user', 'building_object', 'action'],
+                                    condition=models.Q(user__isnull=False), name='buildinggrant_unique_user'),
+            models.UniqueConstraint(fields=['group', 'building_object', 'action'],
+                                    condition=models.Q(group__isnull=False), name='buildinggrant_unique_group'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'action', 'building_object'], name='buildinggrant_user_idx'),
+            models.Index(fields=['group', 'action', 'building_object'], name='buildinggrant_group_idx'),
+        ]
+
+
+class DataPointRollup(models.Model):
+    """
+    Abstract model representing pre-aggregated data points of one time bucket.
+
+    Rollups hold the aggregates of all data points of a building object and data type whose
+    timestamp falls into the bucket, so that series can be charted without scanning raw rows.
+    Buckets are aligned to UTC.
+
+    Attributes:
+        bucket (DateTimeField): The start of the time bucket.
+        count (int): The number of data points in the bucket.
+        min_value (float): The smallest value in the bucket.
+        max_value (float): The largest value in the bucket.
+        sum_value (float): The sum of the values in the bucket.
+        last_value (float): The value of the latest data point in the bucket.
+        last_timestamp (DateTimeField): The timestamp of the latest data point in the bucket.
+        data_type (DataType): The data type of the aggregated data points.
+        building_object (BuildingObject): The building object of the aggregated data points.
+
+    """
+
+    bucket = models.DateTimeField()
+    count = models.PositiveIntegerField()
+    min_value = models.FloatField()
+    max_value = models.FloatField()
+    sum_value = models.FloatField()
+    last_value = models.FloatField()
+    last_timestamp = models.DateTimeField()
+
+    data_type = models.ForeignKey(DataType, on_delete=models.CASCADE)
+    building_object = models.ForeignKey(
+        BuildingObject, on_delete=models.CASCADE)
+
+    class Meta:
+        abstract = True
+        constraints = [
+            models.UniqueConstraint(fields=['building_object', 'data_type', 'bucket'],
+                                    name='%(class)s_unique_bucket'),
+        ]
+
+
+class MinuteRollup(DataPointRollup):
+    """
+    Model representing data points aggregated per minute.
+    """
+
+    class Meta(DataPointRollup.Meta):
+        pass
+
+
+class HourRollup(DataPointRollup):
+    """
+    Model representing data points aggregated per hour.
+    """
+
+    class Meta(DataPointRollup.Meta):
+        pass
+
+
+class DayRollup(DataPointRollup):
+    """
+    Model representing data points aggregated per day.
+    """
+
+    class Meta(DataPointRollup.Meta):
+        pass
+
+
+class RetentionPolicy(models.Model):
+    """
+    Model representing how long data points and their rollups are kept.
+
+    A policy applies to a project, a data type, or a data type within a project. The most specific
+    policy wins, and a data type policy takes precedence over a project policy. A period left
+    empty keeps that tier of data forever.
+
+    Attributes:
+        project (Project): The project the policy applies to.
+        data_type (DataType): The data type the policy applies to.
+        raw_days (int): The number of days raw data points are kept.
+        minute_days (int): The number of days minute rollups are kept.
+        hour_days (int): The number of days hour rollups are kept.
+        day_days (int): The number of days day rollups are kept.
+
+    Methods:
+        __str__: Returns a string representation of the retention policy.
+
+    """
+
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, null=True, blank=True,
+                                related_name='retention_policies')
+    data_type = models.ForeignKey(DataType, on_delete=models.CASCADE, null=True, blank=True,
+                                  related_name='retention_policies')
+
+    raw_days = models.PositiveIntegerField(null=True, blank=True)
+    minute_days = models.PositiveIntegerField(null=True, blank=True)
+    hour_days = models.PositiveIntegerField(null=True, blank=True)
+    day_days = models.PositiveIntegerField(null=True, blank=True)
+
+    def __str__(self):
+        scope = ' / '.join(str(target) for target in (self.project, self.data_type) if target is not None)
+        return f"Retention of {scope}"
+
+    class Meta:
+        verbose_name_plural = 'retention policies'
+        constraints = [
+            models.CheckConstraint(check=models.Q(project__isnull=False) | models.Q(data_type__isnull=False),
+                                   name='retentionpolicy_has_scope'),
+            models.UniqueConstraint(fields=['project', 'data_type'], name='retentionpolicy_unique_scope'),
+            models.UniqueConstraint(fields=['project'], condition=models.Q(data_type__isnull=True),
+                                    name='retentionpolicy_unique_project'),
+            models.UniqueConstraint(fields=['data_type'], condition=models.Q(project__isnull=True),
+                                    name='retentionpolicy_unique_data_type'),
+        ]
+
+
+class DeviceStats(models.Model):
+    """
+    Model representing running counters of the data points a device reported of one data type.
+
+    The counters are updated as data points are ingested, changed or deleted through the API, so
+    that devices can be diagnosed without scanning their data points. After data points were
+    changed directly in the database, they are recomputed with the rebuild_device_stats command.
+
+    Attributes:
+        device (Device): The reporting device.
+        data_type (DataType): The reported data type.
+        count (int): The number of reported data points.
+        first_timestamp (DateTimeField): The timestamp of the earliest reported data point.
+        last_timestamp (DateTimeField): The timestamp of the latest reported data point.
+        last_value (float): The value of the latest reported data point.
+        last_building_object (BuildingObject): The building object of the latest reported data point.
+
+    Methods:
+        __str__: Returns a string representation of the device statistics.
+
+    """
+
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='stats')
+    data_type = models.ForeignKey(DataType, on_delete=models.CASCADE)
+
+    count = models.PositiveBigIntegerField()
+    first_timestamp = models.DateTimeField()
+    last_timestamp = models.DateTimeField()
+    last_value = models.FloatField()
+    last_building_object = models.ForeignKey(BuildingObject, on_delete=models.SET_NULL, null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.device} / {self.data_type}: {self.count}"
+
+    class Meta:
+        verbose_name_plural = 'device stats'
+        constraints = [
+            models.UniqueConstraint(fields=['device', 'data_type'], name='devicestats_unique_data_type'),
+        ]
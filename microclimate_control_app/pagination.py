@@ -0,0 +1,197 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .renderers import SERIES_FORMATS
+
+
+class TimestampCursorPagination(BasePagination):
+    """
+    Keyset pagination over data points ordered by (timestamp, id).
+
+    Every page continues strictly after the (timestamp, id) position of the last row of the
+    previous page, so fetching a deep page costs the same index range scan as the first one.
+
+    Attributes:
+        page_size (int): The default number of rows per page.
+        max_page_size (int): The largest page size a client may request.
+        series_max_page_size (int): The largest page size a client may request in a columnar series format.
+        cursor_query_param (str): The query parameter holding the opaque cursor.
+        page_size_query_param (str): The query parameter holding the requested page size.
+    """
+
+    page_size = settings.DATA_POINT_PAGE_SIZE
+    max_page_size = settings.DATA_POINT_MAX_PAGE_SIZE
+    series_max_page_size = settings.DATA_POINT_SERIES_MAX_PAGE_SIZE
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Return the page of rows following the cursor given in the request.
+
+        Args:
+            queryset: The queryset of data points to paginate.
+            request: The incoming HTTP request.
+            view: The view associated with the request.
+
+        Returns:
+            list: The rows of the requested page.
+        """
+        queryset, page_size = self.get_page_queryset(queryset, request)
+        return self.get_page(list(queryset), page_size)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Return the page of rows following the cursor given in the request, using the async ORM.
+
+        Args:
+            queryset: The queryset of data points to paginate.
+            request: The incoming HTTP request.
+            view: The view associated with the request.
+
+        Returns:
+            list: The rows of the requested page.
+        """
+        queryset, page_size = self.get_page_queryset(queryset, request)
+        return self.get_page([row async for row in queryset], page_size)
+
+    def get_page_queryset(self, queryset, request):
+        """
+        Narrow the queryset to the rows of the requested page and one more row.
+
+        Args:
+            queryset: The queryset of data points to paginate.
+            request: The incoming HTTP request.
+
+        Returns:
+            tuple: The narrowed queryset and the page size.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        queryset = queryset.order_by('timestamp', 'id')
+        if position is not None:
+            timestamp, pk = position
+            queryset = queryset.filter(
+                Q(timestamp__gte=timestamp) & (Q(timestamp__gt=timestamp) | Q(id__gt=pk)))
+        return queryset[:page_size + 1], page_size
+
+    def get_page(self, results, page_size):
+        """
+        Cut the extra row off the fetched rows, remembering the position of the next page.
+
+        Args:
+            results (list): The rows fetched with the page queryset.
+            page_size (int): The page size.
+
+        Returns:
+            list: The rows of the page.
+        """
+        self.next_position = self.get_position(results[page_size - 1]) if len(results) > page_size else None
+        return results[:page_size]
+
+    def get_paginated_response(self, data):
+        """
+        Wrap the serialized page with the link to the next page.
+
+        Args:
+            data: The serialized rows of the page.
+
+        Returns:
+            Response: HTTP response with 'next' and 'results' keys.
+        """
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_page_size(self, request):
+        """
+        Get the page size requested by the client, capped at the maximum page size of the
+        requested format.
+
+        Args:
+            request: The incoming HTTP request.
+
+        Returns:
+            int: The page size to use.
+        """
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        renderer = getattr(request, 'accepted_renderer', None)
+        max_page_size = self.series_max_page_size if getattr(renderer, 'format', None) in SERIES_FORMATS \
+            else self.max_page_size
+        return min(page_size, max_page_size) if page_size > 0 else self.page_size
+
+    def get_position(self, row):
+        """
+        Get the (timestamp, id) position of a row.
+
+        Args:
+            row: A DataPoint instance or a values() dict.
+
+        Returns:
+            tuple: The timestamp and ID of the row.
+        """
+        if isinstance(row, dict):
+            return row['timestamp'], row['id']
+        return row.timestamp, row.id
+
+    def get_next_link(self):
+        """
+        Build the URL of the next page.
+
+        Returns:
+            str: The absolute URL of the next page, or None on the last page.
+        """
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def encode_cursor(self, position):
+        """
+        Encode a (timestamp, id) position into an opaque cursor string.
+
+        Args:
+            position (tuple): The timestamp and ID of the last row of a page.
+
+        Returns:
+            str: The encoded cursor.
+        """
+        timestamp, pk = position
+        return urlsafe_b64encode(f'{timestamp.isoformat()}|{pk}'.encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, request):
+        """
+        Decode the cursor given in the request into a (timestamp, id) position.
+
+        Args:
+            request: The incoming HTTP request.
+
+        Returns:
+            tuple: The timestamp and ID to continue after, or None for the first page.
+
+        Raises:
+            NotFound: If the cursor is malformed.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw_timestamp, raw_pk = urlsafe_b64decode(encoded.encode('ascii')).decode('ascii').split('|')
+            timestamp, pk = parse_datetime(raw_timestamp), int(raw_pk)
+        except (BinasciiError, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if timestamp is None:
+            raise NotFound(self.invalid_cursor_message)
+        return timestamp, pk
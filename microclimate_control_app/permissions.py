@@ -1,6 +1,7 @@
 from rest_framework.permissions import BasePermission
 
-APP_NAME = 'microclimate_control_app'
+from .access import get_access_set
+from .models import ProjectGrant
 
 
 class CanAccessProject(BasePermission):
@@ -21,7 +22,7 @@ class CanAccessProject(BasePermission):
         """
         if request.method in ['GET']:
             project_id = view.kwargs.get('project_pk', '')
-            return request.user.has_perm(f'{APP_NAME}.can_access_project_{project_id}')
+            return get_access_set(request.user).has_project_permission(ProjectGrant.ACCESS, project_id)
         else:
             return True
 
@@ -47,7 +48,7 @@ class CanUpdateProject(BasePermission):
         """
         if request.method in ['PUT', 'PATCH']:
             project_id = view.kwargs['pk']
-            return request.user.has_perm(f'{APP_NAME}.can_update_project_{project_id}')
+            return get_access_set(request.user).has_project_permission(ProjectGrant.UPDATE, project_id)
         else:
             return True
 
@@ -74,7 +75,7 @@ class CanAccessBuildingObject(BasePermission):
         if request.method in ['GET']:
             project_id, building_id = view.kwargs.get(
                 'project_pk', ''), view.kwargs.get('pk', '')
-            return request.user.has_perm(f'{APP_NAME}.can_access_project_{project_id}_building_{building_id}')
+            return get_access_set(request.user).can_access_building(project_id, building_id)
         else:
             return True
 
@@ -101,7 +102,7 @@ class CanCreateBuildingObject(BasePermission):
         if request.method == 'POST':
             project_id = view.kwargs['project_pk']
             if project_id:
-                return request.user.has_perm(f'{APP_NAME}.can_create_buildings_project_{project_id}')
+                return get_access_set(request.user).has_project_permission(ProjectGrant.CREATE_BUILDINGS, project_id)
             else:
                 return False
         else:
@@ -130,7 +131,7 @@ class CanUpdateBuildingObject(BasePermission):
         if request.method in ['PUT', 'PATCH']:
             project_id = view.kwargs['project_pk']
             if project_id:
-                return request.user.has_perm(f'{APP_NAME}.can_update_buildings_project_{project_id}')
+                return get_access_set(request.user).has_project_permission(ProjectGrant.UPDATE_BUILDINGS, project_id)
             else:
                 return False
         else:
@@ -159,7 +160,7 @@ class CanDeleteBuildingObject(BasePermission):
         if request.method == 'DELETE':
             project_id = view.kwargs['project_pk']
             if project_id:
-                return request.user.has_perm(f'{APP_NAME}.can_delete_buildings_project_{project_id}')
+                return get_access_set(request.user).has_project_permission(ProjectGrant.DELETE_BUILDINGS, project_id)
             else:
                 return False
         else:
@@ -185,11 +186,11 @@ class CanAccessBuildingContent(BasePermission):
         Returns:
             bool: True if the user has permission, False otherwise.
         """
-        user = request.user
+        access = get_access_set(request.user)
 
         project_id, building_id = view.kwargs['project_pk'], view.kwargs['object_pk']
-        if user.has_perm(f'{APP_NAME}.can_access_project_{project_id}') or \
-           user.has_perm(f'{APP_NAME}.can_access_project_{project_id}_building_{building_id}'):
+        if access.has_project_permission(ProjectGrant.ACCESS, project_id) or \
+           access.can_access_building(project_id, building_id):
             return True
 
         return False
@@ -0,0 +1,242 @@
+import contextvars
+import cProfile
+import io
+import logging
+import pstats
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+PROFILE_KEY_PREFIX = 'profile:'
+
+# A request is profiled when it carries this header or query parameter with a true value
+HEADER = 'X-Profile'
+QUERY_PARAM = 'profile'
+
+TRUE_VALUES = ('1', 'true', 'yes')
+
+# A profiled request runs as the user with the ID in this header or query parameter, if given
+USER_HEADER = 'X-Profile-User'
+USER_QUERY_PARAM = 'profile_user'
+
+_statements = contextvars.ContextVar('profiled_statements', default=None)
+
+
+def requested(request):
+    """
+    Check whether a request asks to be profiled.
+
+    Args:
+        request: The HTTP request.
+
+    Returns:
+        bool: True if the profiling header or query parameter is set.
+    """
+    value = request.headers.get(HEADER) or request.GET.get(QUERY_PARAM) or ''
+    return value.lower() in TRUE_VALUES
+
+
+def is_admin(request):
+    """
+    Check whether a request is made by a staff user, authenticated by session or bearer token.
+
+    Only called for requests that ask to be profiled or for the metrics, so other requests are not
+    authenticated twice.
+
+    Args:
+        request: The HTTP request.
+
+    Returns:
+        bool: True if the user is a staff user.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+    try:
+        authenticated = JWTAuthentication().authenticate(request)
+    except APIException:
+        return False
+    return authenticated is not None and authenticated[0].is_staff
+
+
+class UnknownUser(Exception):
+    """
+    Raised when the user a profiled request should run as does not exist or is inactive.
+    """
+
+
+def target_user(request):
+    """
+    Get the user a profiled request should run as.
+
+    Only called once the requesting user was checked to be a staff user.
+
+    Args:
+        request: The HTTP request.
+
+    Returns:
+        User: The active user with the ID in the profiling user header or query parameter, or
+              None if neither is given.
+
+    Raises:
+        UnknownUser: If the ID is malformed or no active user has it.
+    """
+    user_id = request.headers.get(USER_HEADER) or request.GET.get(USER_QUERY_PARAM)
+    if not user_id:
+        return None
+    try:
+        return User.objects.get(id=int(user_id), is_active=True)
+    except (ValueError, User.DoesNotExist):
+        raise UnknownUser(user_id)
+
+
+def run_as(request, user):
+    """
+    Make a request authenticate as another user.
+
+    The REST views honour the forced user the same way the DRF test client does, and the async
+    views check for it before reading the bearer token.
+
+    Args:
+        request: The HTTP request.
+        user (User): The user to run the request as.
+    """
+    request._force_auth_user = user
+    request.user = user
+
+
+def record_statement(execute, sql, params, many, context):
+    """
+    Database execute wrapper recording the SQL statements of the profiled request and their timings.
+    """
+    statements = _statements.get()
+    if statements is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if len(statements) < settings.PROFILE_MAX_STATEMENTS:
+            statements.append({'sql': sql, 'many': many, 'duration': time.perf_counter() - started})
+
+
+def install(connection):
+    """
+    Install the statement recorder on a database connection unless it is installed.
+
+    Args:
+        connection: The database connection.
+    """
+    if record_statement not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_statement)
+
+
+class Profile:
+    """
+    Profile of a single request, with its Python call statistics and SQL statements.
+
+    Use start and stop around the handling of the request. The call statistics come from
+    cProfile, which only sees the thread it is started in: for async views, the database calls
+    run in other threads and only appear as SQL statements, while other requests handled by
+    the event loop in the meantime are included.
+
+    Attributes:
+        id (str): The ID the profile is stored under.
+        user_id (int): The ID of the user the request runs as, or None if it runs as the staff
+                       user making it.
+        statements (list): The recorded SQL statements, each a dict with 'sql', 'many' and
+                           'duration' keys.
+    """
+
+    def __init__(self, user_id=None):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.statements = []
+        self.profiler = cProfile.Profile()
+        self.profiling = False
+        self.started = None
+        self.began = None
+        self.duration = None
+        self.token = None
+
+    def start(self):
+        self.token = _statements.set(self.statements)
+        self.started = timezone.now()
+        try:
+            self.profiler.enable()
+            self.profiling = True
+        except ValueError:
+            # Another profiler is active in the process, only SQL statements are recorded
+            logger.warning('Could not start the profiler, recording SQL statements only')
+        self.began = time.perf_counter()
+
+    def stop(self):
+        self.duration = time.perf_counter() - self.began
+        if self.profiling:
+            self.profiler.disable()
+        _statements.reset(self.token)
+
+    def call_stats(self):
+        """
+        Format the call statistics of the functions with the highest cumulative time.
+
+        Returns:
+            str: The pstats report, or None if the profiler could not be started.
+        """
+        if not self.profiling:
+            return None
+        output = io.StringIO()
+        pstats.Stats(self.profiler, stream=output).sort_stats('cumulative').print_stats(
+            settings.PROFILE_STATS_LIMIT)
+        return output.getvalue()
+
+    def save(self, request, response):
+        """
+        Store the profile in the cache.
+
+        Args:
+            request: The profiled HTTP request.
+            response: Its HTTP response.
+
+        Returns:
+            dict: The stored profile.
+        """
+        profile = {
+            'id': self.id,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'route': request.resolver_match.view_name if request.resolver_match else None,
+            'user': self.user_id,
+            'status': response.status_code,
+            'started': self.started.isoformat(),
+            'duration': self.duration,
+            'query_count': len(self.statements),
+            'query_time': sum(statement['duration'] for statement in self.statements),
+            'queries': self.statements,
+            'calls': self.call_stats(),
+        }
+        cache.set(f'{PROFILE_KEY_PREFIX}{self.id}', profile, settings.PROFILE_RESULT_TIMEOUT)
+        logger.info('Stored profile %s of %s %s', self.id, request.method, request.path)
+        return profile
+
+
+def get(profile_id):
+    """
+    Get a stored profile.
+
+    Args:
+        profile_id (str): The ID of the profile.
+
+    Returns:
+        dict: The profile, or None if it does not exist or has expired.
+    """
+    return cache.get(f'{PROFILE_KEY_PREFIX}{profile_id}')
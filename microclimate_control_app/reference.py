@@ -0,0 +1,198 @@
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from .caching import aget_generations, bump_generation, get_generations
+from .models import DataType, Device, Metric
+
+# Generation counter shared by all processes through the cache, advanced whenever a metric,
+# data type or device, or the data types collected by a device, change
+GENERATION = 'reference'
+
+_snapshot = None
+_checked = 0.0
+_lock = threading.Lock()
+
+
+class ReferenceData:
+    """
+    Snapshot of the metrics, data types and devices, held in the memory of the process.
+
+    Attributes:
+        version (int): The generation counter the snapshot was loaded under.
+        metrics (dict): Metric names keyed by ID.
+        data_types (dict): Data types keyed by ID, each a dict with 'id', 'code', 'name' and
+                           'metric_id' keys.
+        data_type_ids (dict): Data type IDs keyed by code.
+        devices (dict): Devices keyed by ID, each a dict with 'id' and 'name' keys.
+        data_collected (dict): Frozensets of the IDs of the data types each device collects,
+                               keyed by device ID.
+    """
+
+    def __init__(self, version, metrics, data_types, devices, data_collected):
+        self.version = version
+        self.metrics = metrics
+        self.data_types = data_types
+        self.data_type_ids = {data_type['code']: data_type_id for data_type_id, data_type in data_types.items()}
+        self.devices = devices
+        self.data_collected = data_collected
+
+    @classmethod
+    def load(cls, version):
+        """
+        Load the reference tables and the data types collected by every device from the database.
+
+        Args:
+            version (int): The generation counter read before loading.
+
+        Returns:
+            ReferenceData: The snapshot.
+        """
+        data_collected = defaultdict(set)
+        for device_id, data_type_id in Device.data_collected.through.objects.values_list('device_id', 'datatype_id'):
+            data_collected[device_id].add(data_type_id)
+        return cls(
+            version,
+            dict(Metric.objects.values_list('id', 'name')),
+            {row['id']: row for row in DataType.objects.values('id', 'code', 'name', 'metric_id')},
+            {row['id']: row for row in Device.objects.values('id', 'name')},
+            {device_id: frozenset(data_type_ids) for device_id, data_type_ids in data_collected.items()},
+        )
+
+    def contains(self, data_types=(), devices=(), readings=()):
+        """
+        Check whether the snapshot holds data types and devices, and devices collecting data types.
+
+        Args:
+            data_types: An iterable of data type IDs.
+            devices: An iterable of device IDs.
+            readings: An iterable of (device ID, data type ID) pairs.
+
+        Returns:
+            bool: True if all of them are present.
+        """
+        return all(data_type_id in self.data_types for data_type_id in data_types) \
+            and all(device_id in self.devices for device_id in devices) \
+            and all(self.collects(device_id, data_type_id) for device_id, data_type_id in readings)
+
+    def collects(self, device_id, data_type_id):
+        """
+        Check whether a device collects a data type.
+
+        Args:
+            device_id (int): The ID of the device.
+            data_type_id (int): The ID of the data type.
+
+        Returns:
+            bool: True if the data type is in the data_collected of the device.
+        """
+        return data_type_id in self.data_collected.get(device_id, ())
+
+    def data_type_name(self, data_type_id):
+        return self.data_types[data_type_id]['name']
+
+    def metric_name(self, data_type_id):
+        return self.metrics.get(self.data_types[data_type_id]['metric_id'])
+
+
+def _fresh(data_types, devices, readings):
+    """
+    Get the snapshot of the process if it can be used without checking the generation counter.
+
+    It can be used if the counter was checked less than REFERENCE_CACHE_CHECK_SECONDS ago and the
+    snapshot holds the requested rows. Rows it lacks may have been created since it was loaded.
+    """
+    snapshot = _snapshot
+    if snapshot is None or time.monotonic() - _checked >= settings.REFERENCE_CACHE_CHECK_SECONDS:
+        return None
+    return snapshot if snapshot.contains(data_types, devices, readings) else None
+
+
+def _matching(version):
+    """
+    Get the snapshot of the process if it was loaded under a generation, marking the counter as checked.
+    """
+    global _checked
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != version:
+        return None
+    _checked = time.monotonic()
+    return snapshot
+
+
+def _load(version):
+    """
+    Load the snapshot of a generation unless another thread already did.
+    """
+    global _snapshot, _checked
+    with _lock:
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = ReferenceData.load(version)
+        _checked = time.monotonic()
+        return _snapshot
+
+
+def get(data_types=(), devices=(), readings=()):
+    """
+    Get the reference data of the process, reloading it if a reference table changed.
+
+    The generation counter is read from the cache at most every REFERENCE_CACHE_CHECK_SECONDS,
+    or as soon as the data types or devices about to be looked up are missing, or a device does
+    not collect a data type it is about to be checked for. Unknown IDs and incompatible readings
+    therefore cost one cache read, but no database query unless the tables changed.
+
+    Args:
+        data_types: The IDs of the data types about to be looked up.
+        devices: The IDs of the devices about to be looked up.
+        readings: The (device ID, data type ID) pairs about to be checked.
+
+    Returns:
+        ReferenceData: The snapshot.
+    """
+    snapshot = _fresh(data_types, devices, readings)
+    if snapshot is None:
+        version = get_generations([GENERATION])[0]
+        snapshot = _matching(version) or _load(version)
+    return snapshot
+
+
+async def aget(data_types=(), devices=(), readings=()):
+    """
+    Get the reference data of the process from async code.
+
+    Args:
+        data_types: The IDs of the data types about to be looked up.
+        devices: The IDs of the devices about to be looked up.
+        readings: The (device ID, data type ID) pairs about to be checked.
+
+    Returns:
+        ReferenceData: The snapshot.
+    """
+    snapshot = _fresh(data_types, devices, readings)
+    if snapshot is None:
+        version = (await aget_generations([GENERATION]))[0]
+        snapshot = _matching(version) or await sync_to_async(_load)(version)
+    return snapshot
+
+
+def _changed():
+    global _snapshot
+    _snapshot = None
+    bump_generation(GENERATION)
+
+
+def invalidate():
+    """
+    Discard the reference data of all processes after a reference table changed.
+
+    The snapshot of this process is dropped at once, so the change is seen by the rest of the
+    transaction. The generation counter is advanced once the transaction is committed, so other
+    processes do not reload before the change is visible to them.
+    """
+    global _snapshot
+    _snapshot = None
+    transaction.on_commit(_changed)
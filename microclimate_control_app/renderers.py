@@ -0,0 +1,62 @@
+import json
+import struct
+import sys
+from array import array
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+SERIES_FORMATS = ('series', 'series-bin')
+
+SERIES_BINARY_MAGIC = b'MCS1'
+
+
+class SeriesJSONRenderer(JSONRenderer):
+    """
+    Renderer for the columnar time series format as JSON.
+
+    Clients request it with the 'application/vnd.microclimate.series+json' Accept header
+    or the 'format=series' query parameter.
+    """
+
+    media_type = 'application/vnd.microclimate.series+json'
+    format = 'series'
+
+
+class SeriesBinaryRenderer(BaseRenderer):
+    """
+    Renderer for the columnar time series format as packed binary arrays.
+
+    Clients request it with the 'application/vnd.microclimate.series+binary' Accept header
+    or the 'format=series-bin' query parameter. The payload is laid out as:
+
+        4 bytes      magic b'MCS1'
+        uint32 LE    length of the JSON header in bytes
+        JSON header  the columnar payload with the 'timestamps' and 'values' arrays of every
+                     series replaced by their 'count'
+        per series   'count' float64 LE timestamps (epoch milliseconds), then 'count' float64 LE values
+
+    Responses without series, such as errors, are rendered as plain JSON.
+    """
+
+    media_type = 'application/vnd.microclimate.series+binary'
+    format = 'series-bin'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, dict) or 'series' not in data:
+            return JSONRenderer().render(data, accepted_media_type, renderer_context)
+
+        header = dict(data, series=[])
+        arrays = []
+        for series in data['series']:
+            timestamps, values = array('d', series['timestamps']), array('d', series['values'])
+            if sys.byteorder == 'big':
+                timestamps.byteswap()
+                values.byteswap()
+            header['series'].append({key: value for key, value in series.items()
+                                     if key not in ('timestamps', 'values')} | {'count': len(values)})
+            arrays.extend([timestamps.tobytes(), values.tobytes()])
+
+        encoded_header = json.dumps(header, separators=(',', ':')).encode('utf-8')
+        return b''.join([SERIES_BINARY_MAGIC, struct.pack('<I', len(encoded_header)), encoded_header, *arrays])
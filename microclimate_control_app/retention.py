@@ -0,0 +1,201 @@
+import time
+from collections import defaultdict
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from . import rollups
+from .models import DataPoint, RetentionPolicy
+
+# The retention period of each tier of data and the model and time field it is purged from, in the
+# order of purging: the rollups of raw data points are rebuilt when these are purged, so the rollup
+# tiers go first and their expired rows are not rebuilt just to be deleted again
+TIERS = {
+    'day': ('day_days', rollups.GRANULARITIES['day'][0], 'bucket'),
+    'hour': ('hour_days', rollups.GRANULARITIES['hour'][0], 'bucket'),
+    'minute': ('minute_days', rollups.GRANULARITIES['minute'][0], 'bucket'),
+    'raw': ('raw_days', DataPoint, 'timestamp'),
+}
+
+
+def resolve(policies, project_id, data_type_id):
+    """
+    Find the policy that applies to the data points of a data type within a project.
+
+    Args:
+        policies (dict): Policies keyed by their (project_id, data_type_id) scope.
+        project_id: The ID of the project, or None for building objects without one.
+        data_type_id: The ID of the data type.
+
+    Returns:
+        RetentionPolicy: The most specific matching policy, or None.
+    """
+    for scope in ((project_id, data_type_id), (None, data_type_id), (project_id, None)):
+        if scope[0] is None and scope[1] is None:
+            continue
+        policy = policies.get(scope)
+        if policy is not None:
+            return policy
+    return None
+
+
+def scopes(policies, field):
+    """
+    Group the data a tier is purged from by the retention period that applies to it.
+
+    The conditions follow the precedence of resolve(): a data type policy within a project
+    wins over a data type policy, which wins over a project policy, even if the winning
+    policy keeps the tier forever.
+
+    Args:
+        policies (dict): Policies keyed by their (project_id, data_type_id) scope.
+        field (str): The name of the retention period field of the tier.
+
+    Returns:
+        dict: Q objects over the building_object and data_type fields keyed by the number of days
+              the matching rows are kept.
+    """
+    specific = [scope for scope in policies if None not in scope]
+    typed = {data_type_id for project_id, data_type_id in policies if project_id is None and data_type_id is not None}
+
+    periods = defaultdict(list)
+    for (project_id, data_type_id), policy in policies.items():
+        days = getattr(policy, field)
+        if days is None or (project_id is None and data_type_id is None):
+            continue
+        if project_id is not None and data_type_id is not None:
+            condition = Q(building_object__project_id=project_id, data_type_id=data_type_id)
+        elif project_id is None:
+            condition = Q(data_type_id=data_type_id)
+            overridden = [scope[0] for scope in specific if scope[1] == data_type_id]
+            if overridden:
+                condition &= ~Q(building_object__project_id__in=overridden)
+        else:
+            condition = Q(building_object__project_id=project_id)
+            overridden = typed | {scope[1] for scope in specific if scope[0] == project_id}
+            if overridden:
+                condition &= ~Q(data_type_id__in=overridden)
+        periods[days].append(condition)
+    return {days: reduce(or_, conditions) for days, conditions in periods.items()}
+
+
+def expired_rollups(policies, now):
+    """
+    Select the data points whose rollups are already past their retention period.
+
+    A rollup expires when its bucket starts before the cutoff, so the data points of the bucket
+    the cutoff falls into are still rolled up.
+
+    Args:
+        policies (dict): Policies keyed by their (project_id, data_type_id) scope.
+        now (datetime): The time to compute the cutoffs from.
+
+    Returns:
+        dict: Q objects over data points keyed by granularity, for the granularities with
+              expired rollups.
+    """
+    expired = {}
+    for granularity, (_, step) in rollups.GRANULARITIES.items():
+        conditions = []
+        for days, condition in scopes(policies, TIERS[granularity][0]).items():
+            cutoff = now - timedelta(days=days)
+            bucket = rollups.truncate(cutoff, granularity)
+            conditions.append(condition & Q(timestamp__lt=bucket + step if bucket != cutoff else bucket))
+        if conditions:
+            expired[granularity] = reduce(or_, conditions)
+    return expired
+
+
+def expire(now=None, batch_size=5000, rebuild_days=7, pause=0, dry_run=False):
+    """
+    Apply all retention policies.
+
+    The rows of each tier are grouped by the retention period that applies to them, and every
+    group is purged across all building objects and data types at once, the coarsest tier first.
+    The rollups of the raw data points about to expire are rebuilt before these are deleted, so
+    that no history is lost, leaving out the rollups that are past their own retention period.
+    Rows are deleted in batches of batch_size rows, each in its own transaction. Raw cutoffs are
+    aligned to UTC days so that rebuilt rollups only cover whole days.
+
+    Args:
+        now (datetime): The time to compute the cutoffs from, defaults to the current time.
+        batch_size (int): The maximum number of rows deleted per statement.
+        rebuild_days (int): The number of days of rollups rebuilt per transaction.
+        pause (float): Seconds to sleep between delete batches.
+        dry_run (bool): Only count the expired rows without rebuilding or deleting anything.
+
+    Yields:
+        dict: A summary per tier and retention period with the cutoff and the number of expired rows.
+    """
+    now = now or timezone.now()
+    policies = {(policy.project_id, policy.data_type_id): policy for policy in RetentionPolicy.objects.all()}
+    if not policies:
+        return
+    skip = expired_rollups(policies, now)
+
+    for tier, (field, model, time_field) in TIERS.items():
+        for days, condition in sorted(scopes(policies, field).items()):
+            cutoff = now - timedelta(days=days)
+            if tier == 'raw':
+                cutoff = rollups.truncate(cutoff, 'day')
+            expired = model.objects.filter(condition, **{f'{time_field}__lt': cutoff})
+            if dry_run:
+                deleted = expired.count()
+            else:
+                if tier == 'raw':
+                    _rebuild_rollups(expired, cutoff, condition, skip, rebuild_days)
+                deleted = _delete_in_batches(expired, batch_size, pause)
+            if deleted:
+                yield {'tier': tier, 'days': days, 'cutoff': cutoff, 'deleted': deleted}
+
+
+def _rebuild_rollups(expired, cutoff, condition, skip, rebuild_days):
+    """
+    Rebuild the rollups covering expired raw data points, a few days per transaction.
+
+    Args:
+        expired: The queryset of expired data points.
+        cutoff (datetime): The start of the UTC day before which data points expire.
+        condition (Q): The condition selecting the building objects and data types that expire.
+        skip (dict): The data points left out of each granularity, as returned by expired_rollups.
+        rebuild_days (int): The number of days rebuilt per transaction.
+    """
+    first = expired.aggregate(first=Min('timestamp'))['first']
+    if first is None:
+        return
+    start = rollups.truncate(first, 'day')
+    while start < cutoff:
+        end = min(start + timedelta(days=rebuild_days), cutoff)
+        rollups.rebuild(start, end, condition=condition, skip=skip)
+        start = end
+
+
+def _delete_in_batches(expired, batch_size, pause):
+    """
+    Delete the rows of a queryset a batch at a time to keep locks and write bursts short.
+
+    Batches are paged by ID, so each batch continues the scan after the last deleted row
+    instead of scanning past the rows the previous batches removed again.
+
+    Args:
+        expired: The queryset of rows to delete.
+        batch_size (int): The maximum number of rows deleted per statement.
+        pause (float): Seconds to sleep between batches.
+
+    Returns:
+        int: The number of deleted rows.
+    """
+    deleted, last_id = 0, 0
+    while True:
+        ids = list(expired.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += expired.model.objects.filter(id__in=ids).delete()[0]
+        if len(ids) < batch_size:
+            return deleted
+        last_id = ids[-1]
+        if pause:
+            time.sleep(pause)
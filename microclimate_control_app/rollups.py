@@ -0,0 +1,268 @@
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, ExpressionWrapper
+
+from .models import DataPoint, MinuteRollup, HourRollup, DayRollup
+
+GRANULARITIES = {
+    'minute': (MinuteRollup, timedelta(minutes=1)),
+    'hour': (HourRollup, timedelta(hours=1)),
+    'day': (DayRollup, timedelta(days=1)),
+}
+
+REBUILD_CHUNK_SIZE = 10000
+
+
+def truncate(timestamp, granularity):
+    """
+    Truncate a timestamp to the start of its UTC bucket.
+
+    Args:
+        timestamp (datetime): An aware datetime.
+        granularity (str): One of the keys of GRANULARITIES.
+
+    Returns:
+        datetime: The start of the bucket the timestamp falls into.
+    """
+    timestamp = timestamp.astimezone(dt_timezone.utc).replace(second=0, microsecond=0)
+    if granularity in ('hour', 'day'):
+        timestamp = timestamp.replace(minute=0)
+    if granularity == 'day':
+        timestamp = timestamp.replace(hour=0)
+    return timestamp
+
+
+def _accumulate(aggregates, key, timestamp, value):
+    """
+    Fold a single value into the aggregates of its bucket.
+
+    Args:
+        aggregates (dict): Aggregates keyed by (building_object_id, data_type_id, bucket).
+        key (tuple): The key of the bucket.
+        timestamp (datetime): The timestamp of the value.
+        value (float): The value.
+    """
+    aggregate = aggregates.get(key)
+    if aggregate is None:
+        aggregates[key] = {'count': 1, 'min_value': value, 'max_value': value, 'sum_value': value,
+                           'last_value': value, 'last_timestamp': timestamp}
+        return
+    aggregate['count'] += 1
+    aggregate['min_value'] = min(aggregate['min_value'], value)
+    aggregate['max_value'] = max(aggregate['max_value'], value)
+    aggregate['sum_value'] += value
+    if timestamp >= aggregate['last_timestamp']:
+        aggregate['last_value'], aggregate['last_timestamp'] = value, timestamp
+
+
+def _merge(rollup, aggregate):
+    """
+    Merge aggregates of newly stored data points into an existing rollup row.
+
+    Args:
+        rollup: A rollup model instance.
+        aggregate (dict): The aggregates to merge in.
+    """
+    rollup.count += aggregate['count']
+    rollup.min_value = min(rollup.min_value, aggregate['min_value'])
+    rollup.max_value = max(rollup.max_value, aggregate['max_value'])
+    rollup.sum_value += aggregate['sum_value']
+    if aggregate['last_timestamp'] >= rollup.last_timestamp:
+        rollup.last_value, rollup.last_timestamp = aggregate['last_value'], aggregate['last_timestamp']
+
+
+def _upsert(model, aggregates):
+    """
+    Add aggregates to the rollup rows of a model, creating missing rows.
+
+    Args:
+        model: The rollup model class.
+        aggregates (dict): Aggregates keyed by (building_object_id, data_type_id, bucket).
+    """
+    buckets = [bucket for _, _, bucket in aggregates]
+    existing = model.objects.select_for_update().filter(
+        building_object_id__in={building_id for building_id, _, _ in aggregates},
+        data_type_id__in={data_type_id for _, data_type_id, _ in aggregates},
+        bucket__gte=min(buckets), bucket__lte=max(buckets),
+    )
+
+    updated = []
+    for rollup in existing:
+        aggregate = aggregates.get((rollup.building_object_id, rollup.data_type_id, rollup.bucket))
+        if aggregate is not None:
+            _merge(rollup, aggregate)
+            updated.append(rollup)
+    model.objects.bulk_update(
+        updated, ['count', 'min_value', 'max_value', 'sum_value', 'last_value', 'last_timestamp'])
+
+    existing_keys = {(rollup.building_object_id, rollup.data_type_id, rollup.bucket) for rollup in updated}
+    model.objects.bulk_create([
+        model(building_object_id=building_id, data_type_id=data_type_id, bucket=bucket, **aggregate)
+        for (building_id, data_type_id, bucket), aggregate in aggregates.items()
+        if (building_id, data_type_id, bucket) not in existing_keys
+    ])
+
+
+def record(points):
+    """
+    Incrementally update all rollups with newly stored data points.
+
+    Args:
+        points: An iterable of stored DataPoint instances.
+    """
+    for granularity, (model, _) in GRANULARITIES.items():
+        aggregates = {}
+        for point in points:
+            key = (point.building_object_id, point.data_type_id, truncate(point.timestamp, granularity))
+            _accumulate(aggregates, key, point.timestamp, point.value)
+        if not aggregates:
+            continue
+        try:
+            with transaction.atomic():
+                _upsert(model, aggregates)
+        except IntegrityError:
+            # Another writer created one of the buckets concurrently, so it now exists to merge into
+            with transaction.atomic():
+                _upsert(model, aggregates)
+
+
+def rebuild(start, end, building_id=None, data_type_id=None, condition=None, skip=None):
+    """
+    Recompute all rollups of a time window from the raw data points.
+
+    The window is widened to whole UTC days so that every rebuilt bucket is complete.
+
+    Args:
+        start (datetime): The start of the window.
+        end (datetime): The end of the window.
+        building_id (int): Optionally restrict the rebuild to one building object.
+        data_type_id (int): Optionally restrict the rebuild to one data type.
+        condition (Q): Optionally restrict the rebuild further. It may only refer to the
+                       building_object and data_type fields, which data points and rollups share.
+        skip (dict): Optionally Q objects over data points keyed by granularity, selecting the
+                     data points left out of the rollups of that granularity, e.g. because those
+                     rollups are already past their retention period.
+
+    Returns:
+        tuple: The widened start and end of the rebuilt window.
+    """
+    start = truncate(start, 'day')
+    end = truncate(end, 'day') + (timedelta(days=1) if end != truncate(end, 'day') else timedelta())
+
+    filters = {}
+    if building_id is not None:
+        filters['building_object_id'] = building_id
+    if data_type_id is not None:
+        filters['data_type_id'] = data_type_id
+
+    conditions = [condition] if condition is not None else []
+    skip = skip or {}
+    flags = {f'skip_{granularity}': ExpressionWrapper(skipped, output_field=BooleanField())
+             for granularity, skipped in skip.items()}
+
+    points = DataPoint.objects.filter(*conditions, timestamp__gte=start, timestamp__lt=end, **filters) \
+        .annotate(**flags) \
+        .order_by('building_object_id', 'data_type_id', 'timestamp', 'id') \
+        .values_list('building_object_id', 'data_type_id', 'timestamp', 'value', *flags)
+
+    with transaction.atomic():
+        for model, _ in GRANULARITIES.values():
+            model.objects.filter(*conditions, bucket__gte=start, bucket__lt=end, **filters).delete()
+
+        aggregates = {granularity: {} for granularity in GRANULARITIES}
+        for building, data_type, timestamp, value, *skipped in points.iterator(chunk_size=REBUILD_CHUNK_SIZE):
+            skipped = dict(zip(skip, skipped))
+            for granularity, (model, _) in GRANULARITIES.items():
+                if skipped.get(granularity):
+                    continue
+                key = (building, data_type, truncate(timestamp, granularity))
+                if key not in aggregates[granularity] and len(aggregates[granularity]) >= REBUILD_CHUNK_SIZE:
+                    # Rows are ordered by bucket, so every bucket collected so far is complete
+                    _flush(model, aggregates[granularity])
+                _accumulate(aggregates[granularity], key, timestamp, value)
+
+        for granularity, (model, _) in GRANULARITIES.items():
+            _flush(model, aggregates[granularity])
+
+    return start, end
+
+
+def _flush(model, aggregates):
+    """
+    Insert complete aggregates as new rollup rows and clear them.
+
+    Args:
+        model: The rollup model class.
+        aggregates (dict): Aggregates keyed by (building_object_id, data_type_id, bucket).
+    """
+    model.objects.bulk_create([
+        model(building_object_id=building_id, data_type_id=data_type_id, bucket=bucket, **aggregate)
+        for (building_id, data_type_id, bucket), aggregate in aggregates.items()
+    ], batch_size=1000)
+    aggregates.clear()
+
+
+def choose_granularity(start, end, max_buckets):
+    """
+    Choose the finest rollup granularity that covers a window in at most max_buckets buckets.
+
+    Args:
+        start (datetime): The start of the window.
+        end (datetime): The end of the window.
+        max_buckets (int): The largest acceptable number of buckets.
+
+    Returns:
+        str: The chosen granularity, falling back to the coarsest one.
+    """
+    for granularity, (_, width) in GRANULARITIES.items():
+        if (end - start) / width <= max_buckets:
+            return granularity
+    return 'day'
+
+
+def series(building_id, data_type_id, start, end, granularity):
+    """
+    Read a series of aggregated values from a rollup table.
+
+    Args:
+        building_id (int): The ID of the building object.
+        data_type_id (int): The ID of the data type.
+        start (datetime): The start of the window (inclusive).
+        end (datetime): The end of the window (exclusive).
+        granularity (str): One of the keys of GRANULARITIES.
+
+    Returns:
+        list: Dicts with 'bucket', 'count', 'min', 'max', 'avg' and 'last' keys, ordered by bucket.
+    """
+    building_id = int(building_id)
+    return series_by_building([building_id], data_type_id, start, end, granularity).get(building_id, [])
+
+
+def series_by_building(building_ids, data_type_id, start, end, granularity):
+    """
+    Read the series of aggregated values of many building objects from a rollup table in one query.
+
+    Args:
+        building_ids: The IDs of the building objects.
+        data_type_id (int): The ID of the data type.
+        start (datetime): The start of the window (inclusive).
+        end (datetime): The end of the window (exclusive).
+        granularity (str): One of the keys of GRANULARITIES.
+
+    Returns:
+        dict: Lists of dicts with 'bucket', 'count', 'min', 'max', 'avg' and 'last' keys, ordered
+              by bucket, keyed by the IDs of the building objects that have rollups in the window.
+    """
+    model, _ = GRANULARITIES[granularity]
+    rollups = model.objects.filter(
+        building_object_id__in=building_ids, data_type_id=data_type_id,
+        bucket__gte=truncate(start, granularity), bucket__lt=end,
+    ).order_by('building_object_id', 'bucket').values_list(
+        'building_object_id', 'bucket', 'count', 'min_value', 'max_value', 'sum_value', 'last_value')
+    series = {}
+    for building_id, bucket, count, min_value, max_value, sum_value, last_value in rollups:
+        series.setdefault(building_id, []).append(
+            {'bucket': bucket, 'count': count, 'min': min_value, 'max': max_value,
+             'avg': sum_value / count, 'last': last_value})
+    return series
@@ -1,4 +1,8 @@
+import math
+
 from rest_framework import serializers
+from . import reference
+from .ingest import INCOMPATIBLE_MESSAGE, store
 from .models import Project, BuildingObject, DataPoint, User, DataType, Metric, Device
 
 
@@ -98,18 +102,101 @@ class DeviceSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class DataPointSerializer(serializers.ModelSerializer):
+class FiniteFloatField(serializers.FloatField):
+    """
+    Float field rejecting booleans and the NaN and infinite values that cannot be rendered as JSON.
+    """
+
+    default_error_messages = {
+        'not_finite': 'A finite number is required.',
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('invalid')
+        value = super().to_internal_value(data)
+        if not math.isfinite(value):
+            self.fail('not_finite')
+        return value
+
+
+class ReferenceRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary key field of a data type or device validated against the cached reference data.
+
+    The related instance is built from the cached row rather than fetched from the database.
+
+    Attributes:
+        table (str): The ReferenceData mapping the primary keys are looked up in, 'data_types'
+                     or 'devices'.
+
+    """
+
+    def __init__(self, table, **kwargs):
+        self.table = table
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        row = getattr(reference.get(**{self.table: [pk]}), self.table).get(pk)
+        if row is None:
+            self.fail('does_not_exist', pk_value=data)
+        return self.get_queryset().model(**row)
+
+
+class ReferenceNamesMixin:
+    """
+    Mixin resolving the data type and metric names of data points from the cached reference data.
+
+    A ReferenceData snapshot passed as the 'reference' context item is used when it holds the
+    data type, so async views can load it before serializing.
+
+    """
+
+    _reference = None
+
+    def get_reference(self, data_type_id):
+        """
+        Get reference data holding a data type.
+
+        Args:
+            data_type_id (int): The ID of the data type.
+
+        Returns:
+            ReferenceData: The snapshot.
+        """
+        snapshot = self._reference or self.context.get('reference')
+        if snapshot is None or data_type_id not in snapshot.data_types:
+            snapshot = reference.get(data_types=[data_type_id])
+        self._reference = snapshot
+        return snapshot
+
+
+class DataPointSerializer(ReferenceNamesMixin, serializers.ModelSerializer):
     """
     Serializer for the DataPoint model.
 
     This serializer serializes DataPoint instances, converting them to JSON representations.
+    Data types, devices and names are resolved from the cached reference data, which is also
+    used to check that the device collects the data type.
 
     Attributes:
         metric_name: Serializer method field to retrieve the name of the associated metric.
         data_type_name: Serializer method field to retrieve the name of the associated data type.
+        value: Float field rejecting non-finite values.
+        data_type: Primary key field of the data type.
+        device: Primary key field of the device.
 
     """
 
+    value = FiniteFloatField()
+    data_type = ReferenceRelatedField('data_types', queryset=DataType.objects.all())
+    device = ReferenceRelatedField('devices', queryset=Device.objects.all())
     metric_name = serializers.SerializerMethodField(
         read_only=True, required=False)
     data_type_name = serializers.SerializerMethodField(required=False)
@@ -121,17 +208,127 @@ class DataPointSerializer(serializers.ModelSerializer):
         Attributes:
             model: The model class to be serialized.
             fields: The fields to include in the serialized representation.
-                   Here, 'id', 'data_type_name', 'data_type', 'metric_name', 'value', 'device', and 'building_object'
-                   fields are included.
+                   Here, 'id', 'timestamp', 'data_type_name', 'data_type', 'metric_name', 'value', 'device',
+                   and 'building_object' fields are included.
 
         """
 
         model = DataPoint
-        fields = ['id', 'data_type_name', 'data_type', 'metric_name',
+        fields = ['id', 'timestamp', 'data_type_name', 'data_type', 'metric_name',
                   'value', 'metric_name', 'device', 'building_object']
 
+    def validate(self, attrs):
+        """
+        Check that the device of the data point collects its data type.
+
+        Updates that change neither the data type nor the device are not checked, so stored
+        data points can be corrected after their device stopped collecting a data type.
+
+        Args:
+            attrs (dict): The validated fields, only the changed ones on partial updates.
+
+        Returns:
+            dict: The validated fields.
+
+        Raises:
+            ValidationError: If the data type is not in the data_collected of the device.
+        """
+        if 'device' not in attrs and 'data_type' not in attrs:
+            return attrs
+        device_id = attrs['device'].id if 'device' in attrs else self.instance.device_id
+        data_type_id = attrs['data_type'].id if 'data_type' in attrs else self.instance.data_type_id
+        if not reference.get(readings=[(device_id, data_type_id)]).collects(device_id, data_type_id):
+            raise serializers.ValidationError(
+                {'data_type': [INCOMPATIBLE_MESSAGE.format(device=device_id, data_type=data_type_id)]})
+        return attrs
+
+    def create(self, validated_data):
+        """
+        Store a new data point through the ingestion path so that rollups stay up to date.
+
+        Args:
+            validated_data (dict): The validated data point fields.
+
+        Returns:
+            DataPoint: The stored data point.
+        """
+        return store([DataPoint(**validated_data)])[0]
+
     def get_data_type_name(self, obj):
-        return obj.data_type.name
+        return self.get_reference(obj.data_type_id).data_type_name(obj.data_type_id)
 
     def get_metric_name(self, obj):
-        return obj.data_type.metric.name
+        return self.get_reference(obj.data_type_id).metric_name(obj.data_type_id)
+
+
+class DataPointReadSerializer(ReferenceNamesMixin, serializers.BaseSerializer):
+    """
+    Read-only serializer for data point listings built from values() rows.
+
+    This serializer produces the same representation as DataPointSerializer, but from the dicts
+    of a values() queryset, so no model instances or per-object field instances are created.
+    The data type and metric names come from the cached reference data instead of joins.
+
+    Attributes:
+        VALUES (tuple): The fields to select with values().
+
+    """
+
+    VALUES = ('id', 'timestamp', 'data_type', 'value', 'device', 'building_object')
+
+    timestamp_field = serializers.DateTimeField()
+
+    @classmethod
+    def values(cls, queryset):
+        """
+        Select the values needed for the representation from a data point queryset.
+
+        Args:
+            queryset: A queryset of data points.
+
+        Returns:
+            queryset: The queryset yielding dicts.
+        """
+        return queryset.values(*cls.VALUES)
+
+    def to_representation(self, row):
+        snapshot = self.get_reference(row['data_type'])
+        return {
+            'id': row['id'],
+            'timestamp': self.timestamp_field.to_representation(row['timestamp']),
+            'data_type_name': snapshot.data_type_name(row['data_type']),
+            'data_type': row['data_type'],
+            'metric_name': snapshot.metric_name(row['data_type']),
+            'value': row['value'],
+            'device': row['device'],
+            'building_object': row['building_object'],
+        }
+
+
+class DataPointSeriesSerializer(ReferenceNamesMixin, serializers.BaseSerializer):
+    """
+    Read-only serializer converting data point rows into the columnar time series format.
+
+    Rows are grouped by data type and device. The metadata of every group is sent once,
+    followed by parallel arrays of timestamps (epoch milliseconds) and values.
+
+    """
+
+    def to_representation(self, rows):
+        series = {}
+        for row in rows:
+            key = (row['data_type'], row['device'])
+            if key not in series:
+                snapshot = self.get_reference(row['data_type'])
+                series[key] = {
+                    'data_type': row['data_type'],
+                    'data_type_name': snapshot.data_type_name(row['data_type']),
+                    'metric_name': snapshot.metric_name(row['data_type']),
+                    'device': row['device'],
+                    'building_object': row['building_object'],
+                    'timestamps': [],
+                    'values': [],
+                }
+            series[key]['timestamps'].append(round(row['timestamp'].timestamp() * 1000))
+            series[key]['values'].append(row['value'])
+        return {'series': list(series.values())}
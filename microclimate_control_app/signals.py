@@ -0,0 +1,197 @@
+from django.contrib.auth.models import Group, Permission
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_init, post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from . import access, metrics, profiling, reference
+from .caching import bump_generation
+from .models import Project, BuildingObject, User, ProjectGrant, BuildingGrant, Metric, DataType, Device
+
+
+def _group_member_ids(group_ids):
+    return User.objects.filter(groups__in=group_ids).values_list('id', flat=True)
+
+
+def _permission_holder_ids(permission):
+    user_ids = set(permission.user_set.values_list('id', flat=True))
+    user_ids.update(_group_member_ids(permission.group_set.values_list('id', flat=True)))
+    return user_ids
+
+
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def user_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Invalidate access sets when permissions are granted to or revoked from users.
+    """
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        access.invalidate([instance.pk])
+    elif action == 'pre_clear':
+        access.invalidate(instance.user_set.values_list('id', flat=True))
+    else:
+        access.invalidate(pk_set)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Invalidate access sets when users join or leave groups.
+    """
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        access.invalidate([instance.pk])
+    elif action == 'pre_clear':
+        access.invalidate(instance.user_set.values_list('id', flat=True))
+    else:
+        access.invalidate(pk_set)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Invalidate access sets of group members when permissions are granted to or revoked from groups.
+    """
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        access.invalidate(instance.user_set.values_list('id', flat=True))
+    elif action == 'pre_clear':
+        access.invalidate(_group_member_ids(instance.group_set.values_list('id', flat=True)))
+    else:
+        access.invalidate(_group_member_ids(pk_set))
+
+
+@receiver(post_save, sender=Permission)
+@receiver(pre_delete, sender=Permission)
+def permission_changed(sender, instance, **kwargs):
+    """
+    Invalidate access sets of all holders of a permission that is renamed or deleted.
+    """
+    if instance.pk is not None:
+        access.invalidate(_permission_holder_ids(instance))
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    """
+    Invalidate access sets of the members of a deleted group.
+    """
+    access.invalidate(instance.user_set.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    """
+    Invalidate the access set of a user whose superuser or active status may have changed.
+    """
+    access.invalidate([instance.pk])
+
+
+@receiver(post_save, sender=ProjectGrant)
+@receiver(post_delete, sender=ProjectGrant)
+@receiver(post_save, sender=BuildingGrant)
+@receiver(post_delete, sender=BuildingGrant)
+def grant_changed(sender, instance, **kwargs):
+    """
+    Invalidate access sets of the user or group members an access grant was given to or taken from.
+    """
+    if instance.user_id is not None:
+        access.invalidate([instance.user_id])
+    if instance.group_id is not None:
+        access.invalidate(_group_member_ids([instance.group_id]))
+
+
+@receiver(post_init, sender=BuildingObject)
+def building_object_loaded(sender, instance, **kwargs):
+    """
+    Remember the project a building object was loaded with, without loading deferred fields.
+    """
+    instance._loaded_project_id = instance.__dict__.get('project_id')
+
+
+@receiver(post_save, sender=BuildingObject)
+def building_object_moved(sender, instance, created, **kwargs):
+    """
+    Invalidate access sets of the users granted a building object that moved to another project.
+
+    Access sets list granted building objects under their project, so they go stale when the
+    project of a building object changes.
+    """
+    if not created and instance._loaded_project_id != instance.project_id:
+        grants = BuildingGrant.objects.filter(building_object=instance)
+        user_ids = {user_id for user_id in grants.values_list('user_id', flat=True) if user_id is not None}
+        user_ids.update(_group_member_ids(grants.filter(group__isnull=False).values_list('group_id', flat=True)))
+        access.invalidate(user_ids)
+    instance._loaded_project_id = instance.project_id
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def project_changed(sender, **kwargs):
+    """
+    Invalidate cached responses built from projects.
+    """
+    bump_generation('project')
+
+
+@receiver(post_save, sender=BuildingObject)
+@receiver(post_delete, sender=BuildingObject)
+def building_object_changed(sender, **kwargs):
+    """
+    Invalidate cached responses built from building objects.
+    """
+    bump_generation('building_object')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_generation_changed(sender, **kwargs):
+    """
+    Invalidate cached responses built from users.
+    """
+    bump_generation('user')
+
+
+@receiver(m2m_changed, sender=BuildingObject.users.through)
+def building_object_users_changed(sender, action, **kwargs):
+    """
+    Invalidate cached responses built from the users of building objects.
+    """
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_generation('building_object')
+        bump_generation('user')
+
+
+@receiver(post_save, sender=Metric)
+@receiver(post_delete, sender=Metric)
+@receiver(post_save, sender=DataType)
+@receiver(post_delete, sender=DataType)
+@receiver(post_save, sender=Device)
+@receiver(post_delete, sender=Device)
+def reference_changed(sender, **kwargs):
+    """
+    Invalidate the reference data cached by every process when a metric, data type or device changes.
+    """
+    reference.invalidate()
+
+
+@receiver(m2m_changed, sender=Device.data_collected.through)
+def device_data_collected_changed(sender, action, **kwargs):
+    """
+    Invalidate the reference data cached by every process when the data types collected by a device change.
+    """
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        reference.invalidate()
+
+
+@receiver(connection_created)
+def database_connection_created(sender, connection, **kwargs):
+    """
+    Count and time the SQL queries of requests made on new database connections, and record
+    the statements of profiled requests.
+    """
+    metrics.install(connection)
+    profiling.install(connection)
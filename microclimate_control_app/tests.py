@@ -1,3 +1,1319 @@
-from django.test import TestCase
+import json
+import struct
+from datetime import datetime, timedelta, timezone as dt_timezone
+from importlib import import_module
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import fakeredis
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import (Project, BuildingObject, User, Metric, DataType, Device, DataPoint, ProjectGrant,
+                     BuildingGrant, DeviceStats, RetentionPolicy)
+from . import access, ingest_queue, live, metrics, reference, retention
+from .caching import get_generations
+from .device_stats import rebuild as rebuild_device_stats
+from .ingest import parse_row, validate_rows
+from .management.commands import partition_datapoints
+from .renderers import SERIES_BINARY_MAGIC
+from .rollups import GRANULARITIES, choose_granularity, rebuild, truncate
+
+# The two data sizes every route is requested at; the size scales the number of building
+# objects, responsible users, data types, grants and data points
+SIZES = (2, 20)
+
+# The most queries a request to each route may make, on the cold path with an empty cache but with
+# the reference data already loaded by the process
+QUERY_BUDGETS = {
+    'projects-list': 5,
+    'projects-create': 1,
+    'projects-detail': 5,
+    'projects-update': 6,
+    'projects-destroy': 10,
+    'projects-series': 6,
+    'projects-series-bucket': 7,
+    'building-objects-list': 7,
+    'building-objects-create': 7,
+    'building-objects-detail': 7,
+    'building-objects-update': 9,
+    'building-objects-destroy': 16,
+    'object-data-points-list': 5,
+    'object-data-points-create': 24,
+    'object-data-points-detail': 5,
+    'object-data-points-update': 28,
+    'object-data-points-destroy': 24,
+    'object-data-points-bulk': 24,
+    'object-data-points-queue': 24,
+    'object-data-points-stream': 24,
+    'object-data-points-series': 6,
+    'object-data-points-aggregate': 7,
+    'object-data-points-latest': 6,
+    'object-responsibles-list': 6,
+    'object-responsibles-detail': 6,
+    'async-building-objects-list': 8,
+    'async-object-data-points-list': 7,
+    'async-object-data-points-latest': 7,
+    'async-object-data-points-live': 6,
+    'async-object-data-points-live-token': 6,
+    'devices-list': 2,
+    'devices-detail': 2,
+    'devices-readings': 2,
+    'devices-summary': 3,
+    'metrics': 0,
+    'profiles-detail': 0,
+}
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   REFERENCE_CACHE_CHECK_SECONDS=0)
+class DataTestCase(APITestCase):
+    """
+    Base class of the API tests, creating projects with building objects, users and data points.
+    """
+
+    def populate(self, size):
+        """
+        Create a project with size building objects, each with size responsible users, and size
+        data points of each of size data types in the first building object.
+
+        Args:
+            size (int): The data size.
+
+        Returns:
+            dict: The staff user, the granted user, the project, the first building object, a
+                  data type, a device and a data point of the first building object.
+        """
+        # IDs are reused after each test is rolled back, so access sets cached by earlier tests must go
+        cache.clear()
+        now = timezone.now().replace(microsecond=0)
+        staff = User.objects.create(username=f'staff{size}', full_name='Staff', is_staff=True)
+        user = User.objects.create(username=f'user{size}', full_name='User')
+        responsibles = User.objects.bulk_create([
+            User(username=f'responsible{size}-{number}', full_name=f'Responsible {number}')
+            for number in range(size)
+        ])
+
+        project = Project.objects.create(name=f'Project {size}', description='Query counts')
+        buildings = BuildingObject.objects.bulk_create([
+            BuildingObject(name=f'Building {number}', location='Test', project=project) for number in range(size)
+        ])
+        BuildingObject.users.through.objects.bulk_create([
+            BuildingObject.users.through(buildingobject_id=building.id, user_id=responsible.id)
+            for building in buildings for responsible in responsibles
+        ])
+        ProjectGrant.objects.create(user=user, project=project, action=ProjectGrant.ACCESS)
+        BuildingGrant.objects.bulk_create([BuildingGrant(user=user, building_object=building)
+                                           for building in buildings])
+
+        metric = Metric.objects.create(name='°C')
+        data_types = DataType.objects.bulk_create([
+            DataType(code=f'T{size}-{number}', name=f'Temperature {number}', metric=metric)
+            for number in range(size)
+        ])
+        device = Device.objects.create(name=f'Device {size}')
+        device.data_collected.set(data_types)
+        points = DataPoint.objects.bulk_create([
+            DataPoint(timestamp=now - timedelta(minutes=number), value=20 + number, data_type=data_type,
+                      device=device, building_object=buildings[0])
+            for data_type in data_types for number in range(size)
+        ])
+        rebuild(now - timedelta(days=1), now + timedelta(minutes=1), building_id=buildings[0].id)
+        rebuild_device_stats([device.id])
+
+        return {'staff': staff, 'user': user, 'project': project, 'building': buildings[0],
+                'data_type': data_types[0], 'device': device, 'point': points[0], 'now': now}
+
+    @staticmethod
+    def object_path(data, suffix=''):
+        return f'/projects/{data["project"].id}/objects/{data["building"].id}/{suffix}'
+
+
+class QueryCountTests(DataTestCase):
+    """
+    Guard every route against N+1 queries.
+
+    Each route is requested with the same data at two sizes. The number of SQL queries must not
+    grow with the size and must stay within the budget of the route in QUERY_BUDGETS. Requests
+    start with an empty cache and a freshly loaded user, as the first request of a new session
+    would, so cached responses and access sets do not hide queries.
+    """
+
+    def count_queries(self, user, method, path, data=None, **extra):
+        """
+        Request a route as a user with an empty cache and loaded reference data, and count the SQL queries.
+
+        Args:
+            user: The requesting user.
+            method (str): The HTTP method.
+            path (str): The requested path.
+            data: The request data.
+            extra: Additional arguments of the test client request.
+
+        Returns:
+            tuple: The response and the number of queries.
+        """
+        cache.clear()
+        reference.get()
+        self.client.force_authenticate(User.objects.get(id=user.id))
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(path, data, **extra)
+        return response, len(context)
+
+    def count_async_queries(self, user, path):
+        """
+        Request an async route as a user with an empty cache and loaded reference data, and count
+        the SQL queries.
+
+        Args:
+            user: The requesting user.
+            path (str): The requested path.
+
+        Returns:
+            tuple: The response and the number of queries.
+        """
+        token = str(RefreshToken.for_user(user).access_token)
+        cache.clear()
+        reference.get()
+        self.client.force_authenticate(None)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path, HTTP_AUTHORIZATION=f'Bearer {token}')
+        return response, len(context)
+
+    def assertQueryBudget(self, route, request, status_code=200):
+        """
+        Assert that a route makes the same number of queries at every data size, within its budget.
+
+        Args:
+            route (str): The name of the route in QUERY_BUDGETS.
+            request: A function taking the created data and returning the response and the
+                     number of queries.
+            status_code (int): The expected response status code.
+        """
+        counts = {}
+        for size in SIZES:
+            response, counts[size] = request(self.populate(size))
+            self.assertEqual(response.status_code, status_code,
+                             f'{route} at size {size}: {getattr(response, "content", b"")[:500]}')
+        self.assertEqual(len(set(counts.values())), 1, f'{route} queries grow with the data size: {counts}')
+        self.assertLessEqual(counts[SIZES[-1]], QUERY_BUDGETS[route],
+                             f'{route} exceeds its query budget with {counts[SIZES[-1]]} queries')
+
+    def test_projects_list(self):
+        self.assertQueryBudget('projects-list', lambda data: self.count_queries(data['user'], 'get', '/projects/'))
+
+    def test_projects_create(self):
+        self.assertQueryBudget('projects-create', lambda data: self.count_queries(
+            data['staff'], 'post', '/projects/', {'name': 'New', 'description': 'New'}), 201)
+
+    def test_projects_detail(self):
+        self.assertQueryBudget('projects-detail', lambda data: self.count_queries(
+            data['user'], 'get', f'/projects/{data["project"].id}/'))
+
+    def test_projects_update(self):
+        self.assertQueryBudget('projects-update', lambda data: self.count_queries(
+            data['staff'], 'patch', f'/projects/{data["project"].id}/', {'name': 'Renamed'}))
+
+    def test_projects_destroy(self):
+        self.assertQueryBudget('projects-destroy', lambda data: self.count_queries(
+            data['staff'], 'delete', f'/projects/{data["project"].id}/'), 204)
+
+    def test_projects_series(self):
+        self.assertQueryBudget('projects-series', lambda data: self.count_queries(
+            data['user'], 'get', f'/projects/{data["project"].id}/series/', {'data_type': data['data_type'].id}))
+
+    def test_projects_series_bucket(self):
+        self.assertQueryBudget('projects-series-bucket', lambda data: self.count_queries(
+            data['user'], 'get', f'/projects/{data["project"].id}/series/',
+            {'data_type': data['data_type'].id, 'bucket': 'hour', 'fn': 'avg,first,last'}))
+
+    def test_building_objects_list(self):
+        self.assertQueryBudget('building-objects-list', lambda data: self.count_queries(
+            data['user'], 'get', f'/projects/{data["project"].id}/objects/'))
+
+    def test_building_objects_create(self):
+        self.assertQueryBudget('building-objects-create', lambda data: self.count_queries(
+            data['staff'], 'post', f'/projects/{data["project"].id}/objects/',
+            {'name': 'New', 'location': 'New', 'project': data['project'].id,
+             'users': [data['user'].id]}, format='json'), 201)
+
+    def test_building_objects_detail(self):
+        self.assertQueryBudget('building-objects-detail', lambda data: self.count_queries(
+            data['user'], 'get', self.object_path(data)))
+
+    def test_building_objects_update(self):
+        self.assertQueryBudget('building-objects-update', lambda data: self.count_queries(
+            data['staff'], 'patch', self.object_path(data), {'name': 'Renamed'}, format='json'))
+
+    def test_building_objects_destroy(self):
+        self.assertQueryBudget('building-objects-destroy', lambda data: self.count_queries(
+            data['staff'], 'delete', self.object_path(data)), 204)
+
+    def test_data_points_list(self):
+        self.assertQueryBudget('object-data-points-list', lambda data: self.count_queries(
+            data['user'], 'get', self.object_path(data, 'data-points/')))
+
+    def test_data_points_create(self):
+        self.assertQueryBudget('object-data-points-create', lambda data: self.count_queries(
+            data['user'], 'post', self.object_path(data, 'data-points/'),
+            {'data_type': data['data_type'].id, 'device': data['device'].id, 'value': 21.5}, format='json'), 201)
+
+    def test_data_points_detail(self):
+        self.assertQueryBudget('object-data-points-detail', lambda data: self.count_queries(
+            data['user'], 'get', self.object_path(data, f'data-points/{data["point"].id}/')))
+
+    def test_data_points_update(self):
+        self.assertQueryBudget('object-data-points-update', lambda data: self.count_queries(
+            data['user'], 'patch', self.object_path(data, f'data-points/{data["point"].id}/'),
+            {'value': 22.5}, format='json'))
+
+    def test_data_points_destroy(self):
+        self.assertQueryBudget('object-data-points-destroy', lambda data: self.count_queries(
+            data['user'], 'delete', self.object_path(data, f'data-points/{data["point"].id}/')), 204)
+
+    def test_data_points_bulk(self):
+        def request(data):
+            rows = [{'data_type': data_type_id, 'device': data['device'].id, 'value': 21.5}
+                    for data_type_id in data['device'].data_collected.values_list('id', flat=True)]
+            return self.count_queries(data['user'], 'post', self.object_path(data, 'data-points/bulk/'),
+                                      rows, format='json')
+        self.assertQueryBudget('object-data-points-bulk', request, 201)
+
+    def test_data_points_queue(self):
+        def request(data):
+            rows = [{'data_type': data_type_id, 'device': data['device'].id, 'value': 21.5}
+                    for data_type_id in data['device'].data_collected.values_list('id', flat=True)]
+            return self.count_queries(data['user'], 'post', self.object_path(data, 'data-points/queue/'),
+                                      rows, format='json')
+        self.assertQueryBudget('object-data-points-queue', request, 201)
+
+    def test_data_points_stream(self):
+        def request(data):
+            lines = [f'{{"data_type": {data_type_id}, "device": {data["device"].id}, "value": 21.5}}'
+                     for data_type_id in data['device'].data_collected.values_list('id', flat=True)]
+            return self.count_queries(data['user'], 'post', self.object_path(data, 'data-points/stream/'),
+                                      '\n'.join(lines), content_type='application/x-ndjson')
+        self.assertQueryBudget('object-data-points-stream', request, 201)
+
+    def test_data_points_series(self):
+        self.assertQueryBudget('object-data-points-series', lambda data: self.count_queries(
+            data['user'], 'get', self.object_path(data, 'data-points/series/'),
+            {'data_type': data['data_type'].id, 'granularity': 'minute'}))
+
+    def test_data_points_aggregate(self):
+        self.assertQueryBudget('object-data-points-aggregate', lambda data: self.count_queries(
+            data['user'], 'get', self.object_path(data, 'data-points/aggregate/'),
+            {'bucket': 'hour', 'fn': 'avg,min,max,count,first,last'}))
+
+    def test_data_points_latest(self):
+        self.assertQueryBudget('object-data-points-latest', lambda data: self.count_queries(
+            data['user'], 'get', self.object_path(data, 'data-points/latest/')))
+
+    def test_responsibles_list(self):
+        self.assertQueryBudget('object-responsibles-list', lambda data: self.count_queries(
+            data['staff'], 'get', self.object_path(data, 'responsibles/')))
+
+    def test_responsibles_detail(self):
+        self.assertQueryBudget('object-responsibles-detail', lambda data: self.count_queries(
+            data['staff'], 'get', self.object_path(data, f'responsibles/{data["building"].users.first().id}/')))
+
+    def test_async_building_objects_list(self):
+        self.assertQueryBudget('async-building-objects-list', lambda data: self.count_async_queries(
+            data['user'], f'/async/projects/{data["project"].id}/objects/'))
+
+    def test_async_data_points_list(self):
+        self.assertQueryBudget('async-object-data-points-list', lambda data: self.count_async_queries(
+            data['user'], '/async' + self.object_path(data, 'data-points/')))
+
+    def test_async_data_points_latest(self):
+        self.assertQueryBudget('async-object-data-points-latest', lambda data: self.count_async_queries(
+            data['user'], '/async' + self.object_path(data, 'data-points/latest/')))
+
+    def test_async_data_points_live(self):
+        # Without a Redis cache the stream is refused after authentication and permission checks
+        self.assertQueryBudget('async-object-data-points-live', lambda data: self.count_async_queries(
+            data['user'], '/async' + self.object_path(data, 'data-points/live/')), 503)
+
+    def test_async_data_points_live_token(self):
+        self.assertQueryBudget('async-object-data-points-live-token', lambda data: self.count_async_queries(
+            data['user'], '/async' + self.object_path(data, 'data-points/live/token/')))
+
+    def test_devices_list(self):
+        self.assertQueryBudget('devices-list', lambda data: self.count_queries(data['staff'], 'get', '/devices/'))
+
+    def test_devices_detail(self):
+        self.assertQueryBudget('devices-detail', lambda data: self.count_queries(
+            data['staff'], 'get', f'/devices/{data["device"].id}/'))
+
+    def test_devices_readings(self):
+        self.assertQueryBudget('devices-readings', lambda data: self.count_queries(
+            data['staff'], 'get', f'/devices/{data["device"].id}/readings/'))
+
+    def test_devices_summary(self):
+        self.assertQueryBudget('devices-summary', lambda data: self.count_queries(
+            data['staff'], 'get', f'/devices/{data["device"].id}/summary/'))
+
+    def test_validate_rows_with_reference_data(self):
+        data = self.populate(SIZES[-1])
+        rows = [{'data_type': data_type_id, 'device': data['device'].id, 'value': 21.5}
+                for data_type_id in data['device'].data_collected.values_list('id', flat=True)]
+        other = DataType.objects.create(code='other', name='Other')
+        invalid = [{'data_type': 0, 'device': 0, 'value': 1},
+                   {'data_type': other.id, 'device': data['device'].id, 'value': 1}]
+        reference.get()
+        with self.assertNumQueries(0):
+            points, errors = validate_rows(rows + invalid, data['building'].id)
+        self.assertEqual(len(points), len(rows))
+        self.assertEqual([(error['index'], list(error['errors'])) for error in errors],
+                         [(len(rows), ['data_type', 'device']), (len(rows) + 1, ['data_type'])])
+
+    def test_data_points_create_incompatible(self):
+        data = self.populate(SIZES[0])
+        other = DataType.objects.create(code='other', name='Other')
+        self.client.force_authenticate(data['user'])
+        response = self.client.post(self.object_path(data, 'data-points/'),
+                                    {'data_type': other.id, 'device': data['device'].id, 'value': 1}, format='json')
+        self.assertEqual(response.status_code, 400)
+        data['device'].data_collected.add(other)
+        response = self.client.post(self.object_path(data, 'data-points/'),
+                                    {'data_type': other.id, 'device': data['device'].id, 'value': 1}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_metrics(self):
+        with override_settings(METRICS_TOKEN='secret'):
+            self.assertQueryBudget('metrics', lambda data: self.count_queries(
+                data['user'], 'get', '/metrics', HTTP_AUTHORIZATION='Bearer secret'))
+
+    def test_profiles_detail(self):
+        self.assertQueryBudget('profiles-detail', lambda data: self.count_queries(
+            data['staff'], 'get', '/profiles/missing/'), 404)
+
+
+class SeriesTests(DataTestCase):
+    """
+    Check the values of the series read from the rollup tables.
+    """
+
+    def setUp(self):
+        self.data = self.populate(3)
+        self.client.force_authenticate(self.data['user'])
+        self.params = {'data_type': self.data['data_type'].id, 'granularity': 'minute',
+                       'from': (self.data['now'] - timedelta(hours=1)).isoformat(),
+                       'to': (self.data['now'] + timedelta(minutes=1)).isoformat()}
+
+    def test_building_series(self):
+        response = self.client.get(self.object_path(self.data, 'data-points/series/'), self.params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['granularity'], 'minute')
+        self.assertEqual([(bucket['count'], bucket['min'], bucket['max'], bucket['avg'], bucket['last'])
+                          for bucket in response.data['buckets']],
+                         [(1, 22, 22, 22, 22), (1, 21, 21, 21, 21), (1, 20, 20, 20, 20)])
+
+    def test_project_series_matches_building_series(self):
+        building = self.client.get(self.object_path(self.data, 'data-points/series/'), self.params).data
+        project = self.client.get(f'/projects/{self.data["project"].id}/series/', self.params).data
+        results = {result['building_object']: result['buckets'] for result in project['results']}
+        self.assertEqual(results[self.data['building'].id], building['buckets'])
+
+
+class ProjectScopeTests(DataTestCase):
+    """
+    Check that building object routes only serve building objects of the project in the URL.
+    """
+
+    def setUp(self):
+        self.data = self.populate(2)
+        self.other = self.populate(3)
+        self.client.force_authenticate(self.data['user'])
+
+    def other_building_path(self, suffix):
+        return f'/projects/{self.data["project"].id}/objects/{self.other["building"].id}/{suffix}'
+
+    def test_latest(self):
+        self.assertEqual(self.client.get(self.object_path(self.data, 'data-points/latest/')).status_code, 200)
+        self.assertEqual(self.client.get(self.other_building_path('data-points/latest/')).status_code, 404)
+
+    def test_aggregate(self):
+        params = {'bucket': 'day', 'fn': 'count'}
+        self.assertEqual(self.client.get(self.object_path(self.data, 'data-points/aggregate/'), params).status_code, 200)
+        self.assertEqual(self.client.get(self.other_building_path('data-points/aggregate/'), params).status_code, 404)
+
+    def test_series(self):
+        params = {'data_type': self.other['data_type'].id}
+        self.assertEqual(self.client.get(self.object_path(self.data, 'data-points/series/'), params).status_code, 200)
+        self.assertEqual(self.client.get(self.other_building_path('data-points/series/'), params).status_code, 404)
+
+    def test_data_points(self):
+        response = self.client.get(self.other_building_path('data-points/'))
+        self.assertEqual((response.status_code, response.data['results']), (200, []))
+        point_path = self.other_building_path(f'data-points/{self.other["point"].id}/')
+        self.assertEqual(self.client.get(point_path).status_code, 404)
+        self.assertEqual(self.client.delete(point_path).status_code, 404)
+        self.assertTrue(DataPoint.objects.filter(id=self.other['point'].id).exists())
+
+    def test_unknown_project(self):
+        self.client.force_authenticate(self.data['staff'])
+        self.assertEqual(self.client.get('/projects/999/objects/').status_code, 404)
+        self.assertEqual(self.client.get('/projects/abc/objects/').status_code, 404)
+        # Users without access to the project only see the building objects granted to them
+        self.client.force_authenticate(self.data['user'])
+        response = self.client.get('/projects/999/objects/')
+        self.assertEqual((response.status_code, response.data), (200, []))
+        self.assertEqual(self.client.get('/projects/abc/objects/').status_code, 404)
+
+    def get_async(self, path):
+        token = RefreshToken.for_user(self.data['user']).access_token
+        return self.client.get(f'/async{path}', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_async_data_points(self):
+        self.assertEqual(self.get_async(self.object_path(self.data, 'data-points/')).status_code, 200)
+        self.assertEqual(self.get_async(self.other_building_path('data-points/')).status_code, 404)
+
+    def test_async_latest(self):
+        self.assertEqual(self.get_async(self.object_path(self.data, 'data-points/latest/')).status_code, 200)
+        self.assertEqual(self.get_async(self.other_building_path('data-points/latest/')).status_code, 404)
+
+    def test_async_live(self):
+        self.assertEqual(self.get_async(self.other_building_path('data-points/live/')).status_code, 404)
+
+
+class CacheInvalidationTests(DataTestCase):
+    """
+    Check that cached access sets and responses are only invalidated once changes are committed.
+    """
+
+    def test_access_set_dropped_on_commit(self):
+        data = self.populate(2)
+        key = f'{access.CACHE_KEY_PREFIX}{data["user"].id}'
+        access.get_access_set(User.objects.get(id=data['user'].id))
+        with self.captureOnCommitCallbacks(execute=True):
+            ProjectGrant.objects.get(user=data['user']).delete()
+            self.assertIsNotNone(cache.get(key))
+        self.assertIsNone(cache.get(key))
+
+    def test_access_set_follows_moved_building_object(self):
+        data = self.populate(2)
+        ProjectGrant.objects.filter(user=data['user']).delete()
+        building, old = data['building'], data['project']
+        new = Project.objects.create(name='New', description='Moved')
+
+        def get(path):
+            self.client.force_authenticate(User.objects.get(id=data['user'].id))
+            return self.client.get(path)
+
+        self.assertIn(building.id, [row['id'] for row in get(f'/projects/{old.id}/objects/').data])
+        with self.captureOnCommitCallbacks(execute=True):
+            building.project = new
+            building.save()
+
+        self.assertEqual(get(f'/projects/{new.id}/objects/{building.id}/data-points/').status_code, 200)
+        self.assertEqual(get(f'/projects/{new.id}/objects/{building.id}/').status_code, 200)
+        self.assertEqual(get(f'/projects/{old.id}/objects/{building.id}/data-points/').status_code, 403)
+        self.assertNotIn(building.id, [row['id'] for row in get(f'/projects/{old.id}/objects/').data])
+
+    def test_generation_bumped_on_commit(self):
+        data = self.populate(2)
+        before = get_generations(['project'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Project.objects.filter(id=data['project'].id).get().save()
+            self.assertEqual(get_generations(['project']), before)
+        self.assertNotEqual(get_generations(['project']), before)
+
+
+
+class CodenameConversionTests(DataTestCase):
+    """
+    Check that the migration to access grants maps legacy codename permissions to grants.
+    """
+
+    def test_convert_codename_permissions(self):
+        data = self.populate(2)
+        project, building = data['project'], data['building']
+        group = Group.objects.create(name='Operators')
+        member = User.objects.create(username='member', full_name='Member')
+        member.groups.add(group)
+        content_type = ContentType.objects.get_for_model(Project)
+
+        def permission(codename):
+            return Permission.objects.create(codename=codename, name=codename, content_type=content_type)
+
+        data['staff'].user_permissions.add(
+            permission(f'can_access_project_{project.id}'), permission(f'can_update_project_{project.id}'),
+            permission('can_access_project_0'), permission('can_access_everything'))
+        group.permissions.add(permission(f'can_create_buildings_project_{project.id}'),
+                              permission(f'can_access_project_{project.id}_building_{building.id}'),
+                              permission(f'can_access_project_{project.id}_building_0'))
+        ProjectGrant.objects.all().delete()
+        BuildingGrant.objects.all().delete()
+
+        migration = import_module('microclimate_control_app.migrations.0006_convert_codename_permissions')
+        migration.convert_codename_permissions(django_apps, None)
+        migration.convert_codename_permissions(django_apps, None)
+
+        self.assertEqual(
+            set(ProjectGrant.objects.values_list('user', 'group', 'project', 'action')),
+            {(data['staff'].id, None, project.id, ProjectGrant.ACCESS),
+             (data['staff'].id, None, project.id, ProjectGrant.UPDATE),
+             (None, group.id, project.id, ProjectGrant.CREATE_BUILDINGS)})
+        self.assertEqual(list(BuildingGrant.objects.values_list('user', 'group', 'building_object', 'action')),
+                         [(None, group.id, building.id, 'access')])
+
+
+class PartitionCommandTests(TestCase):
+    """
+    Check the month arithmetic and the statements of the partition_datapoints command.
+    """
+
+    def setUp(self):
+        self.command = partition_datapoints.Command(stdout=StringIO())
+        self.command.table = 'points'
+
+    def test_month_start(self):
+        month_start = partition_datapoints.month_start
+        self.assertEqual(month_start(2024, 0), datetime(2023, 12, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(month_start(2024, 13), datetime(2025, 1, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(month_start(2024, -11), datetime(2023, 1, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(self.command.partition_name(month_start(2024, 3)), 'points_p202403')
+
+    def test_expired_partitions(self):
+        cutoff = partition_datapoints.retention_cutoff(datetime(2024, 5, 17, tzinfo=dt_timezone.utc), 2)
+        self.assertEqual(cutoff, datetime(2024, 3, 1, tzinfo=dt_timezone.utc))
+        names = ['points_p202401', 'points_p202402', 'points_p202403', 'points_default', 'points_p2024xx']
+        self.assertEqual(self.command.expired_partitions(names, cutoff), ['points_p202401', 'points_p202402'])
+
+    def test_create_partition_moves_rows_out_of_default_partition(self):
+        statements = []
+
+        def execute_sql(sql, params=None):
+            statements.append(sql)
+            if sql.startswith('SELECT to_regclass'):
+                return [(None if params == ['points_p202403'] else params[0],)]
+            if sql.startswith('SELECT COUNT'):
+                return [(2,)]
+            return None
+
+        with mock.patch.object(self.command, 'execute_sql', side_effect=execute_sql):
+            self.command.create_partition(partition_datapoints.month_start(2024, 3))
+        self.assertEqual([' '.join(sql.split()[:4]) for sql in statements[2:]],
+                         ['SELECT COUNT(*) FROM "points_default"', 'ALTER TABLE "points" DETACH',
+                          'CREATE TABLE "points_p202403" PARTITION', 'INSERT INTO "points" SELECT',
+                          'DELETE FROM "points_default" WHERE', 'ALTER TABLE "points" ATTACH'])
+
+    def test_requires_postgresql(self):
+        with self.assertRaisesMessage(CommandError, 'only supported on PostgreSQL'):
+            call_command('partition_datapoints', stdout=StringIO())
+
+class GenerateDataTests(DataTestCase):
+    """
+    Check the data written by the generate_data command with bulk inserts.
+    """
+
+    start = datetime(2024, 3, 4, tzinfo=dt_timezone.utc)
+
+    def generate(self, seed, *args):
+        call_command('generate_data', '--method', 'bulk', '--buildings', '2', '--devices', '2',
+                     '--from', self.start.isoformat(), '--to', (self.start + timedelta(days=1)).isoformat(),
+                     '--interval', '3600', '--batch-size', '50', '--seed', str(seed), *args, stdout=StringIO())
+        return list(DataPoint.objects.order_by('building_object', 'device', 'data_type', 'timestamp')
+                    .values_list('building_object', 'device', 'data_type', 'timestamp', 'value'))
+
+    def generate_and_roll_back(self, seed):
+        with transaction.atomic():
+            points = self.generate(seed, '--skip-rollups')
+            transaction.set_rollback(True)
+        return points
+
+    def test_rows_rollups_and_device_stats(self):
+        points = self.generate(1)
+        # 24 hourly readings of 4 data types by 2 devices in each of 2 building objects
+        self.assertEqual(len(points), 24 * 4 * 2 * 2)
+        self.assertEqual(BuildingObject.objects.count(), 2)
+        self.assertEqual(DataType.objects.filter(code__in=['TEMP', 'CO2', 'HUM', 'EC']).count(), 4)
+
+        for granularity, (model, _) in GRANULARITIES.items():
+            self.assertEqual(sum(model.objects.values_list('count', flat=True)), len(points), granularity)
+        self.assertEqual(GRANULARITIES['day'][0].objects.filter(bucket=self.start).count(), 2 * 4)
+
+        stats = DeviceStats.objects.all()
+        self.assertEqual(len(stats), 4 * 4)
+        for row in stats:
+            self.assertEqual((row.count, row.first_timestamp, row.last_timestamp),
+                             (24, self.start, self.start + timedelta(hours=23)))
+
+        counter_id = DataType.objects.get(code='EC').id
+        for device in Device.objects.all():
+            counters = [value for _, device_id, data_type_id, _, value in points
+                        if device_id == device.id and data_type_id == counter_id]
+            self.assertEqual(counters, sorted(counters), device.name)
+
+    def test_seed_repeats_the_data(self):
+        points = self.generate_and_roll_back(1)
+        self.assertEqual(self.generate_and_roll_back(1), points)
+        self.assertNotEqual(self.generate_and_roll_back(2), points)
+
+
+class IngestQueueTests(DataTestCase):
+    """
+    Check how the ingest worker stores and rejects queued rows.
+    """
+
+    def test_missing_building_object_is_dead_lettered(self):
+        data = self.populate(2)
+        row = {'data_type': data['data_type'].id, 'device': data['device'].id, 'value': 21.5,
+               'timestamp': data['now'].isoformat()}
+        entries = [(b'1-0', {b'building_object': str(data['building'].id), b'rows': json.dumps([row])}),
+                   (b'2-0', {b'building_object': '0', b'rows': json.dumps([row, row])})]
+        redis = mock.MagicMock()
+        self.assertEqual(ingest_queue.process(redis, entries), (1, 2))
+        pipeline = redis.pipeline.return_value
+        dead_letters = [call.args[1] for call in pipeline.xadd.call_args_list]
+        self.assertEqual([(dead_letter['entry'], dead_letter['building_object']) for dead_letter in dead_letters],
+                         [('2-0', 0), ('2-0', 0)])
+        pipeline.xack.assert_called_once_with(ingest_queue.STREAM_KEY, ingest_queue.GROUP, b'1-0', b'2-0')
+
+    def enqueue(self, data, redis, count=2):
+        row = {'data_type': data['data_type'].id, 'device': data['device'].id, 'value': 21.5}
+        with mock.patch.object(ingest_queue, 'get_redis', return_value=redis):
+            self.assertEqual(ingest_queue.enqueue([row] * count, data['building'].id), (count, []))
+
+    def test_worker_stores_and_acknowledges_queued_rows(self):
+        data = self.populate(2)
+        redis = fakeredis.FakeRedis()
+        ingest_queue.ensure_group(redis)
+        self.enqueue(data, redis)
+        self.assertEqual(ingest_queue.stats(redis),
+                         {'length': 1, 'pending': 0, 'lag': 1, 'consumers': 0, 'dead_letters': 0})
+
+        entries = ingest_queue.read(redis, 'worker', 10, None, 60000, 5)
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(ingest_queue.stats(redis)['pending'], 1)
+        self.assertEqual(ingest_queue.process(redis, entries), (2, 0))
+        self.assertEqual(DataPoint.objects.filter(building_object=data['building'], value=21.5).count(), 2)
+        self.assertEqual(ingest_queue.stats(redis),
+                         {'length': 0, 'pending': 0, 'lag': 0, 'consumers': 1, 'dead_letters': 0})
+        self.assertEqual(ingest_queue.read(redis, 'worker', 10, None, 60000, 5), [])
+
+    def test_entries_failing_to_be_stored_are_dead_lettered(self):
+        data = self.populate(2)
+        redis = fakeredis.FakeRedis()
+        ingest_queue.ensure_group(redis)
+        self.enqueue(data, redis)
+        # The entry is delivered once by reading and once by every reclaim, and never acknowledged
+        for _ in range(3):
+            self.assertEqual(len(ingest_queue.read(redis, 'worker', 10, None, 0, 3)), 1)
+        self.assertEqual(ingest_queue.read(redis, 'worker', 10, None, 0, 3), [])
+        self.assertEqual(ingest_queue.stats(redis),
+                         {'length': 0, 'pending': 0, 'lag': 0, 'consumers': 1, 'dead_letters': 1})
+        (_, dead_letter), = redis.xrange(ingest_queue.DEAD_LETTER_KEY)
+        self.assertEqual(int(dead_letter[b'building_object']), data['building'].id)
+        self.assertEqual(len(json.loads(dead_letter[b'rows'])), 2)
+
+
+class IngestTests(DataTestCase):
+    """
+    Check the validation and storage of ingested data points.
+    """
+
+    def setUp(self):
+        self.data = self.populate(2)
+        self.client.force_authenticate(self.data['user'])
+
+    def row(self, **fields):
+        return {'data_type': self.data['data_type'].id, 'device': self.data['device'].id, 'value': 21.5, **fields}
+
+    def test_parse_row_rejects_booleans_and_non_finite_values(self):
+        for row, field in ((self.row(value='nan'), 'value'), (self.row(value=float('inf')), 'value'),
+                           (self.row(value='-Infinity'), 'value'), (self.row(value=True), 'value'),
+                           (self.row(data_type=True), 'data_type'), (self.row(device=False), 'device')):
+            parsed, errors = parse_row(row)
+            self.assertIsNone(parsed, row)
+            self.assertEqual(list(errors), [field], row)
+
+    def test_create_rejects_booleans_and_non_finite_values(self):
+        for row in (self.row(value='NaN'), self.row(value=True), self.row(data_type=True)):
+            response = self.client.post(self.object_path(self.data, 'data-points/'), row, format='json')
+            self.assertEqual(response.status_code, 400, row)
+
+    def test_bulk_reports_errors_by_row(self):
+        rows = [self.row(), {'value': 'x'}, self.row(device=0), 5, self.row(value=22)]
+        response = self.client.post(self.object_path(self.data, 'data-points/bulk/'), rows, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([(error['index'], sorted(error['errors'])) for error in response.data['errors']],
+                         [(1, ['data_type', 'device', 'value']), (2, ['device']), (3, ['non_field_errors'])])
+        self.assertEqual(sorted(DataPoint.objects.filter(building_object=self.data['building'], value__gt=21)
+                                .values_list('value', flat=True)), [21.5, 22])
+
+    def test_bulk_without_valid_rows(self):
+        response = self.client.post(self.object_path(self.data, 'data-points/bulk/'),
+                                    [self.row(data_type=0)], format='json')
+        self.assertEqual((response.status_code, response.data['created']), (400, 0))
+
+    def test_bulk_requires_a_list(self):
+        response = self.client.post(self.object_path(self.data, 'data-points/bulk/'), self.row(), format='json')
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(DATA_POINT_BULK_MAX_ROWS=2)
+    def test_bulk_row_limit(self):
+        count = DataPoint.objects.count()
+        response = self.client.post(self.object_path(self.data, 'data-points/bulk/'), [self.row()] * 3, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(DataPoint.objects.count(), count)
+
+    def post_stream(self, body, content_type):
+        return self.client.post(self.object_path(self.data, 'data-points/stream/'), body, content_type=content_type)
+
+    @override_settings(DATA_POINT_STREAM_CHUNK_SIZE=2, DATA_POINT_STREAM_MAX_LINE_LENGTH=100)
+    def test_stream_ndjson(self):
+        lines = [json.dumps(self.row()).encode(), b'{"data_type":', b'', b'\xff\xfe',
+                 json.dumps(self.row(note='x' * 100)).encode(), json.dumps(self.row(value=23)).encode()]
+        response = self.post_stream(b'\n'.join(lines) + b'\n', 'application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['accepted'], response.data['rejected']), (2, 3))
+        self.assertEqual([(error['index'], error['errors']['non_field_errors']) for error in response.data['errors']],
+                         [(1, ['Line is not valid JSON.']), (2, ['Line is not valid UTF-8.']),
+                          (3, ['Line is longer than 100 bytes.'])])
+
+    @override_settings(DATA_POINT_STREAM_MAX_ERRORS=1)
+    def test_stream_csv(self):
+        data_type, device = self.data['data_type'].id, self.data['device'].id
+        body = (f'data_type,device,value,timestamp\n{data_type},{device},21.5,\n{data_type},{device}\n'
+                f'{data_type},{device},x,\n{data_type},{device},22,{self.data["now"].isoformat()}\n')
+        response = self.post_stream(body.encode(), 'text/csv')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['accepted'], response.data['rejected']), (2, 2))
+        self.assertEqual(response.data['errors'],
+                         [{'index': 1, 'errors': {'non_field_errors': ['Expected 4 columns, got 2.']}}])
+
+    def test_stream_without_valid_rows(self):
+        response = self.post_stream(b'not json\n', 'application/x-ndjson')
+        self.assertEqual((response.status_code, response.data['accepted']), (400, 0))
+
+    def test_stream_unsupported_media_type(self):
+        self.assertEqual(self.post_stream(b'{}', 'application/xml').status_code, 415)
+
+
+class ListingTests(DataTestCase):
+    """
+    Check the filters and the cursor pagination of data point listings.
+    """
+
+    def setUp(self):
+        self.data = self.populate(3)
+        # Data points sharing a timestamp are ordered by ID, also across page boundaries
+        DataPoint.objects.bulk_create([
+            DataPoint(timestamp=self.data['now'] - timedelta(minutes=1), value=30 + number,
+                      data_type=self.data['data_type'], device=self.data['device'],
+                      building_object=self.data['building'])
+            for number in range(3)
+        ])
+        self.ordered = list(DataPoint.objects.filter(building_object=self.data['building'])
+                            .order_by('timestamp', 'id').values_list('id', flat=True))
+        self.client.force_authenticate(self.data['user'])
+
+    def list_all(self, params):
+        ids, pages = [], 0
+        response = self.client.get(self.object_path(self.data, 'data-points/'), params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            ids += [row['id'] for row in response.data['results']]
+            pages += 1
+            if response.data['next'] is None:
+                return ids, pages
+            response = self.client.get(response.data['next'])
+
+    def test_pages_cover_every_data_point_once(self):
+        for page_size in (1, 2, 5, len(self.ordered) - 1, len(self.ordered), len(self.ordered) + 1):
+            ids, pages = self.list_all({'page_size': page_size})
+            self.assertEqual(ids, self.ordered, page_size)
+            self.assertEqual(pages, max(1, -(-len(self.ordered) // page_size)), page_size)
+
+    def test_filters(self):
+        start = self.data['now'] - timedelta(minutes=1)
+        ids, _ = self.list_all({'from': start.isoformat(), 'to': self.data['now'].isoformat(), 'page_size': 2})
+        self.assertEqual(ids, list(DataPoint.objects.filter(building_object=self.data['building'], timestamp=start)
+                                   .order_by('id').values_list('id', flat=True)))
+        ids, _ = self.list_all({'data_type': self.data['data_type'].id, 'device': self.data['device'].id})
+        self.assertEqual(ids, [pk for pk in self.ordered
+                               if DataPoint.objects.get(id=pk).data_type_id == self.data['data_type'].id])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.object_path(self.data, 'data-points/'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_series_formats(self):
+        path = self.object_path(self.data, 'data-points/')
+        params = {'data_type': self.data['data_type'].id, 'page_size': 100}
+        response = self.client.get(path, {**params, 'format': 'series'})
+        self.assertEqual(response['Content-Type'], 'application/vnd.microclimate.series+json')
+        [series] = json.loads(response.content)['series']
+        points = DataPoint.objects.filter(building_object=self.data['building'], data_type=self.data['data_type']) \
+            .order_by('timestamp', 'id')
+        self.assertEqual(series['values'], [point.value for point in points])
+        self.assertEqual(series['timestamps'], [round(point.timestamp.timestamp() * 1000) for point in points])
+
+        content = self.client.get(path, {**params, 'format': 'series-bin'}).content
+        self.assertEqual(content[:4], SERIES_BINARY_MAGIC)
+        length = struct.unpack('<I', content[4:8])[0]
+        header = json.loads(content[8:8 + length])
+        count = header['series'][0]['count']
+        timestamps = struct.unpack(f'<{count}d', content[8 + length:8 + length + 8 * count])
+        values = struct.unpack(f'<{count}d', content[8 + length + 8 * count:])
+        self.assertEqual((list(timestamps), list(values)), (series['timestamps'], series['values']))
+
+        error = self.client.get(path, {'cursor': 'not-a-cursor', 'format': 'series-bin'})
+        self.assertEqual((error.status_code, json.loads(error.content)['detail']), (404, 'Invalid cursor'))
+
+    def test_series_formats_only_for_listings(self):
+        for suffix in ('data-points/latest/', f'data-points/{self.ordered[0]}/', 'data-points/aggregate/'):
+            for series_format in ('series', 'series-bin'):
+                response = self.client.get(self.object_path(self.data, suffix), {'format': series_format})
+                self.assertEqual(response.status_code, 404, (suffix, series_format))
+
+
+class RollupTests(DataTestCase):
+    """
+    Check that the rollups maintained on ingest match rollups rebuilt from the data points.
+    """
+
+    def setUp(self):
+        self.data = self.populate(2)
+        self.client.force_authenticate(self.data['user'])
+
+    def rollup_rows(self):
+        return {
+            granularity: sorted(model.objects.values_list(
+                'building_object', 'data_type', 'bucket', 'count', 'min_value', 'max_value', 'sum_value',
+                'last_value', 'last_timestamp'))
+            for granularity, (model, _) in GRANULARITIES.items()
+        }
+
+    def assertRollupsRebuilt(self):
+        maintained = self.rollup_rows()
+        rebuild(self.data['now'] - timedelta(days=2), self.data['now'] + timedelta(days=1))
+        self.assertEqual(maintained, self.rollup_rows())
+
+    def test_store_matches_rebuild(self):
+        now, row = self.data['now'], {'data_type': self.data['data_type'].id, 'device': self.data['device'].id}
+        rows = [{**row, 'value': value, 'timestamp': (now - offset).isoformat()} for value, offset in (
+            (5, timedelta(seconds=10)), (-3, timedelta(minutes=1, seconds=5)), (40, timedelta(hours=2)),
+            (7, timedelta(days=1, minutes=3)), (8, timedelta(days=1, minutes=4)))]
+        response = self.client.post(self.object_path(self.data, 'data-points/bulk/'), rows, format='json')
+        self.assertEqual(response.data['created'], len(rows))
+        self.assertRollupsRebuilt()
+
+    def test_update_and_destroy_match_rebuild(self):
+        self.client.force_authenticate(self.data['staff'])
+        data_type = self.data['data_type']
+        newest = DataPoint.objects.filter(building_object=self.data['building'], data_type=data_type).latest('timestamp', 'id')
+        path = self.object_path(self.data, f'data-points/{newest.id}/')
+        response = self.client.patch(path, {'value': 99, 'timestamp': (self.data['now'] - timedelta(days=1)).isoformat()},
+                                     format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertRollupsRebuilt()
+        self.assertEqual(self.client.delete(path).status_code, 204)
+        self.assertRollupsRebuilt()
+
+    def test_choose_granularity(self):
+        now = self.data['now']
+        self.assertEqual(choose_granularity(now - timedelta(hours=1), now, 60), 'minute')
+        self.assertEqual(choose_granularity(now - timedelta(days=1), now, 100), 'hour')
+        self.assertEqual(choose_granularity(now - timedelta(days=30), now, 100), 'day')
+        self.assertEqual(choose_granularity(now - timedelta(days=300), now, 100), 'day')
+
+
+
+class LatestReadingTests(DataTestCase):
+    """
+    Check that the cached latest readings follow changes to the data points.
+    """
+
+    def setUp(self):
+        self.data = self.populate(2)
+        self.client.force_authenticate(self.data['staff'])
+
+    def test_destroy_reloads_latest_readings(self):
+        data_type = self.data['data_type']
+        points = DataPoint.objects.filter(building_object=self.data['building'], data_type=data_type)
+        newest = points.latest('timestamp', 'id')
+        redis = mock.MagicMock()
+        with mock.patch('microclimate_control_app.latest.get_redis', return_value=redis), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(self.object_path(self.data, f'data-points/{newest.id}/'))
+        self.assertEqual(response.status_code, 204)
+
+        key = f'latest:building:{self.data["building"].id}'
+        redis.delete.assert_called_once_with(key)
+        [call] = redis.register_script.return_value.call_args_list
+        self.assertEqual(call.kwargs['keys'], [key])
+        readings = dict(zip(call.kwargs['args'][::3], call.kwargs['args'][2::3]))
+        self.assertEqual(json.loads(readings[data_type.id])['value'], points.latest('timestamp', 'id').value)
+
+        reading = self.client.get(self.object_path(self.data, 'data-points/latest/')).data
+        self.assertEqual(next(row['value'] for row in reading if row['data_type'] == data_type.id),
+                         points.latest('timestamp', 'id').value)
+
+    def test_async_latest_reads_the_redis_hash(self):
+        server = fakeredis.FakeServer()
+        path = f'/async{self.object_path(self.data, "data-points/latest/")}'
+        token = RefreshToken.for_user(self.data['staff']).access_token
+        with mock.patch('microclimate_control_app.latest.get_redis', return_value=fakeredis.FakeRedis(server=server)), \
+                mock.patch('microclimate_control_app.latest.get_async_redis',
+                           side_effect=lambda: fakeredis.FakeAsyncRedis(server=server)):
+            # The first request finds no hash and caches the readings loaded from the database
+            loaded = self.client.get(path, HTTP_AUTHORIZATION=f'Bearer {token}').json()
+            self.assertTrue(fakeredis.FakeRedis(server=server).exists(f'latest:building:{self.data["building"].id}'))
+            DataPoint.objects.filter(building_object=self.data['building']).delete()
+            cached = self.client.get(path, HTTP_AUTHORIZATION=f'Bearer {token}').json()
+        self.assertEqual(len(loaded), 2)
+        self.assertEqual(cached, loaded)
+
+
+class DeviceStatsTests(DataTestCase):
+    """
+    Check that the device statistics maintained through the API match statistics rebuilt from the data points.
+    """
+
+    def setUp(self):
+        self.data = self.populate(3)
+        self.client.force_authenticate(self.data['staff'])
+        self.points = DataPoint.objects.filter(building_object=self.data['building'], data_type=self.data['data_type'])
+
+    def stats_rows(self):
+        return sorted(DeviceStats.objects.values_list(
+            'device', 'data_type', 'count', 'first_timestamp', 'last_timestamp', 'last_value', 'last_building_object'))
+
+    def assertStatsRebuilt(self):
+        maintained = self.stats_rows()
+        rebuild_device_stats()
+        self.assertEqual(maintained, self.stats_rows())
+
+    def test_update_and_destroy_match_rebuild(self):
+        other = Device.objects.create(name='Other')
+        other.data_collected.set([self.data['data_type']])
+        newest, oldest = self.points.latest('timestamp', 'id'), self.points.earliest('timestamp', 'id')
+        for point, change in ((newest, {'value': 99}),
+                              (newest, {'timestamp': (self.data['now'] - timedelta(days=1)).isoformat()}),
+                              (oldest, {'device': other.id})):
+            response = self.client.patch(self.object_path(self.data, f'data-points/{point.id}/'), change, format='json')
+            self.assertEqual(response.status_code, 200, response.data)
+            self.assertStatsRebuilt()
+        for point in self.points.order_by('timestamp'):
+            self.assertEqual(self.client.delete(self.object_path(self.data, f'data-points/{point.id}/')).status_code, 204)
+            self.assertStatsRebuilt()
+        self.assertFalse(DeviceStats.objects.filter(data_type=self.data['data_type']).exists())
+
+    def test_readings(self):
+        response = self.client.get(f'/devices/{self.data["device"].id}/readings/',
+                                   {'data_type': self.data['data_type'].id, 'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        ordered = list(self.points.order_by('timestamp', 'id').values_list('id', flat=True))
+        self.assertEqual([row['id'] for row in response.data['results']], ordered[:2])
+        self.assertEqual([row['id'] for row in self.client.get(response.data['next']).data['results']], ordered[2:])
+
+    def test_summary(self):
+        missing = DataType.objects.create(code='missing', name='Missing', metric=self.data['data_type'].metric)
+        self.data['device'].data_collected.add(missing)
+        response = self.client.get(f'/devices/{self.data["device"].id}/summary/')
+        self.assertEqual(response.status_code, 200)
+        summary = response.data
+        self.assertEqual((summary['count'], summary['last_seen'], summary['last_building_object']),
+                         (9, self.data['now'], self.data['building'].id))
+        self.assertEqual((summary['missing_data_types'], summary['unexpected_data_types']), ([missing.id], []))
+        self.assertAlmostEqual(summary['readings_per_hour'], 3 * 60)
+        first = summary['data_types'][0]
+        self.assertEqual((first['data_type'], first['count'], first['first_timestamp'], first['last_value']),
+                         (self.data['data_type'].id, 3, self.data['now'] - timedelta(minutes=2), 20))
+
+    def test_unknown_device(self):
+        for pk in (0, 'abc'):
+            for route in ('readings', 'summary'):
+                self.assertEqual(self.client.get(f'/devices/{pk}/{route}/').status_code, 404, (pk, route))
+
+class AggregateTests(DataTestCase):
+    """
+    Check the values computed by the aggregation endpoint.
+    """
+
+    def setUp(self):
+        self.data = self.populate(2)
+        self.data_type = DataType.objects.create(code='agg', name='Aggregated', metric=self.data['data_type'].metric)
+        self.hour = truncate(self.data['now'], 'hour') - timedelta(hours=3)
+        DataPoint.objects.bulk_create([
+            DataPoint(timestamp=self.hour + offset, value=value, data_type=self.data_type,
+                      device=self.data['device'], building_object=self.data['building'])
+            for offset, value in ((timedelta(minutes=5), 10), (timedelta(minutes=10), 20),
+                                  (timedelta(minutes=10), 25), (timedelta(minutes=70), 4))
+        ])
+        self.client.force_authenticate(self.data['user'])
+
+    def aggregate(self, **params):
+        return self.client.get(self.object_path(self.data, 'data-points/aggregate/'),
+                               {'data_type': self.data_type.id, **params})
+
+    def test_hourly_aggregates(self):
+        response = self.aggregate(bucket='hour', fn='count,min,max,avg,first,last')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['functions'], ['count', 'min', 'max', 'avg', 'first', 'last'])
+        [result] = response.data['results']
+        self.assertEqual((result['data_type'], result['data_type_name'], result['metric_name']),
+                         (self.data_type.id, 'Aggregated', '°C'))
+        self.assertEqual([(bucket['bucket'], bucket['count'], bucket['min'], bucket['max'], bucket['first'],
+                           bucket['last']) for bucket in result['buckets']],
+                         [(self.hour, 3, 10, 25, 10, 25), (self.hour + timedelta(hours=1), 1, 4, 4, 4, 4)])
+        self.assertAlmostEqual(result['buckets'][0]['avg'], 55 / 3)
+
+    def test_daily_count_of_all_data_types(self):
+        response = self.client.get(self.object_path(self.data, 'data-points/aggregate/'), {'bucket': 'day', 'fn': 'count'})
+        self.assertEqual(sum(bucket['count'] for result in response.data['results'] for bucket in result['buckets']),
+                         DataPoint.objects.filter(building_object=self.data['building']).count())
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.aggregate(bucket='year').status_code, 400)
+        self.assertEqual(self.aggregate(fn='avg,median').status_code, 400)
+
+
+class RetentionTests(DataTestCase):
+    """
+    Check that retention policies purge the data points their precedence rules select.
+    """
+
+    def setUp(self):
+        self.data = self.populate(2)
+        project, metric = self.data['project'], self.data['data_type'].metric
+        other = BuildingObject.objects.create(name='Other', location='Test',
+                                              project=Project.objects.create(name='Other', description='Retention'))
+        data_types = [self.data['data_type']] + DataType.objects.bulk_create([
+            DataType(code=code, name=code, metric=metric) for code in ('kept', 'typed')])
+        self.old = self.data['now'] - timedelta(days=10)
+        DataPoint.objects.bulk_create([
+            DataPoint(timestamp=timestamp, value=1, data_type=data_type, device=self.data['device'], building_object=building)
+            for building in (self.data['building'], other) for data_type in data_types
+            for timestamp in (self.old, self.old + timedelta(minutes=1), self.data['now'] - timedelta(hours=1))
+        ])
+        RetentionPolicy.objects.bulk_create([
+            RetentionPolicy(project=project, raw_days=5, minute_days=5),
+            RetentionPolicy(data_type=data_types[1]),
+            RetentionPolicy(data_type=data_types[2], raw_days=5),
+            RetentionPolicy(project=other.project, data_type=data_types[2]),
+        ])
+        self.expired_series = {(self.data['building'].id, data_types[0].id), (self.data['building'].id, data_types[2].id)}
+
+    def test_expire_follows_policy_precedence(self):
+        old_points = DataPoint.objects.filter(timestamp__lt=self.old + timedelta(days=1))
+        expected = {(point.building_object_id, point.data_type_id): 0 for point in old_points}
+        for point in old_points:
+            if (point.building_object_id, point.data_type_id) in self.expired_series:
+                expected[point.building_object_id, point.data_type_id] += 1
+
+        # Deleting a row per batch pages through the expired rows
+        summaries = list(retention.expire(now=self.data['now'], batch_size=1))
+        self.assertEqual({(summary['tier'], summary['deleted']) for summary in summaries},
+                         {('raw', sum(expected.values()))})
+
+        remaining = {(point.building_object_id, point.data_type_id) for point in old_points.all()}
+        self.assertEqual(remaining, {series for series, count in expected.items() if not count})
+        day_rollup = GRANULARITIES['day'][0]
+        self.assertEqual(
+            {(row.building_object_id, row.data_type_id): row.count
+             for row in day_rollup.objects.filter(bucket=truncate(self.old, 'day'))},
+            {series: count for series, count in expected.items() if count})
+        # The project policy keeps minute rollups for 5 days, so they are not rebuilt for its data type
+        minute_rollup = GRANULARITIES['minute'][0]
+        self.assertEqual(
+            {(row.building_object_id, row.data_type_id)
+             for row in minute_rollup.objects.filter(bucket__lt=self.old + timedelta(days=1))},
+            self.expired_series - {(self.data['building'].id, self.data['data_type'].id)})
+
+    def test_dry_run_deletes_nothing(self):
+        count = DataPoint.objects.count()
+        self.assertEqual(sum(summary['deleted'] for summary in retention.expire(now=self.data['now'], dry_run=True)), 4)
+        self.assertEqual(DataPoint.objects.count(), count)
+
+
+class ProfilingTests(DataTestCase):
+    """
+    Check which requests are profiled and as which user they run.
+    """
+
+    def setUp(self):
+        self.data = self.populate(2)
+        self.other = self.populate(3)
+
+    def get(self, user, path, **headers):
+        token = RefreshToken.for_user(user).access_token
+        return self.client.get(path, HTTP_AUTHORIZATION=f'Bearer {token}', HTTP_X_PROFILE='1', **headers)
+
+    def get_profile(self, response):
+        token = RefreshToken.for_user(self.data['staff']).access_token
+        return self.client.get(f'/profiles/{response["X-Profile-Id"]}/', HTTP_AUTHORIZATION=f'Bearer {token}').data
+
+    def test_staff_requests_are_profiled(self):
+        response = self.get(self.data['staff'], f'/projects/{self.other["project"].id}/objects/')
+        self.assertEqual((response.status_code, len(response.data)), (200, 3))
+        profile = self.get_profile(response)
+        self.assertEqual((profile['route'], profile['status'], profile['user']), ('building-objects-list', 200, None))
+        self.assertGreater(profile['query_count'], 0)
+        self.assertEqual(len(profile['queries']), profile['query_count'])
+        self.assertTrue(all(statement['sql'] and statement['duration'] >= 0 for statement in profile['queries']))
+        self.assertAlmostEqual(profile['query_time'], sum(statement['duration'] for statement in profile['queries']))
+
+    def test_other_requests_are_not_profiled(self):
+        response = self.get(self.data['user'], self.object_path(self.data, 'data-points/latest/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
+
+    def test_staff_profile_as_user(self):
+        user = self.data['user']
+        path = f'/projects/{self.other["project"].id}/objects/'
+        response = self.get(self.data['staff'], path, HTTP_X_PROFILE_USER=str(user.id))
+        self.assertEqual((response.status_code, response.data), (200, []))
+        self.assertEqual(self.get_profile(response)['user'], user.id)
+
+        response = self.get(self.data['staff'], f'/async{self.object_path(self.other, "data-points/latest/")}',
+                            HTTP_X_PROFILE_USER=str(user.id))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.get_profile(response)['user'], user.id)
+
+    def test_profile_as_unknown_user(self):
+        for user_id in ('0', 'abc'):
+            response = self.get(self.data['staff'], f'/projects/{self.data["project"].id}/objects/',
+                                HTTP_X_PROFILE_USER=user_id)
+            self.assertEqual(response.status_code, 400, user_id)
+        # Users other than staff cannot run requests as anybody else
+        response = self.get(self.data['user'], f'/projects/{self.other["project"].id}/objects/',
+                            HTTP_X_PROFILE_USER=str(self.other['staff'].id))
+        self.assertEqual((response.status_code, response.data), (200, []))
+        self.assertNotIn('X-Profile-Id', response)
+
+
+class MetricsTests(DataTestCase):
+    """
+    Check how request metrics are recorded in Redis, rendered and protected.
+    """
+
+    def setUp(self):
+        self.data = self.populate(2)
+        self.redis = fakeredis.FakeRedis()
+        patcher = mock.patch.object(metrics, 'get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_metrics(self, user=None, **headers):
+        if user is not None:
+            headers['HTTP_AUTHORIZATION'] = f'Bearer {RefreshToken.for_user(user).access_token}'
+        return self.client.get('/metrics', **headers)
+
+    def test_requests_are_recorded(self):
+        self.client.force_authenticate(self.data['user'])
+        self.client.get(f'/projects/{self.data["project"].id}/objects/')
+        self.client.get(f'/projects/{self.data["project"].id}/objects/')
+        self.client.force_authenticate(None)
+
+        fields = {field.decode(): float(value) for field, value in self.redis.hgetall(metrics.METRICS_KEY).items()}
+        labels = 'route="building-objects-list",method="GET"'
+        self.assertEqual(fields[f'http_requests_total|{labels},status="200"'], 2)
+        self.assertEqual(fields[f'http_request_duration_seconds_count|{labels}'], 2)
+        self.assertEqual(fields[f'http_response_cache_total|route="building-objects-list",result="miss"'], 1)
+        self.assertEqual(fields[f'http_response_cache_total|route="building-objects-list",result="hit"'], 1)
+        # Requests to the metrics endpoint are not recorded
+        self.get_metrics(self.data['staff'])
+        self.assertFalse(any('route="metrics"' in field.decode() for field in self.redis.hkeys(metrics.METRICS_KEY)))
+
+    def test_render(self):
+        stats = metrics.RequestStats()
+        stats.queries, stats.query_time = 3, 0.5
+        metrics.record('devices-list', 'GET', 200, 0.02, stats, size=300)
+        metrics.record('devices-list', 'GET', 404, 20, stats, cache_result='hit')
+        lines = metrics.render().splitlines()
+
+        labels = 'route="devices-list",method="GET"'
+        self.assertEqual(lines[:2], ['# HELP http_request_duration_seconds Request latency in seconds.',
+                                     '# TYPE http_request_duration_seconds histogram'])
+        duration = [line for line in lines if line.startswith('http_request_duration_seconds')]
+        self.assertEqual(duration[:3], [f'http_request_duration_seconds_bucket{{{labels},le="0.005"}} 0',
+                                        f'http_request_duration_seconds_bucket{{{labels},le="0.01"}} 0',
+                                        f'http_request_duration_seconds_bucket{{{labels},le="0.025"}} 1'])
+        self.assertEqual(duration[-3:], [f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2',
+                                         f'http_request_duration_seconds_sum{{{labels}}} 20.02',
+                                         f'http_request_duration_seconds_count{{{labels}}} 2'])
+        self.assertIn(f'http_response_size_bytes_count{{{labels}}} 1', lines)
+        self.assertIn(f'http_request_query_seconds_total{{{labels}}} 1', lines)
+        self.assertIn(f'http_requests_total{{{labels},status="200"}} 1', lines)
+        self.assertIn(f'http_requests_total{{{labels},status="404"}} 1', lines)
+        self.assertIn('http_response_cache_total{route="devices-list",result="hit"} 1', lines)
+
+    def test_requires_staff_or_token(self):
+        self.assertEqual(self.get_metrics().status_code, 401)
+        self.assertEqual(self.get_metrics(self.data['user']).status_code, 401)
+        response = self.get_metrics(self.data['staff'])
+        self.assertEqual((response.status_code, response['Content-Type']),
+                         (200, 'text/plain; version=0.0.4; charset=utf-8'))
+        with override_settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.get_metrics(HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+            self.assertEqual(self.get_metrics(HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+            self.assertEqual(self.get_metrics(self.data['staff']).status_code, 200)
+
+
+class LiveTests(DataTestCase):
+    """
+    Check how live streams are opened and what they send.
+    """
+
+    def setUp(self):
+        self.data = self.populate(2)
+        self.other = self.populate(3)
+
+    def get(self, user, path, **params):
+        token = RefreshToken.for_user(user).access_token
+        return self.client.get(f'/async{path}', params, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def stream_token(self, data):
+        response = self.get(data['user'], self.object_path(data, 'data-points/live/token/'))
+        self.assertEqual(response.status_code, 200)
+        return response.json()['token']
+
+    def test_stream_token(self):
+        path = f'/async{self.object_path(self.data, "data-points/live/")}'
+        token = self.stream_token(self.data)
+        # Authenticated streams are refused without a Redis cache
+        self.assertEqual(self.client.get(path, {'token': token}).status_code, 503)
+        self.assertEqual(self.client.get(path, {'token': 'invalid'}).status_code, 401)
+        self.assertEqual(self.client.get(path, {'token': self.stream_token(self.other)}).status_code, 401)
+        with override_settings(LIVE_STREAM_TOKEN_SECONDS=-1):
+            self.assertEqual(self.client.get(path, {'token': token}).status_code, 401)
+        self.assertEqual(self.get(self.data['user'], self.object_path(self.other, 'data-points/live/token/'))
+                         .status_code, 403)
+
+    @override_settings(LIVE_STREAM_HEARTBEAT_SECONDS=1)
+    def test_published_points_reach_the_stream(self):
+        server = fakeredis.FakeServer()
+        point = self.data['point']
+
+        async def stream():
+            events = live.events(fakeredis.FakeAsyncRedis(server=server), self.data['building'].id)
+            received = [await anext(events)]
+            with mock.patch.object(live, 'get_redis', return_value=fakeredis.FakeRedis(server=server)):
+                live.publish([point])
+            while not received[-1].startswith('event:'):
+                received.append(await anext(events))
+            await events.aclose()
+            return received
+
+        received = async_to_sync(stream)()
+        self.assertEqual(received[0], 'retry: 1000\n\n')
+        name, data = received[-1].splitlines()[:2]
+        self.assertEqual(name, 'event: datapoints')
+        self.assertEqual(json.loads(data.removeprefix('data: ')), [{
+            'id': point.id, 'timestamp': point.timestamp.isoformat(), 'data_type': point.data_type_id,
+            'value': point.value, 'device': point.device_id, 'building_object': point.building_object_id}])
@@ -1,10 +1,13 @@
 from django.urls import path, include
 from rest_framework_nested import routers
 
-from .views import ProjectViewSet, BuildingObjectViewSet, DataPointViewSet, UserViewSet
+from .async_views import (AsyncBuildingObjectListView, AsyncDataPointListView, AsyncLatestView, AsyncLiveView,
+                          AsyncLiveTokenView)
+from .views import ProjectViewSet, BuildingObjectViewSet, DataPointViewSet, DeviceViewSet, UserViewSet, metrics, profile
 
 router = routers.SimpleRouter()
 router.register(r'projects', ProjectViewSet, basename='projects')
+router.register(r'devices', DeviceViewSet, basename='devices')
 
 projects_router = routers.NestedSimpleRouter(
     router, r'projects', lookup='project')
@@ -18,8 +21,24 @@ objects_router.register(r'data-points', DataPointViewSet,
 objects_router.register(r'responsibles', UserViewSet,
                         basename='object-responsibles')
 
+async_urlpatterns = [
+    path('projects/<int:project_pk>/objects/',
+         AsyncBuildingObjectListView.as_view(), name='async-building-objects-list'),
+    path('projects/<int:project_pk>/objects/<int:object_pk>/data-points/',
+         AsyncDataPointListView.as_view(), name='async-object-data-points-list'),
+    path('projects/<int:project_pk>/objects/<int:object_pk>/data-points/latest/',
+         AsyncLatestView.as_view(), name='async-object-data-points-latest'),
+    path('projects/<int:project_pk>/objects/<int:object_pk>/data-points/live/',
+         AsyncLiveView.as_view(), name='async-object-data-points-live'),
+    path('projects/<int:project_pk>/objects/<int:object_pk>/data-points/live/token/',
+         AsyncLiveTokenView.as_view(), name='async-object-data-points-live-token'),
+]
+
 urlpatterns = [
     path('', include(router.urls)),
     path('', include(projects_router.urls)),
     path('', include(objects_router.urls)),
+    path('async/', include(async_urlpatterns)),
+    path('metrics', metrics, name='metrics'),
+    path('profiles/<str:pk>/', profile, name='profiles-detail'),
 ]
@@ -1,12 +1,37 @@
-from rest_framework import viewsets, status
+from rest_framework import generics, viewsets, status
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
+from rest_framework.settings import api_settings
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from datetime import timedelta
+from copy import copy
 from os import environ
-
-from .models import Project, BuildingObject
-from .serializers import ProjectSerializer, BuildingObjectSerializer, DataPointSerializer, UserSerializer
+import hmac
+import logging
+
+from . import aggregation, device_stats, ingest_queue, latest as latest_readings, metrics as request_metrics, profiling, reference, rollups
+from .access import get_access_set
+from .caching import cache_response
+from .filters import DataPointFilterBackend, parse_datetime_param, parse_int_param
+from .ingest import validate_rows, store, revise, iter_lines, iter_ndjson, iter_csv, ingest_stream
+from .models import Project, BuildingObject, DataPoint, Device, ProjectGrant
+from .pagination import TimestampCursorPagination
+from .renderers import SERIES_FORMATS, SeriesJSONRenderer, SeriesBinaryRenderer
+from .serializers import (
+    ProjectSerializer,
+    BuildingObjectSerializer,
+    DataPointSerializer,
+    DataPointReadSerializer,
+    DataPointSeriesSerializer,
+    DeviceSerializer,
+    UserSerializer,
+)
 from .permissions import (
     CanAccessProject,
     CanUpdateProject,
@@ -18,7 +43,34 @@ from .permissions import (
 )
 
 APP_NAME = 'microclimate_control_app'
-DEFAULT_CACHE_TIMEOUT = environ.get('DEFAULT_CACHE_TIMEOUT')
+DEFAULT_CACHE_TIMEOUT = int(environ.get('DEFAULT_CACHE_TIMEOUT') or 300)
+
+logger = logging.getLogger(__name__)
+
+
+def parse_aggregation_params(request):
+    """
+    Parse the 'bucket' and 'fn' query parameters of aggregation requests.
+
+    Args:
+        request: The incoming HTTP request.
+
+    Returns:
+        tuple: The bucket width and the list of aggregate function names.
+
+    Raises:
+        ValidationError: If the bucket or one of the functions is not supported.
+    """
+    bucket = request.query_params.get('bucket', 'hour')
+    if bucket not in aggregation.BUCKETS:
+        raise ValidationError({'bucket': [f'Choose one of: {", ".join(aggregation.BUCKETS)}.']})
+
+    supported = list(aggregation.FUNCTIONS) + list(aggregation.POSITIONAL_FUNCTIONS)
+    functions = [name.strip() for name in request.query_params.get('fn', 'avg').split(',') if name.strip()]
+    unsupported = [name for name in functions if name not in supported]
+    if not functions or unsupported:
+        raise ValidationError({'fn': [f'Choose from: {", ".join(supported)}.']})
+    return bucket, list(dict.fromkeys(functions))
 
 
 class ProjectViewSet(viewsets.ModelViewSet):
@@ -64,17 +116,13 @@ class ProjectViewSet(viewsets.ModelViewSet):
             queryset: Filtered queryset of projects based on user permissions.
         """
         user = self.request.user
-        if user.is_staff:
+        access = get_access_set(user)
+        if user.is_staff or access.is_superuser:
             return Project.objects.all()
 
-        project_ids = [
-            int(perm.codename.split('_')[-1])
-            for perm in user.user_permissions.all()
-            if perm.codename.startswith('can_access_project_') and user.has_perm(f'{APP_NAME}.{perm.codename}')
-        ]
-        return Project.objects.filter(id__in=project_ids)
+        return Project.objects.filter(id__in=access.projects[ProjectGrant.ACCESS])
 
-    @method_decorator(cache_page(60 * 60 * 2))
+    @cache_response('project', timeout=60 * 60 * 2)
     def list(self, request, *args, **kwargs):
         """
         List all projects with caching (timeout argument is measured in seconds).
@@ -89,7 +137,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
         """
         return super().list(request, *args, **kwargs)
 
-    @method_decorator(cache_page(60 * 60 * 2))
+    @cache_response('project', timeout=60 * 60 * 2)
     def retrieve(self, request, *args, **kwargs):
         """
         Retrieve a specific project with caching (timeout argument is measured in seconds).
@@ -104,6 +152,73 @@ class ProjectViewSet(viewsets.ModelViewSet):
         """
         return super().retrieve(request, *args, **kwargs)
 
+    @action(detail=True, methods=['get'])
+    def series(self, request, pk=None):
+        """
+        Get the series of one data type for every building object of the project the user may access.
+
+        The query parameters are 'data_type' (required), 'from' and 'to' (defaulting to the last
+        day). Without 'bucket', the series are read from the rollup tables like the series of a
+        single building object, with 'max_points' and 'granularity'. With 'bucket' (minute,
+        hour, day, week or month) and 'fn', the data points are aggregated in the database like
+        by the aggregate action. Either way, all building objects are read in a single query
+        grouped by building object.
+
+        Args:
+            request: The incoming HTTP request.
+            pk: The ID of the project.
+
+        Returns:
+            Response: HTTP response with the series of each accessible building object.
+        """
+        try:
+            project_id = int(pk)
+        except ValueError:
+            raise NotFound()
+        access = get_access_set(request.user)
+        if request.user.is_staff or access.has_project_permission(ProjectGrant.ACCESS, project_id):
+            buildings = BuildingObject.objects.filter(project_id=project_id)
+        else:
+            buildings = BuildingObject.objects.filter(project_id=project_id, id__in=access.building_ids(project_id))
+        buildings = list(buildings.order_by('id').values('id', 'name'))
+        if not buildings and not Project.objects.filter(id=project_id).exists():
+            raise NotFound()
+
+        data_type_id = parse_int_param(request, 'data_type')
+        if data_type_id is None:
+            raise ValidationError({'data_type': ['This field is required.']})
+        end = parse_datetime_param(request, 'to') or timezone.now()
+        start = parse_datetime_param(request, 'from') or end - timedelta(days=1)
+        building_ids = [building['id'] for building in buildings]
+
+        if request.query_params.get('bucket'):
+            bucket, functions = parse_aggregation_params(request)
+            queryset = DataPoint.objects.filter(building_object_id__in=building_ids, data_type_id=data_type_id,
+                                                timestamp__gte=start, timestamp__lt=end)
+            series = {}
+            for row in aggregation.aggregate(queryset, bucket, functions, group_by=('building_object',)):
+                series.setdefault(row.pop('building_object'), []).append(row)
+            options = {'bucket': bucket, 'functions': functions}
+        else:
+            max_points = parse_int_param(request, 'max_points') or settings.SERIES_MAX_POINTS
+            granularity = request.query_params.get('granularity') or \
+                rollups.choose_granularity(start, end, max_points)
+            if granularity not in rollups.GRANULARITIES:
+                raise ValidationError({'granularity': [f'Choose one of: {", ".join(rollups.GRANULARITIES)}.']})
+            series = rollups.series_by_building(building_ids, data_type_id, start, end, granularity)
+            options = {'granularity': granularity}
+
+        return Response({
+            'project': project_id,
+            'data_type': data_type_id,
+            **options,
+            'results': [
+                {'building_object': building['id'], 'building_object_name': building['name'],
+                 'buckets': series.get(building['id'], [])}
+                for building in buildings
+            ],
+        })
+
 
 class BuildingObjectViewSet(viewsets.ModelViewSet):
     """
@@ -147,21 +262,24 @@ class BuildingObjectViewSet(viewsets.ModelViewSet):
 
         Returns:
             queryset: Filtered queryset of building objects based on user permissions.
+
+        Raises:
+            NotFound: If the project ID is malformed or, for users with access to all projects,
+                      the project does not exist.
         """
         user = self.request.user
-        project_id = self.kwargs['project_pk']
-        if user.is_staff or user.has_perm(f'{APP_NAME}.can_access_project_{project_id}'):
-            return Project.objects.get(id=project_id).buildingobject_set.all()
-
-        building_ids = [
-            int(perm.codename.split('_')[-1])
-            for perm in user.user_permissions.all()
-            if perm.codename.startswith(f'can_access_project_{project_id}_building_')
-            and user.has_perm(f'{APP_NAME}.{perm.codename}')
-        ]
-        return BuildingObject.objects.filter(id__in=building_ids)
-
-    @method_decorator(cache_page(DEFAULT_CACHE_TIMEOUT))
+        try:
+            project_id = int(self.kwargs['project_pk'])
+        except ValueError:
+            raise NotFound()
+        access = get_access_set(user)
+        if user.is_staff or access.has_project_permission(ProjectGrant.ACCESS, project_id):
+            return generics.get_object_or_404(Project, pk=project_id).buildingobject_set.prefetch_related('users')
+
+        return BuildingObject.objects.filter(id__in=access.building_ids(project_id), project_id=project_id) \
+            .prefetch_related('users')
+
+    @cache_response('project', 'building_object', timeout=DEFAULT_CACHE_TIMEOUT)
     def list(self, request, *args, **kwargs):
         """
         List all building objects with caching (timeout argument is measured in seconds).
@@ -176,7 +294,7 @@ class BuildingObjectViewSet(viewsets.ModelViewSet):
         """
         return super().list(request, *args, **kwargs)
 
-    @method_decorator(cache_page(DEFAULT_CACHE_TIMEOUT))
+    @cache_response('project', 'building_object', timeout=DEFAULT_CACHE_TIMEOUT)
     def retrieve(self, request, *args, **kwargs):
         """
         Retrieve a specific building object with caching (timeout argument is measured in seconds).
@@ -197,25 +315,97 @@ class DataPointViewSet(viewsets.ModelViewSet):
     DataPointViewSet for managing data points associated with building objects.
 
     This ViewSet provides CRUD operations for data points linked to specific building objects.
-    It includes permissions handling based on user roles and actions.
+    It includes permissions handling based on user roles and actions. Listings can be filtered
+    by time range, data type and device, are paginated by (timestamp, id) cursors and can be
+    requested in a columnar series format.
 
     Attributes:
         serializer_class (class): The serializer class to use for data point data.
         permission_classes (list): The permission classes applied to all actions.
+        filter_backends (list): The filter backends applied to listings.
+        pagination_class (class): The pagination class applied to listings.
+        renderer_classes (list): The renderers, including the columnar series formats of listings.
     """
 
     serializer_class = DataPointSerializer
     permission_classes = [IsAdminUser | CanAccessBuildingContent]
+    filter_backends = [DataPointFilterBackend]
+    pagination_class = TimestampCursorPagination
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [SeriesJSONRenderer, SeriesBinaryRenderer]
 
     def get_queryset(self):
         """
         Get the queryset of data points associated with a specific building object.
 
+        Only data points of a building object of the project in the URL are included. Listings
+        select plain values rows for DataPointReadSerializer. Data types and metrics are never
+        joined, their names come from the cached reference data.
+
         Returns:
             queryset: Filtered queryset of data points.
         """
-        building_id = self.kwargs['object_pk']
-        return BuildingObject.objects.get(id=building_id).datapoint_set
+        queryset = DataPoint.objects.filter(building_object_id=self.kwargs['object_pk'],
+                                            building_object__project_id=self.kwargs['project_pk'])
+        if self.action == 'list':
+            return DataPointReadSerializer.values(queryset)
+        return queryset
+
+    def get_building(self):
+        """
+        Get the building object of the URL.
+
+        Returns:
+            BuildingObject: The building object.
+
+        Raises:
+            Http404: If the building object does not exist or belongs to another project.
+        """
+        return get_object_or_404(BuildingObject, id=self.kwargs['object_pk'], project_id=self.kwargs['project_pk'])
+
+    def get_renderers(self):
+        """
+        Get the renderers of the requested action.
+
+        The columnar series formats are only offered by listings, the other actions do not
+        respond with data point rows.
+
+        Returns:
+            list: The renderer instances.
+        """
+        renderers = super().get_renderers()
+        if self.action == 'list':
+            return renderers
+        return [renderer for renderer in renderers if renderer.format not in SERIES_FORMATS]
+
+    def get_serializer_class(self):
+        """
+        Get the serializer class based on the requested action.
+
+        Returns:
+            class: DataPointReadSerializer for listings, DataPointSerializer otherwise.
+        """
+        if self.action == 'list':
+            return DataPointReadSerializer
+        return super().get_serializer_class()
+
+    def list(self, request, *args, **kwargs):
+        """
+        List data points, in the columnar series format if the client asked for it.
+
+        Args:
+            request: The incoming HTTP request.
+            args: Additional positional arguments.
+            kwargs: Additional keyword arguments.
+
+        Returns:
+            Response: HTTP response with a page of data points.
+        """
+        if request.accepted_renderer.format not in SERIES_FORMATS:
+            return super().list(request, *args, **kwargs)
+
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        data = DataPointSeriesSerializer(page).data
+        return Response({'next': self.paginator.get_next_link(), **data})
 
     def create(self, request, *args, **kwargs):
         """
@@ -237,6 +427,240 @@ class DataPointViewSet(viewsets.ModelViewSet):
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def perform_update(self, serializer):
+        """
+        Save a changed data point and update the data derived from it.
+
+        Args:
+            serializer: The validated DataPointSerializer of the data point.
+        """
+        previous = copy(serializer.instance)
+        with transaction.atomic():
+            serializer.save()
+            revise(previous, serializer.instance)
+
+    def perform_destroy(self, instance):
+        """
+        Delete a data point and update the data derived from it.
+
+        Args:
+            instance (DataPoint): The data point to delete.
+        """
+        with transaction.atomic():
+            instance.delete()
+            revise(instance)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request, *args, **kwargs):
+        """
+        Create many data points associated with a building object in a single request.
+
+        The request body is a JSON list of data points. Access is checked once for the whole
+        batch, foreign keys are validated with set-based lookups and valid rows are written
+        with a bulk insert, while invalid rows are reported by their index in the list.
+
+        Args:
+            request: The incoming HTTP request.
+            args: Additional positional arguments.
+            kwargs: Additional keyword arguments.
+
+        Returns:
+            Response: HTTP response with the number of created data points and per-row errors.
+        """
+        rows = request.data
+        if not isinstance(rows, list):
+            return Response({'non_field_errors': ['Expected a list of data points.']},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > settings.DATA_POINT_BULK_MAX_ROWS:
+            return Response({'non_field_errors': [f'Ensure there are no more than {settings.DATA_POINT_BULK_MAX_ROWS} data points.']},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        building = get_object_or_404(
+            BuildingObject, id=kwargs['object_pk'], project_id=kwargs['project_pk'])
+        points, errors = validate_rows(rows, building.id)
+        created = store(points)
+
+        response_status = status.HTTP_201_CREATED if created or not errors else status.HTTP_400_BAD_REQUEST
+        return Response({'created': len(created), 'errors': errors}, status=response_status)
+
+    @action(detail=False, methods=['post'])
+    def queue(self, request, *args, **kwargs):
+        """
+        Queue data points associated with a building object to be stored by the ingest worker.
+
+        The request body is a single data point or a JSON list of them. Rows are only checked
+        for well-formed fields before they are appended to the ingest queue, so the response
+        does not wait for the database. Rows with unknown data types or devices are rejected by
+        the worker. If the queue cannot be reached, the rows are stored right away like with
+        the bulk endpoint.
+
+        Args:
+            request: The incoming HTTP request.
+            args: Additional positional arguments.
+            kwargs: Additional keyword arguments.
+
+        Returns:
+            Response: HTTP response with the number of queued data points and per-row errors.
+        """
+        rows = request.data if isinstance(request.data, list) else [request.data]
+        if len(rows) > settings.DATA_POINT_BULK_MAX_ROWS:
+            return Response({'non_field_errors': [f'Ensure there are no more than {settings.DATA_POINT_BULK_MAX_ROWS} data points.']},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        building = get_object_or_404(
+            BuildingObject, id=kwargs['object_pk'], project_id=kwargs['project_pk'])
+        try:
+            queued, errors = ingest_queue.enqueue(rows, building.id)
+        except ingest_queue.QueueUnavailable:
+            logger.warning('Ingest queue unavailable, storing data points synchronously', exc_info=True)
+            points, errors = validate_rows(rows, building.id)
+            created = store(points)
+            response_status = status.HTTP_201_CREATED if created or not errors else status.HTTP_400_BAD_REQUEST
+            return Response({'created': len(created), 'errors': errors}, status=response_status)
+
+        response_status = status.HTTP_202_ACCEPTED if queued or not errors else status.HTTP_400_BAD_REQUEST
+        return Response({'queued': queued, 'errors': errors}, status=response_status)
+
+    @action(detail=False, methods=['post'])
+    def stream(self, request, *args, **kwargs):
+        """
+        Ingest a large upload of data points by reading the request body incrementally.
+
+        The body is either newline-delimited JSON (Content-Type: application/x-ndjson) with one
+        data point object per line, or CSV (Content-Type: text/csv) with a header line naming the
+        'data_type', 'device', 'value' and 'timestamp' columns. Rows are stored in fixed-size chunks
+        so the upload is never held in memory as a whole.
+
+        Args:
+            request: The incoming HTTP request.
+            args: Additional positional arguments.
+            kwargs: Additional keyword arguments.
+
+        Returns:
+            Response: HTTP response with the number of accepted and rejected rows.
+        """
+        decoders = {
+            'application/x-ndjson': iter_ndjson,
+            'application/jsonl': iter_ndjson,
+            'text/csv': iter_csv,
+        }
+        decoder = decoders.get(request.content_type.split(';')[0].strip())
+        if decoder is None:
+            return Response({'detail': f'Unsupported media type "{request.content_type}" in request.'},
+                            status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        if request.stream is None:
+            return Response({'non_field_errors': ['Request body is empty.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        building = get_object_or_404(
+            BuildingObject, id=kwargs['object_pk'], project_id=kwargs['project_pk'])
+        lines = iter_lines(request.stream, settings.DATA_POINT_STREAM_MAX_LINE_LENGTH)
+        summary = ingest_stream(decoder(lines), building.id,
+                                settings.DATA_POINT_STREAM_CHUNK_SIZE, settings.DATA_POINT_STREAM_MAX_ERRORS)
+
+        response_status = status.HTTP_201_CREATED if summary['accepted'] or not summary['rejected'] \
+            else status.HTTP_400_BAD_REQUEST
+        return Response(summary, status=response_status)
+
+    @action(detail=False, methods=['get'])
+    def series(self, request, *args, **kwargs):
+        """
+        Get aggregated values of one data type read from the pre-aggregated rollup tables.
+
+        The query parameters are 'data_type' (required), 'from' and 'to' (defaulting to the last
+        day) and 'max_points'. The finest of the minute, hour and day rollups covering the range
+        in at most 'max_points' buckets is used, unless 'granularity' picks one explicitly.
+        The building object must belong to the project.
+
+        Args:
+            request: The incoming HTTP request.
+            args: Additional positional arguments.
+            kwargs: Additional keyword arguments.
+
+        Returns:
+            Response: HTTP response with the granularity used and the per-bucket aggregates.
+        """
+        data_type_id = parse_int_param(request, 'data_type')
+        if data_type_id is None:
+            raise ValidationError({'data_type': ['This field is required.']})
+        end = parse_datetime_param(request, 'to') or timezone.now()
+        start = parse_datetime_param(request, 'from') or end - timedelta(days=1)
+        max_points = parse_int_param(request, 'max_points') or settings.SERIES_MAX_POINTS
+
+        granularity = request.query_params.get('granularity') or rollups.choose_granularity(start, end, max_points)
+        if granularity not in rollups.GRANULARITIES:
+            raise ValidationError({'granularity': [f'Choose one of: {", ".join(rollups.GRANULARITIES)}.']})
+
+        buckets = rollups.series(self.get_building().id, data_type_id, start, end, granularity)
+        return Response({'data_type': data_type_id, 'granularity': granularity, 'buckets': buckets})
+
+    @action(detail=False, methods=['get'])
+    def aggregate(self, request, *args, **kwargs):
+        """
+        Get per-bucket aggregates of the data points computed in the database.
+
+        The query parameters are 'bucket' (minute, hour, day, week or month), 'fn' as a comma
+        separated list of avg, min, max, count, first and last, and the listing filters 'from',
+        'to', 'data_type' and 'device'. Results are grouped by data type and labelled with the
+        data type and metric names. The building object must belong to the project.
+
+        Args:
+            request: The incoming HTTP request.
+            args: Additional positional arguments.
+            kwargs: Additional keyword arguments.
+
+        Returns:
+            Response: HTTP response with the aggregated buckets of each data type.
+        """
+        bucket, functions = parse_aggregation_params(request)
+        self.get_building()
+        rows = aggregation.aggregate(self.filter_queryset(self.get_queryset()), bucket, functions)
+
+        snapshot = reference.get(data_types={row['data_type'] for row in rows})
+        results = {}
+        for row in rows:
+            data_type_id = row.pop('data_type')
+            if data_type_id not in results:
+                results[data_type_id] = {
+                    'data_type': data_type_id,
+                    'data_type_name': snapshot.data_type_name(data_type_id),
+                    'metric_name': snapshot.metric_name(data_type_id),
+                    'buckets': [],
+                }
+            results[data_type_id]['buckets'].append(row)
+
+        return Response({'bucket': bucket, 'functions': functions, 'results': list(results.values())})
+
+    @action(detail=False, methods=['get'])
+    def latest(self, request, *args, **kwargs):
+        """
+        Get the current reading of every data type of a building object.
+
+        Readings are served from the latest-value cache that is updated on every ingest,
+        so the data point table is not queried. The building object must belong to the project.
+
+        Args:
+            request: The incoming HTTP request.
+            args: Additional positional arguments.
+            kwargs: Additional keyword arguments.
+
+        Returns:
+            Response: HTTP response with the latest reading of each data type.
+        """
+        readings = latest_readings.get(self.get_building().id)
+        snapshot = reference.get(data_types=readings)
+        return Response([
+            {
+                'data_type': data_type_id,
+                'data_type_name': snapshot.data_type_name(data_type_id),
+                'metric_name': snapshot.metric_name(data_type_id),
+                'value': reading['value'],
+                'timestamp': reading['timestamp'],
+                'device': reading['device'],
+            }
+            for data_type_id, reading in sorted(readings.items())
+            if data_type_id in snapshot.data_types
+        ])
+
 
 class UserViewSet(viewsets.ModelViewSet):
     """
@@ -269,7 +693,7 @@ class UserViewSet(viewsets.ModelViewSet):
         building_id = self.kwargs['object_pk']
         return BuildingObject.objects.get(id=building_id).users
 
-    @method_decorator(cache_page(DEFAULT_CACHE_TIMEOUT))
+    @cache_response('building_object', 'user', timeout=DEFAULT_CACHE_TIMEOUT)
     def list(self, request, *args, **kwargs):
         """
         List all users associated with a building object with caching.
@@ -284,7 +708,7 @@ class UserViewSet(viewsets.ModelViewSet):
         """
         return super().list(request, *args, **kwargs)
 
-    @method_decorator(cache_page(DEFAULT_CACHE_TIMEOUT))
+    @cache_response('building_object', 'user', timeout=DEFAULT_CACHE_TIMEOUT)
     def retrieve(self, request, *args, **kwargs):
         """
         Retrieve a specific user associated with a building object with caching.
@@ -298,3 +722,98 @@ class UserViewSet(viewsets.ModelViewSet):
             Response: HTTP response with the retrieved user.
         """
         return super().retrieve(request, *args, **kwargs)
+
+
+class DeviceViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    DeviceViewSet for diagnosing devices.
+
+    This ViewSet lists devices and, for administrators, the readings of a device across all
+    building objects and a summary of its reporting, computed from the device statistics
+    maintained on ingest rather than from the data points.
+
+    Attributes:
+        queryset (QuerySet): The devices along with the data types they collect.
+        serializer_class (class): The serializer class to use for device data.
+        permission_classes (list): The permission classes applied to all actions.
+    """
+
+    queryset = Device.objects.prefetch_related('data_collected').order_by('id')
+    serializer_class = DeviceSerializer
+    permission_classes = [IsAdminUser]
+
+    @action(detail=True, methods=['get'])
+    def readings(self, request, pk=None):
+        """
+        List the data points of a device across all building objects.
+
+        Supports the 'from', 'to' and 'data_type' filters and the (timestamp, id) cursor
+        pagination of the data point listing of a building object.
+
+        Args:
+            request: The incoming HTTP request.
+            pk: The ID of the device.
+
+        Returns:
+            Response: HTTP response with a page of data points.
+        """
+        device = generics.get_object_or_404(Device.objects.only('id'), pk=pk)
+        queryset = DataPointReadSerializer.values(DataPoint.objects.filter(device_id=device.id))
+        queryset = DataPointFilterBackend().filter_queryset(request, queryset, self)
+        paginator = TimestampCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, self)
+        return paginator.get_paginated_response(DataPointReadSerializer(page, many=True).data)
+
+    @action(detail=True, methods=['get'])
+    def summary(self, request, pk=None):
+        """
+        Summarize the reporting of a device: when and where it was last seen, its reading
+        rate, and the data types it reported compared with the ones it should collect.
+
+        Args:
+            request: The incoming HTTP request.
+            pk: The ID of the device.
+
+        Returns:
+            Response: HTTP response with the summary.
+        """
+        return Response(device_stats.summary(self.get_object()))
+
+
+def metrics(request):
+    """
+    Expose the request metrics of all worker processes in the Prometheus text format.
+
+    The request has to carry METRICS_TOKEN as a bearer token, if it is set, or be made by a staff
+    user logged in by session or bearer token.
+
+    Args:
+        request: The incoming HTTP request.
+
+    Returns:
+        HttpResponse: The metrics, or 401 if neither the token nor a staff user is given.
+    """
+    token = settings.METRICS_TOKEN
+    authorized = token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not authorized and not profiling.is_admin(request):
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    return HttpResponse(request_metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def profile(request, pk):
+    """
+    Get a stored profile of a request made with the X-Profile header or the profile query parameter.
+
+    Args:
+        request: The incoming HTTP request.
+        pk (str): The ID of the profile, as returned in the X-Profile-Id response header.
+
+    Returns:
+        Response: HTTP response with the request, its SQL statements and call statistics.
+    """
+    stored = profiling.get(pk)
+    if stored is None:
+        raise NotFound()
+    return Response(stored)